@@ -0,0 +1,378 @@
+"""Single-stream audio engine with bounded polyphony.
+
+One engine owns one output stream. Active voices are mixed block by block
+from the `sounddevice` stream callback; sounddevice (see requirements.txt)
+is the supported backend. Starting a note never creates a thread; it only
+adds a voice to the mix. When the voice limit is reached the oldest voice
+(preferring ones already releasing) is stolen.
+
+Without sounddevice the engine falls back to `simpleaudio`, which has no
+streaming API: a feeder thread mixes SEGMENT_FRAMES at a time and hands
+each segment to its own play_buffer call. Segment seams are timed with a
+sleep, so they can gap or overlap slightly; the segments are long so that
+happens a few times a second rather than every block. Use sounddevice for
+gapless output.
+
+The engine also provides the sample clock used by the playback scheduler:
+voices can be queued to start at an exact frame of the output stream, and
+the difference between requested and actual onset is recorded.
+
+For loop-region playback a pre-mixed PCM buffer can be installed with
+`set_loop`; while it is set the output is that buffer repeated back to
+back, so a block costs a couple of slice copies and no mixing at all.
+"""
+import threading
+import time
+from array import array
+
+import synth
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+try:
+    import sounddevice as sd
+except Exception:
+    sd = None
+try:
+    import simpleaudio as sa
+except Exception:
+    sa = None
+
+
+BLOCK_FRAMES = 1024
+SEGMENT_FRAMES = 8192  # simpleaudio fallback: frames per play_buffer call
+RELEASE_FRAMES = 441   # ~10 ms fade on note-off to avoid clicks
+MASTER_GAIN = 0.5
+
+
+class Voice:
+    __slots__ = ("note_id", "pcm", "pos", "end", "release_at", "serial", "start_frame")
+
+    def __init__(self, note_id, pcm, serial, start_frame=None):
+        self.note_id = note_id
+        # stream frame to start at; None means as soon as possible
+        self.start_frame = start_frame
+        self.pcm = pcm
+        self.pos = 0
+        self.end = len(pcm)
+        # frame where the release fade begins; the tail of the buffer is
+        # always faded so natural note ends don't click either
+        self.release_at = max(0, self.end - RELEASE_FRAMES)
+        self.serial = serial
+
+    @property
+    def releasing(self):
+        return self.pos >= self.release_at
+
+
+def _pcm_view(buf: bytes):
+    """Wrap cached PCM bytes without copying where possible."""
+    if np is not None:
+        return np.frombuffer(buf, dtype="<i2")
+    return array('h', buf)
+
+
+class AudioEngine:
+    """Mixes note voices into a single output stream."""
+
+    def __init__(self, polyphony: int = 16, block_frames: int = BLOCK_FRAMES,
+                 sample_rate: int = synth.SAMPLE_RATE):
+        self.polyphony = max(1, int(polyphony))
+        self.block_frames = block_frames
+        self.sample_rate = sample_rate
+        self.voices = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._serial = 0
+        self._running = False
+        self._thread = None
+        self._stream = None
+        self.frames_rendered = 0
+        self.voices_stolen = 0
+        # (stream frame, perf_counter) of the last mixed block; the clock
+        # interpolates from here and is monotonic even before streaming
+        self._clock_ref = (0, time.perf_counter())
+        self._last_clock = 0
+        self._loop = None   # (pcm bytearray, stream frame of its first sample)
+        # onset error bookkeeping in frames
+        self.onset_count = 0
+        self.onset_error_sum = 0
+        self.onset_error_max = 0
+        if sd is not None:
+            self.backend = "sounddevice"
+        elif sa is not None:
+            self.backend = "simpleaudio"
+        else:
+            self.backend = None
+
+    @property
+    def available(self):
+        return self.backend is not None
+
+    @property
+    def mix_ahead_s(self):
+        """How far mixing can run ahead of the clock; onsets must be queued
+        at least this early to start on time."""
+        frames = SEGMENT_FRAMES if self.backend == "simpleaudio" else self.block_frames
+        return frames / float(self.sample_rate)
+
+    # ---- control (any thread) ----
+    def start(self):
+        if self._running or not self.available:
+            return
+        # continue the stream clock from where the idle clock has got to
+        now = self.clock()
+        with self._lock:
+            self.frames_rendered = now
+            self._clock_ref = (now, time.perf_counter())
+        self._running = True
+        if self.backend == "sounddevice":
+            try:
+                self._stream = sd.RawOutputStream(samplerate=self.sample_rate, channels=1, dtype="int16",
+                                                  blocksize=self.block_frames, callback=self._sd_callback)
+                self._stream.start()
+                return
+            except Exception:
+                self._stream = None
+                if sa is None:
+                    self._running = False
+                    return
+                self.backend = "simpleaudio"
+        self._thread = threading.Thread(target=self._feeder_loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        with self._lock:
+            self._running = False
+            self.voices = []
+            self._wake.notify_all()
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception:
+                pass
+            self._stream = None
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def clock(self) -> int:
+        """Current output position in frames."""
+        with self._lock:
+            frame, t = self._clock_ref
+            now = frame + int((time.perf_counter() - t) * self.sample_rate)
+            now = max(now, self._last_clock)
+            self._last_clock = now
+            return now
+
+    def onset_stats(self):
+        """Measured onset error of scheduled voices, in milliseconds."""
+        ms = 1000.0 / self.sample_rate
+        n = self.onset_count
+        return {
+            "count": n,
+            "mean_ms": (self.onset_error_sum / n) * ms if n else 0.0,
+            "max_ms": self.onset_error_max * ms,
+        }
+
+    def reset_onset_stats(self):
+        self.onset_count = 0
+        self.onset_error_sum = 0
+        self.onset_error_max = 0
+
+    def note_on(self, note_id, freq_hz: float, duration_ms: float, timbre: str = synth.DEFAULT_TIMBRE,
+                at_frame: int = None):
+        """Start a voice, optionally at an exact future stream frame."""
+        pcm = _pcm_view(synth.render_tone(freq_hz, duration_ms, timbre))
+        with self._lock:
+            # retrigger replaces any voice still sounding for the same note
+            self.voices = [v for v in self.voices if v.note_id != note_id]
+            if len(self.voices) >= self.polyphony:
+                self._steal_voice()
+            self._serial += 1
+            self.voices.append(Voice(note_id, pcm, self._serial, at_frame))
+            self._wake.notify()
+        if not self._running:
+            self.start()
+
+    def set_loop(self, pcm, at_frame: int = None):
+        """Replace all voices with `pcm` (int16 mono, a bytearray that may be
+        edited in place while it plays) looped from stream frame at_frame,
+        or from the current clock."""
+        if at_frame is None:
+            at_frame = self.clock()
+        with self._lock:
+            self.voices = []
+            self._loop = (pcm, at_frame)
+            self._wake.notify()
+        if not self._running:
+            self.start()
+
+    def clear_loop(self):
+        with self._lock:
+            self._loop = None
+
+    def loop_offset(self, frame: int = None):
+        """Frame within the loop buffer that is playing at `frame` (default:
+        now), or None if no loop is set."""
+        loop = self._loop
+        if loop is None:
+            return None
+        if frame is None:
+            frame = self.clock()
+        pcm, start = loop
+        return max(0, frame - start) % max(1, len(pcm) // 2)
+
+    def note_off(self, note_id):
+        with self._lock:
+            self.voices = [v for v in self.voices if v.note_id != note_id or self._release(v)]
+
+    def all_notes_off(self):
+        with self._lock:
+            self.voices = [v for v in self.voices if self._release(v)]
+
+    @staticmethod
+    def _release(v):
+        """Start the release fade; returns False for voices that never began."""
+        if v.pos == 0 and v.start_frame is not None:
+            return False
+        if v.release_at > v.pos:
+            v.release_at = v.pos
+            v.end = min(v.end, v.pos + RELEASE_FRAMES)
+        return True
+
+    def active_voices(self):
+        return len(self.voices)
+
+    def _steal_voice(self):
+        # prefer a voice that is already fading out, then the oldest one
+        victim = min(self.voices, key=lambda v: (not v.releasing, v.serial))
+        self.voices.remove(victim)
+        self.voices_stolen += 1
+
+    # ---- mixing (audio thread) ----
+    def mix_block(self, frames: int) -> bytes:
+        """Mix the next `frames` frames of all voices into int16 PCM."""
+        with self._lock:
+            block_start = self.frames_rendered
+            self._clock_ref = (block_start, time.perf_counter())
+            if self._loop is not None:
+                self.frames_rendered += frames
+                return self._read_loop(frames, block_start)
+            voices = self.voices
+            if np is not None:
+                out = self._mix_numpy(voices, frames, block_start)
+            else:
+                out = self._mix_python(voices, frames, block_start)
+            self.voices = [v for v in voices if v.pos < v.end]
+            self.frames_rendered += frames
+        return out
+
+    def _read_loop(self, frames, block_start):
+        pcm, start = self._loop
+        n = len(pcm) // 2
+        if not n:
+            return bytes(2 * frames)
+        out = bytearray()
+        pos = block_start - start
+        if pos < 0:
+            lead = min(frames, -pos)
+            out += bytes(2 * lead)
+            pos = 0
+        while len(out) < 2 * frames:
+            p = pos % n
+            k = min(frames - len(out) // 2, n - p)
+            out += pcm[2 * p:2 * (p + k)]
+            pos += k
+        return bytes(out)
+
+    def _voice_offset(self, v, frames, block_start):
+        """Frame within this block where the voice plays from, or None if it
+        has not started yet. Records onset error when a voice begins."""
+        if v.pos > 0 or v.start_frame is None:
+            return 0
+        off = v.start_frame - block_start
+        if off >= frames:
+            return None
+        self._record_onset(max(0, -off))
+        return max(0, off)
+
+    def _record_onset(self, err):
+        self.onset_count += 1
+        self.onset_error_sum += err
+        if err > self.onset_error_max:
+            self.onset_error_max = err
+
+    def _mix_numpy(self, voices, frames, block_start):
+        acc = np.zeros(frames, dtype=np.float32)
+        for v in voices:
+            off = self._voice_offset(v, frames, block_start)
+            if off is None:
+                continue
+            n = min(frames - off, v.end - v.pos)
+            if n <= 0:
+                continue
+            seg = v.pcm[v.pos:v.pos + n].astype(np.float32)
+            if v.pos + n > v.release_at:
+                idx = np.arange(v.pos, v.pos + n, dtype=np.float32)
+                gain = 1.0 - (idx - v.release_at) / RELEASE_FRAMES
+                seg *= np.clip(gain, 0.0, 1.0)
+            acc[off:off + n] += seg
+            v.pos += n
+        acc *= MASTER_GAIN
+        np.clip(acc, -32767, 32767, out=acc)
+        return acc.astype("<i2").tobytes()
+
+    def _mix_python(self, voices, frames, block_start):
+        acc = [0.0] * frames
+        for v in voices:
+            off = self._voice_offset(v, frames, block_start)
+            if off is None:
+                continue
+            n = min(frames - off, v.end - v.pos)
+            pcm, base, rel = v.pcm, v.pos, v.release_at
+            for i in range(max(0, n)):
+                j = base + i
+                s = pcm[j]
+                if j > rel:
+                    s *= max(0.0, 1.0 - (j - rel) / RELEASE_FRAMES)
+                acc[off + i] += s
+            v.pos += max(0, n)
+        out = array('h', (int(max(-32767, min(32767, s * MASTER_GAIN))) for s in acc))
+        return out.tobytes()
+
+    def _sd_callback(self, outdata, frames, time_info, status):
+        outdata[:] = self.mix_block(frames)
+
+    def _feeder_loop(self):
+        # simpleaudio cannot stream, so queue long segments back to back
+        # against a monotonic deadline; only one or two buffers are ever live
+        segment_s = SEGMENT_FRAMES / float(self.sample_rate)
+        deadline = None
+        while True:
+            with self._lock:
+                if self._running and not self.voices and self._loop is None:
+                    while self._running and not self.voices and self._loop is None:
+                        deadline = None
+                        self._wake.wait()
+                    # nothing sounded while idle: jump the mix cursor to the
+                    # clock so scheduled frames line up with real time
+                    frame, t = self._clock_ref
+                    now = frame + int((time.perf_counter() - t) * self.sample_rate)
+                    self.frames_rendered = max(self.frames_rendered, now)
+                if not self._running:
+                    return
+            pcm = self.mix_block(SEGMENT_FRAMES)
+            now = time.perf_counter()
+            if deadline is None or deadline < now:
+                deadline = now
+            else:
+                time.sleep(max(0.0, deadline - now))
+            try:
+                sa.play_buffer(pcm, 1, 2, self.sample_rate)
+            except Exception:
+                pass
+            deadline += segment_s
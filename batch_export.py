@@ -0,0 +1,188 @@
+"""Headless batch export: projects or MIDI files to .mid + .lab (+ .wav).
+
+    python batch_export.py songs/*.sicp imports/*.mid -o export --wav
+
+Each input is converted in its own worker process with the same code the
+editor's Render Audio uses (song_io), without importing Tk. Inputs whose
+outputs are newer than the input (and its journal) and were written with
+the same options are skipped unless --force is given. The options go to
+a `<name>.export.json` stamp next to the outputs: tempo, --wav and, for
+WAV renders, the tuning and sample-bank files with their modification
+times. An input whose output would overwrite it is refused and counted
+as a failure, and so are inputs that would share outputs (song.sicp and
+song.mid in one run). A throughput summary is printed at the end.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import song_io
+import tuning
+
+INPUT_EXTS = ('.sicp', '.mid', '.midi')
+
+
+def outputs_for(path, out_dir, wav):
+    base = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0])
+    exts = ('.mid', '.lab', '.wav') if wav else ('.mid', '.lab')
+    return base, [base + ext for ext in exts]
+
+
+def _file_stamp(path):
+    """[absolute path, newest mtime] of a file, or of a directory and the
+    files in it."""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    if os.path.isdir(path):
+        mtime = max([mtime] + [e.stat().st_mtime for e in os.scandir(path) if e.is_file()])
+    return [path, mtime]
+
+
+def export_settings(wav, tempo, scale=None, bank=None):
+    """Everything besides the input that the outputs depend on."""
+    settings = {"wav": bool(wav), "tempo": tempo}
+    if wav:
+        # tuning and voice only change the audio
+        settings["scale"] = [_file_stamp(p) for p in scale if p] if scale else None
+        settings["bank"] = _file_stamp(bank) if bank else None
+    return settings
+
+
+def stamp_path(base):
+    return base + ".export.json"
+
+
+def up_to_date(path, outputs, settings=None, stamp=None):
+    """True if every output is newer than the input (and its journal) and,
+    given a stamp file, it records the same settings."""
+    sources = [path]
+    journal = path + ".journal"
+    if os.path.exists(journal):
+        sources.append(journal)
+    try:
+        newest_in = max(os.path.getmtime(p) for p in sources)
+        if not all(os.path.getmtime(o) >= newest_in for o in outputs):
+            return False
+        if stamp is None:
+            return True
+        with open(stamp, "r", encoding="utf-8") as f:
+            return json.load(f) == json.loads(json.dumps(settings))
+    except (OSError, ValueError):
+        return False
+
+
+def export_one(path, base, wav, tempo, scale=None, timbre=None, settings=None):
+    """Worker: load one input and write its outputs. Returns (path, notes,
+    error or None). scale is an optional (scl, kbm) pair and timbre an
+    optional sample-bank voice for the WAV. settings, if given, is written
+    to the stamp file once the outputs are complete."""
+    try:
+        if scale and tuning.current == tuning.EQUAL:
+            tuning.load_scala(*scale)
+        store, file_tempo = song_io.load(path)
+        # one process per file already; render the WAV serially inside it
+        song_io.export(store, base, tempo or file_tempo, wav=wav, workers=1, timbre=timbre)
+        if settings is not None:
+            with open(stamp_path(base), "w", encoding="utf-8") as f:
+                json.dump(settings, f)
+        return path, len(store), None
+    except Exception as ex:
+        return path, 0, f"{type(ex).__name__}: {ex}"
+
+
+def collect_inputs(args):
+    """Input files named by `args`, each once."""
+    seen = set()
+    for arg in args:
+        if os.path.isdir(arg):
+            paths = [os.path.join(arg, name) for name in sorted(os.listdir(arg))
+                     if name.lower().endswith(INPUT_EXTS)]
+        else:
+            paths = [arg]
+        for path in paths:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                yield path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export projects or MIDI files to .mid/.lab (and .wav) without a display.")
+    ap.add_argument("inputs", nargs="+", help=".sicp / .mid files or directories containing them")
+    ap.add_argument("-o", "--out-dir", default="export", help="output directory (default: export)")
+    ap.add_argument("--wav", action="store_true", help="also render audio")
+    ap.add_argument("--tempo", type=float, help="replace the tempo map of every input with this BPM")
+    ap.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--force", action="store_true", help="rewrite outputs even if up to date with these options")
+    ap.add_argument("--scl", help="Scala scale to render the WAV in")
+    ap.add_argument("--kbm", help="Scala keyboard mapping for --scl")
+    ap.add_argument("--bank", help="sample-bank directory to render the WAV with (see sampler.py)")
+    args = ap.parse_args(argv)
+    scale = (args.scl, args.kbm) if args.scl else None
+    if scale:
+        try:
+            tuning.load_scala(*scale)
+        except Exception as ex:
+            ap.error(f"cannot load tuning: {ex}")
+    timbre = None
+    if args.bank:
+        import sampler
+        try:
+            sampler.load_bank(args.bank)
+        except Exception as ex:
+            ap.error(f"cannot load sample bank: {ex}")
+        timbre = sampler.timbre_for(args.bank)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    settings = export_settings(args.wav, args.tempo, scale, args.bank)
+    jobs, skipped = [], 0
+    results = []
+    inputs = list(collect_inputs(args.inputs))
+    by_base = {}
+    for path in inputs:
+        by_base.setdefault(os.path.abspath(outputs_for(path, args.out_dir, args.wav)[0]), []).append(path)
+    for path in inputs:
+        base, outputs = outputs_for(path, args.out_dir, args.wav)
+        others = [p for p in by_base[os.path.abspath(base)] if p != path]
+        if others:
+            results.append((path, 0, "outputs would collide with " + ", ".join(others)))
+            continue
+        if os.path.abspath(path) in map(os.path.abspath, outputs + [stamp_path(base)]):
+            results.append((path, 0, "output would overwrite the input"))
+            continue
+        if not args.force and up_to_date(path, outputs, settings, stamp_path(base)):
+            skipped += 1
+            continue
+        jobs.append((path, base))
+
+    t0 = time.perf_counter()
+    done, notes, failed = 0, 0, 0
+    job_args = (args.wav, args.tempo, scale, timbre, settings)
+    if args.workers <= 1 or len(jobs) <= 1:
+        results += [export_one(path, base, *job_args) for path, base in jobs]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx) as pool:
+            futures = [pool.submit(export_one, path, base, *job_args) for path, base in jobs]
+            results += [f.result() for f in as_completed(futures)]
+    for path, count, error in results:
+        if error:
+            failed += 1
+            print(f"FAILED {path}: {error}", file=sys.stderr)
+        else:
+            done += 1
+            notes += count
+    elapsed = time.perf_counter() - t0
+
+    rate = f"{done / elapsed:.1f} files/s, {notes / elapsed:,.0f} notes/s" if elapsed > 0 and done else "-"
+    print(f"exported {done} file(s) ({notes:,} notes), skipped {skipped} up to date, "
+          f"{failed} failed in {elapsed:.2f}s [{rate}]")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Throughput benchmark for midi_writer.
+
+Streams a synthetic song of overlapping notes (two events each) to a
+temporary file and reports events per second, output size and peak
+Python heap use. Run from the repository root:
+
+    python benchmarks/bench_midi_writer.py --events 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import midi_writer  # noqa: E402
+
+
+def synthetic_notes(count, seed=1):
+    """Yield (tick, duration, note, velocity, lyric) in start order."""
+    rng = random.Random(seed)
+    tick = 0
+    for i in range(count):
+        tick += rng.choice((0, 120, 240, 480))
+        yield tick, rng.choice((120, 240, 480, 960)), rng.randrange(36, 85), rng.randrange(40, 128), \
+            ("la" if i % 4 == 0 else "")
+
+
+def run(events, path, trace_memory):
+    notes = events // 2
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    with midi_writer.MidiWriter(path) as mw:
+        with mw.track("Conductor") as t:
+            t.tempo(0, 120)
+        with mw.track("Voice") as t:
+            for tick, dur, note, vel, lyric in synthetic_notes(notes):
+                t.note(tick, dur, note, vel, lyric=lyric)
+        written = t.events
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+    return written, elapsed, peak
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--memory", action="store_true", help="also trace peak heap (slower)")
+    args = ap.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(suffix=".mid")
+    os.close(fd)
+    try:
+        written, elapsed, peak = run(args.events, path, args.memory)
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    print(f"events      {written}")
+    print(f"seconds     {elapsed:.3f}")
+    print(f"events/s    {written / elapsed:,.0f}")
+    print(f"file bytes  {size:,} ({size / written:.2f} per event)")
+    if peak is not None:
+        print(f"peak heap   {peak / 1024:,.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
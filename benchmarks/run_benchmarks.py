@@ -0,0 +1,364 @@
+"""Benchmark suite for the editor's hot paths.
+
+Builds synthetic projects of increasing size and times:
+
+    synth       uncached tone synthesis (synth.render_tone)
+    pitch       pitch name -> frequency lookups (tuning.pitch_to_freq)
+                and row -> frequency table lookups (tuning.ROW_FREQ)
+    store       bulk NoteStore construction
+    schedule    look-ahead scheduling through the whole song
+    export      .mid + .lab assembly (song_io), constant tempo
+    canvas      viewport redraw, zoom and scroll in the real Tk editor
+
+The canvas benchmarks need a display; without one the suite starts a
+virtual X server (Xvfb) if it is installed and skips them otherwise.
+
+Results are written as JSON and, given a baseline, compared metric by
+metric so slowdowns show up on every commit:
+
+    python benchmarks/run_benchmarks.py --out bench.json --baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --sizes 100,1000 --save-baseline
+
+A suite the baseline records as skipped (canvas, when it was saved
+without a display) is left out of the comparison with a note; regenerate
+the baseline under Xvfb to gate it. A suite the baseline lacks
+altogether, or that this run was asked to measure but skipped, is
+reported as a failure.
+
+Ratios only mean something on a comparable machine: a baseline saved with
+numpy is not compared against a run without it (or the other way round),
+and a different platform, CPU count or Python is reported as a warning.
+
+On a noisy machine `--runs 3` repeats the suite and keeps the median of
+each metric; regenerate the stored baseline that way, under Xvfb, after
+any change to the suite or to a hot path it covers.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import song_io  # noqa: E402
+import synth  # noqa: E402
+from note_store import NoteStore  # noqa: E402
+from scheduler import PlaybackScheduler  # noqa: E402
+from timeline import EventTimeline  # noqa: E402
+from tuning import PITCHES, ROW_FREQ, pitch_to_freq  # noqa: E402
+
+SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+THRESHOLD = 1.25      # ratio to baseline reported as a regression
+# every suite a baseline must hold numbers for; a skipped one is no gate
+SUITES = ("synth", "pitch", "store", "schedule", "export", "canvas")
+NOTES_PER_BEAT = 8
+LYRICS = ("la", "na", "a", "o", "HH AH0", "")
+
+
+def synthetic_notes(n, seed=0):
+    """(row, start, length, velocity, lyric) for n notes, about
+    NOTES_PER_BEAT onsets per beat."""
+    rng = random.Random(seed)
+    rows = len(PITCHES)
+    return [(rng.randrange(rows), i // NOTES_PER_BEAT + rng.randrange(4) / 4.0,
+             rng.choice((0.25, 0.5, 1.0, 2.0)), rng.randrange(40, 128), rng.choice(LYRICS))
+            for i in range(n)]
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def repeats_for(n):
+    return 5 if n <= 10_000 else (2 if n <= 100_000 else 1)
+
+
+# ---- size independent ----
+def bench_synth():
+    freqs = list(ROW_FREQ)
+
+    def run():
+        synth.tone_cache.clear()
+        for f in freqs:
+            synth.render_tone(f, 400.0)
+    return {"render_49_tones": best_of(run, 3)}
+
+
+def bench_pitch():
+    def run():
+        for _ in range(200):
+            for p in PITCHES:
+                pitch_to_freq(p)
+
+    def rows():
+        for _ in range(200):
+            for r in range(len(PITCHES)):
+                ROW_FREQ[r]
+    return {"lookups_9800": best_of(run, 5), "row_lookups_9800": best_of(rows, 5)}
+
+
+# ---- per project size ----
+def bench_store(notes):
+    return best_of(lambda: NoteStore().add_many(notes), repeats_for(len(notes)))
+
+
+def bench_schedule(store):
+    """Walk the whole song with a fake sample clock advanced one
+    look-ahead window per tick; every onset is dispatched once."""
+    timeline = EventTimeline()
+    timeline.compile((k[0], k[2]) for k in store.sorted_keys())
+    frame = [0]
+    sched = PlaybackScheduler(lambda: frame[0], timeline, synth.SAMPLE_RATE)
+    end = store.duration()
+
+    def run():
+        frame[0] = 0
+        sched.start(0.0, 145)
+        hop = int(sched.lookahead_s * synth.SAMPLE_RATE)
+        dispatched = 0
+        while sched.position() <= end:
+            dispatched += len(sched.due())
+            frame[0] += hop
+        return dispatched
+    return best_of(run, repeats_for(len(store)))
+
+
+def bench_export(store, tmp):
+    mid = os.path.join(tmp, "bench.mid")
+    lab = os.path.join(tmp, "bench.lab")
+
+    def run():
+        song_io.write_midi(store, mid, 145)
+        song_io.write_lab(store, lab, 145)
+    return best_of(run, repeats_for(len(store)))
+
+
+# ---- Tk ----
+def ensure_display():
+    """Returns (ok, Xvfb process or None)."""
+    if os.environ.get("DISPLAY"):
+        return True, None
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        return False, None
+    display = ":%d" % (90 + os.getpid() % 100)
+    proc = subprocess.Popen([xvfb, display, "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    if proc.poll() is not None:
+        return False, None
+    os.environ["DISPLAY"] = display
+    return True, proc
+
+
+def bench_canvas(sizes):
+    import gui
+    app = gui.SingItClanker()
+    app.update()
+    app._on_first_expose()
+    app.update()
+    out = {}
+    for n in sizes:
+        notes = synthetic_notes(n)
+        res = {}
+        t0 = time.perf_counter()
+        app.replace_notes(notes)
+        app.update()
+        res["load_and_draw"] = time.perf_counter() - t0
+        res["refresh_viewport"] = best_of(lambda: (app.refresh_viewport(), app.update_idletasks()), 5)
+
+        def zoom():
+            for z in (1.25, 1.5, 2.0, 1.5, 1.0):
+                app.h_zoom_set(z)
+                app.update_idletasks()
+            app._zoom_settle()
+            app.update_idletasks()
+        res["zoom_5_steps"] = best_of(zoom, 3)
+
+        def scroll():
+            for f in (0.1, 0.3, 0.5, 0.7, 0.9, 0.0):
+                app.canvas.xview_moveto(f)
+                app.update_idletasks()
+        res["scroll_6_pages"] = best_of(scroll, 3)
+        out[str(n)] = res
+    app.on_close()
+    return out
+
+
+def run_suite(sizes, tk=True):
+    results = {"synth": bench_synth(), "pitch": bench_pitch()}
+    per_size = {"store": {}, "schedule": {}, "export": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            notes = synthetic_notes(n)
+            per_size["store"][str(n)] = bench_store(notes)
+            store = NoteStore()
+            store.add_many(notes)
+            per_size["schedule"][str(n)] = bench_schedule(store)
+            per_size["export"][str(n)] = bench_export(store, tmp)
+            print(f"  {n:>9,} notes: store {per_size['store'][str(n)]:.3f}s  "
+                  f"schedule {per_size['schedule'][str(n)]:.3f}s  export {per_size['export'][str(n)]:.3f}s",
+                  flush=True)
+    results.update(per_size)
+    if tk:
+        ok, xvfb = ensure_display()
+        try:
+            results["canvas"] = bench_canvas(sizes) if ok else "skipped: no display and no Xvfb"
+        finally:
+            if xvfb is not None:
+                xvfb.terminate()
+    return results
+
+
+def median_results(runs):
+    """Per-metric median of several run_suite results."""
+    first = runs[0]
+    if isinstance(first, dict):
+        return {k: median_results([r[k] for r in runs]) for k in first}
+    if isinstance(first, (int, float)):
+        return statistics.median(runs)
+    return first
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1.0}} -> {"a/b": 1.0}; skipped entries are dropped."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "/"))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def missing_suites(results, suites=SUITES):
+    """Suites in `suites` that results hold no numbers for (absent or
+    recorded as skipped)."""
+    return [name for name in suites if not flatten({name: results.get(name)})]
+
+
+def environment_mismatch(current, baseline):
+    """Compares two results' meta; returns (fatal, warnings) as lists of
+    messages. A numpy mismatch is fatal: the synthesis and mixing paths
+    differ by an order of magnitude without it."""
+    fatal, warnings = [], []
+    for key in ("numpy", "platform", "cpus", "python"):
+        if key not in baseline:
+            warnings.append(f"baseline records no {key}")
+        elif current.get(key) != baseline[key]:
+            msg = f"{key}: baseline {baseline[key]!r}, current {current.get(key)!r}"
+            (fatal if key == "numpy" else warnings).append(msg)
+    return fatal, warnings
+
+
+def skipped_suites(results):
+    """Suites that results record as skipped rather than measured."""
+    return [name for name, value in results.items() if isinstance(value, str) and value.startswith("skipped")]
+
+
+def compare(current, baseline, threshold=THRESHOLD, measured=SUITES):
+    """Print current/baseline ratios; returns the regressed metric names.
+    Suites the baseline records as skipped are not compared. One of the
+    `measured` suites that the baseline lacks counts as a regression,
+    since nothing guards it, and so does one that this run skipped."""
+    skipped = skipped_suites(baseline)
+    for name in skipped:
+        print(f"{name}: not compared, the baseline has no numbers ({baseline[name]})")
+    measured = tuple(name for name in measured if name not in skipped)
+    current = {k: v for k, v in current.items() if k not in skipped}
+    cur, base = flatten(current), flatten(baseline)
+    regressions = []
+    for name in missing_suites(baseline, measured):
+        print(f"{name}: no baseline numbers ({baseline.get(name, 'absent')}); regenerate the baseline")
+        regressions.append(f"{name} (no baseline)")
+    for name in missing_suites(current, measured):
+        print(f"{name}: not measured in this run ({current.get(name, 'absent')})")
+        regressions.append(f"{name} (not measured)")
+    print(f"{'metric':<40}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name in sorted(cur):
+        if name not in base or base[name] <= 0:
+            # a metric the baseline lacks means the baseline is stale
+            print(f"{name:<40}{'-':>12}{cur[name]:>12.4f}{'':>8}  new, not in baseline")
+            continue
+        ratio = cur[name] / base[name]
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{name:<40}{base[name]:>12.4f}{cur[name]:>12.4f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run the hot-path benchmark suite.")
+    ap.add_argument("--sizes", default=",".join(str(s) for s in SIZES),
+                    help="comma separated project sizes in notes")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--baseline", help="compare against this results JSON")
+    ap.add_argument("--save-baseline", action="store_true", help=f"also write the results to {BASELINE}")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--runs", type=int, default=1, help="repeat the suite and keep each metric's median")
+    ap.add_argument("--no-tk", action="store_true", help="skip the canvas benchmarks")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = median_results([run_suite(sizes, tk=not args.no_tk) for _ in range(max(1, args.runs))])
+    doc = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": synth.np is not None,
+            "runs": max(1, args.runs),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.save_baseline and missing_suites(results):
+        print("warning: the baseline has no numbers for " + ", ".join(missing_suites(results))
+              + "; comparisons against it will not gate them")
+    for path in filter(None, (args.out, BASELINE if args.save_baseline else None)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+        print(f"wrote {path}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        fatal, warnings = environment_mismatch(doc["meta"], baseline.get("meta", {}))
+        for msg in warnings:
+            print(f"warning: {msg}")
+        if fatal:
+            print("not comparing against a baseline from a different environment ("
+                  + "; ".join(fatal) + "); regenerate it on this machine")
+            return 2 if args.fail_on_regression else 0
+        measured = tuple(name for name in SUITES if not (args.no_tk and name == "canvas"))
+        regressions = compare(results, baseline["results"], args.threshold, measured)
+        if regressions:
+            print(f"{len(regressions)} metric(s) slower than {args.threshold:.2f}x baseline or unmeasured: "
+                  + ", ".join(regressions))
+            if args.fail_on_regression:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Grapheme-to-phoneme lookups for lyrics.
+
+The G2P backend is loaded once per process, optionally warmed on a
+background thread, and every word is memoized in a bounded LRU. Results
+from a real backend are also persisted to a small JSON file so common
+words resolve without the model across sessions.
+
+Backend preference matches the editor's original behaviour:
+1. `g2p_en` (best if installed)
+2. `pronouncing` (CMUdict lookup)
+3. fallback to simple grapheme split (characters)
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from profiler import profiler
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".singitclanker_g2p.json")
+MAX_WORDS = 20000
+
+
+class G2PService:
+    def __init__(self, cache_path: str = CACHE_PATH, max_words: int = MAX_WORDS):
+        self.cache_path = cache_path
+        self.max_words = max_words
+        self.backend = None          # "g2p_en", "pronouncing" or "graphemes"
+        self._convert = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._words = OrderedDict()  # word -> tuple of phonemes
+        self._disk_words = set()     # loaded from disk and not yet looked up
+        self._dirty = False
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ---- loading ----
+    def warm(self):
+        """Load the backend and disk cache on a daemon thread."""
+        if self._convert is None:
+            threading.Thread(target=self.load, daemon=True).start()
+
+    def load(self):
+        with self._load_lock:
+            if self._convert is not None:
+                return
+            with profiler.span("g2p load", "g2p"):
+                convert, backend = self._load_backend()
+            disk = self._read_disk(backend)
+            with self._lock:
+                # words looked up while loading win over the disk copy
+                for word, phones in disk.items():
+                    self._words.setdefault(word, phones)
+                self._disk_words = set(disk)
+                self.backend = backend
+                self._convert = convert
+
+    @staticmethod
+    def _load_backend():
+        try:
+            from g2p_en import G2p
+            g2p = G2p()
+            return (lambda w: [t for t in g2p(w) if t and not t.isspace()]), "g2p_en"
+        except Exception:
+            pass
+        try:
+            import pronouncing
+
+            def convert(w):
+                phones = pronouncing.phones_for_word(w)
+                return phones[0].split() if phones else []
+            return convert, "pronouncing"
+        except Exception:
+            return (lambda w: []), "graphemes"
+
+    def _read_disk(self, backend):
+        # graphemes are not worth persisting, and entries from another
+        # backend would shadow the real one
+        if backend == "graphemes":
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("backend") != backend:
+                return {}
+            return {w: tuple(p) for w, p in data.get("words", {}).items()}
+        except Exception:
+            return {}
+
+    def save(self):
+        """Write the word cache back to disk if it changed."""
+        if not self._dirty or self.backend in (None, "graphemes"):
+            return
+        with self._lock:
+            words = {w: list(p) for w, p in self._words.items()}
+            self._dirty = False
+        tmp = self.cache_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"backend": self.backend, "words": words}, f)
+            os.replace(tmp, self.cache_path)
+        except Exception:
+            pass
+
+    # ---- lookups ----
+    def word_phonemes(self, word: str):
+        """Phonemes for one word; the word's characters if the backend has none."""
+        key = word.lower()
+        with self._lock:
+            phones = self._words.get(key)
+            if phones is not None:
+                self._words.move_to_end(key)
+                if key in self._disk_words:
+                    self.disk_hits += 1
+                    self._disk_words.discard(key)
+                else:
+                    self.hits += 1
+                return list(phones) or list(word)
+        if self._convert is None:
+            self.load()
+        try:
+            with profiler.span("g2p convert", "g2p", word=key):
+                phones = tuple(self._convert(key))
+        except Exception:
+            phones = ()
+        with self._lock:
+            self.misses += 1
+            self._words[key] = phones
+            self._dirty = True
+            while len(self._words) > self.max_words:
+                self._words.popitem(last=False)
+        return list(phones) or list(word)
+
+    def text_to_phonemes(self, text: str):
+        if not text:
+            return []
+        out = []
+        for w in text.strip().split():
+            out.extend(self.word_phonemes(w))
+        return out
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "backend": self.backend,
+            "words": len(self._words),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+service = G2PService()
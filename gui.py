@@ -1,72 +1,59 @@
+import time
+_T_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import simpledialog, messagebox, filedialog
+import math
 import os
-import struct
-import time
+import sys
 import threading
-try:
-    import winsound
-except Exception:
-    winsound = None
-try:
-    import simpleaudio as sa
-except Exception:
-    sa = None
-import math
-from array import array
-
-
-def pitch_to_freq(name: str) -> float:
-    """Convert note name like C4 or A#3 to frequency (Hz)."""
-    name = name.strip()
-    if not name:
-        return 440.0
-    # split note letters and octave digits
-    i = len(name) - 1
-    while i >= 0 and name[i].isdigit():
-        i -= 1
-    note = name[: i+1]
-    octave = name[i+1:]
-    try:
-        oct_i = int(octave)
-    except Exception:
-        oct_i = 4
-    semis = {
-        'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4,
-        'F': 5, 'F#': 6, 'G': 7, 'G#': 8, 'A': 9,
-        'A#': 10, 'B': 11
-    }
-    if note not in semis:
-        # try normalize (e.g., use flat -> sharp) minimal support
-        note = note.replace('Bb', 'A#').replace('Db', 'C#').replace('Eb', 'D#').replace('Gb', 'F#').replace('Ab', 'G#')
-    semitone = semis.get(note, 9)
-    midi = (oct_i + 1) * 12 + semitone
-    freq = 440.0 * (2 ** ((midi - 69) / 12.0))
-    return freq
+import queue
+
+# the numpy-backed audio stack (synth, audio_engine, scheduler,
+# offline_render) is imported after the window is up, see _init_audio
+from timeline import EventTimeline
+from note_store import NoteStore
+import g2p_service
+import lyric_align
+import midi_reader
+import project_file
+import song_io
+import tuning
+from tempo_map import TempoMap
+from tuning import PITCHES
+from profiler import profiler
+from history import History, MoveNotes, ResizeNotes, AddNotes, DeleteNotes, SetLyrics
+
+_backends = None
+
+
+def audio_backends():
+    """Import the optional sound backends on first use.
+    Returns (simpleaudio, winsound), either of which may be None."""
+    global _backends
+    if _backends is None:
+        try:
+            import simpleaudio as sa
+        except Exception:
+            sa = None
+        try:
+            import winsound
+        except Exception:
+            winsound = None
+        _backends = (sa, winsound)
+    return _backends
 
 
+@profiler.traced("play_tone", "audio")
 def play_tone(freq_hz: float, duration_ms: float):
     """Play a tone (non-blocking wrapper will spawn a thread)."""
-    # Prefer simpleaudio sine/harmonic synthesis for a piano-like timbre
+    sa, winsound = audio_backends()
+    # Prefer simpleaudio with the cached harmonic synthesis for a piano-like timbre
     if sa is not None:
         try:
-            sample_rate = 44100
-            duration_s = max(0.01, duration_ms / 1000.0)
-            n_samples = int(sample_rate * duration_s)
-            max_amp = 32767
-            buf = array('h')
-            # harmonic coefficients to approximate a piano-ish tone
-            h = [1.0, 0.6, 0.3, 0.15]
-            for i in range(n_samples):
-                t = i / sample_rate
-                s = 0.0
-                for idx, coef in enumerate(h, start=1):
-                    s += coef * math.sin(2.0 * math.pi * freq_hz * idx * t)
-                # simple amplitude envelope: quick attack, exponential decay
-                env = (1.0 - math.exp(-12.0 * t)) * math.exp(-4.0 * t)
-                val = int(max(-max_amp, min(max_amp, s * env * 0.25 * max_amp)))
-                buf.append(val)
-            play_obj = sa.play_buffer(buf.tobytes(), 1, 2, sample_rate)
+            import synth
+            pcm = synth.render_tone(freq_hz, duration_ms)
+            play_obj = sa.play_buffer(pcm, 1, 2, synth.SAMPLE_RATE)
             play_obj.wait_done()
             return
         except Exception:
@@ -87,34 +74,62 @@ def play_tone(freq_hz: float, duration_ms: float):
 
 
 # ---------------- CONFIG ----------------
-PITCHES = [
-    "C6","B5","A#5","A5","G#5","G5","F#5","F5","E5","D#5","D5","C#5",
-    "C5","B4","A#4","A4","G#4","G4","F#4","F4","E4","D#4","D4","C#4",
-    "C4","B3","A#3","A3","G#3","G3","F#3","F3","E3","D#3","D3","C#3",
-    "C3","B2","A#2","A2","G#2","G2","F#2","F2","E2","D#2","D2","C#2","C2",
-]
+# pixel sizes at zoom 1; each editor scales its own copies
 ROW_H = 26
 KEY_W = 70
 GRID_STEP = 64
 NOTE_MIN_W = 32
 NOTE_H = ROW_H - 4
 PLAY_BPM = 145   # fixed BPM
-SCENE_WIDTH = 4000
-
-# Zoom base values (we keep base copies so zoom math is stable)
-BASE_ROW_H = ROW_H
-BASE_GRID_STEP = GRID_STEP
-BASE_NOTE_MIN_W = NOTE_MIN_W
-BASE_KEY_W = KEY_W
+LOOP_TICK_S = 0.03   # playhead/edit polling while a loop region plays
+MAX_POLYPHONY = 16   # voices mixed at once; older voices are stolen beyond this
+SCENE_WIDTH = 4000   # initial scene width; grows as the view scrolls right
+RULER_H = 24
+VIEW_MARGIN = 0.5    # fraction of the viewport materialized beyond each edge
+PLAYHEAD_GRAB = 3    # px either side of the playhead that start a playhead drag
 
 # Zoom limits
 MIN_ZOOM = 0.25
 MAX_ZOOM = 4.0
 DEFAULT_ZOOM = 1.0
+UNDO_LIMIT = 200     # undo steps kept; each step only holds its own delta
+PROFILE_REFRESH_MS = 500  # status bar update interval while profiling
+ZOOM_SETTLE_MS = 80  # exact re-layout runs once zoom input pauses this long
+STARTUP_BUDGET_MS = 250  # time-to-interactive target checked by --startup-profile
+
+
+class StartupProfile:
+    """Wall-clock marks for the startup phases, printed by --startup-profile."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.marks = [("start", _T_START)]
+
+    def mark(self, phase):
+        if self.enabled:
+            self.marks.append((phase, time.perf_counter()))
+
+    def elapsed_ms(self, phase):
+        for name, t in self.marks:
+            if name == phase:
+                return (t - _T_START) * 1000.0
+        return None
+
+    def report(self):
+        lines = ["startup profile (ms):"]
+        for (_, t0), (name, t1) in zip(self.marks, self.marks[1:]):
+            lines.append(f"  {name:<16}{(t1 - t0) * 1000.0:8.1f}")
+        tti = self.elapsed_ms("first expose")
+        if tti is not None:
+            verdict = "ok" if tti <= STARTUP_BUDGET_MS else "OVER BUDGET"
+            lines.append(f"  {'interactive at':<16}{tti:8.1f}  (budget {STARTUP_BUDGET_MS} ms, {verdict})")
+        return "\n".join(lines)
 
 
 class SingItClanker(tk.Tk):
-    def __init__(self):
+    def __init__(self, startup_profile=False, profiling=False):
+        self.profile = StartupProfile(startup_profile)
+        self.profile.mark("imports")
         super().__init__()
         self.title("Sing it Clanker — AI Piano Roll")
         self.geometry("1100x650")
@@ -129,39 +144,78 @@ class SingItClanker(tk.Tk):
         # Tempo control (BPM)
         tk.Label(toolbar, text="Tempo:").pack(side="left", padx=(8,2))
         self.tempo_var = tk.IntVar(value=PLAY_BPM)
+        # the spinbox edits the first tempo; later changes are set on the ruler
+        self.tempo_map = TempoMap.constant(PLAY_BPM)
         self.tempo_spin = tk.Spinbox(toolbar, from_=20, to=300, textvariable=self.tempo_var, width=5)
         self.tempo_spin.pack(side="left", padx=2, pady=4)
 
         # Render Audio button (placeholder)
         tk.Button(toolbar, text="Render Audio", command=self.render_audio).pack(side="left", padx=4, pady=4)
+        tk.Button(toolbar, text="Open MIDI", command=self.open_midi).pack(side="left", padx=4, pady=4)
+        tk.Button(toolbar, text="Open Project", command=self.open_project).pack(side="left", padx=4, pady=4)
+        tk.Button(toolbar, text="Save Project", command=self.save_project).pack(side="left", padx=4, pady=4)
+        tk.Button(toolbar, text="Tuning", command=self.load_tuning).pack(side="left", padx=4, pady=4)
+        tk.Button(toolbar, text="Sample Bank", command=self.load_sample_bank).pack(side="left", padx=4, pady=4)
+        # runtime instrumentation: live numbers in the status bar, trace export
+        self.profile_var = tk.BooleanVar(value=profiling)
+        tk.Checkbutton(toolbar, text="Profile", variable=self.profile_var,
+                       command=self.toggle_profiling).pack(side="left", padx=(8, 2), pady=4)
+        tk.Button(toolbar, text="Save Trace", command=self.save_trace).pack(side="left", padx=2, pady=4)
 
         # Lyrics input and assign button
         tk.Label(toolbar, text="Lyrics:").pack(side="left", padx=(8,2))
         self.lyric_var = tk.StringVar(value="")
         self.lyric_entry = tk.Entry(toolbar, textvariable=self.lyric_var, width=30)
         self.lyric_entry.pack(side="left", padx=2, pady=4)
+        # one phoneme per note, or one syllable per note with "-" melisma holds
+        self.lyric_mode_var = tk.StringVar(value="phoneme")
+        tk.OptionMenu(toolbar, self.lyric_mode_var, *lyric_align.MODES).pack(side="left", padx=2, pady=4)
         tk.Button(toolbar, text="Assign Lyrics", command=self.assign_lyrics).pack(side="left", padx=4, pady=4)
 
     # Zoom UI removed per user request
 
+        # zoom state; pixel sizes live on the instance (see update_measurements)
+        self.current_h_zoom = DEFAULT_ZOOM
+        self.current_v_zoom = DEFAULT_ZOOM
+        self.update_measurements()
+
+        # scene width in grid steps, so it survives zoom; only ever grows
+        self.scene_steps = SCENE_WIDTH / self.grid_step
+
+        # Ruler above the roll, scrolled horizontally with the main canvas
+        ruler_row = tk.Frame(self)
+        ruler_row.pack(side="top", fill="x")
+        tk.Frame(ruler_row, width=self.key_w, height=RULER_H).pack(side="left")
+        self.ruler = tk.Canvas(ruler_row, height=RULER_H, bg="#2a2a2a", highlightthickness=0,
+                               scrollregion=(0, 0, SCENE_WIDTH, RULER_H))
+        self.ruler.pack(side="left", fill="x", expand=True)
+        self.ruler.bind("<Double-Button-1>", self.edit_tempo_at)
+        # drag on the ruler to set a loop region, right-click to clear it
+        self.ruler.bind("<ButtonPress-1>", self._loop_press)
+        self.ruler.bind("<B1-Motion>", self._loop_drag)
+        self.ruler.bind("<ButtonRelease-1>", self._loop_release)
+        self.ruler.bind("<Button-3>", self.clear_loop)
+
         # Main frame with piano and canvas
         frame = tk.Frame(self)
         frame.pack(side="top", fill="both", expand=True)
 
-        self.piano = tk.Canvas(frame, width=KEY_W, bg="#e0e0e0", highlightthickness=0)
+        self.piano = tk.Canvas(frame, width=self.key_w, bg="#e0e0e0", highlightthickness=0)
         self.piano.pack(side="left", fill="y")
 
         self.canvas = tk.Canvas(frame, bg="#1f1f1f",
-                                scrollregion=(0, 0, SCENE_WIDTH, len(PITCHES)*ROW_H))
+                                scrollregion=(0, 0, SCENE_WIDTH, len(PITCHES)*self.row_h))
         self.canvas.pack(side="left", fill="both", expand=True)
 
         # Scrollbars that synchronize both canvases
-        vbar = tk.Scrollbar(frame, orient="vertical", command=self._on_vscroll)
-        hbar = tk.Scrollbar(self, orient="horizontal", command=self._on_hscroll)
-        vbar.pack(side="right", fill="y")
-        hbar.pack(side="bottom", fill="x")
-        self.canvas.config(yscrollcommand=vbar.set, xscrollcommand=hbar.set)
-        self.piano.config(yscrollcommand=vbar.set)
+        self.vbar = tk.Scrollbar(frame, orient="vertical", command=self._on_vscroll)
+        self.hbar = tk.Scrollbar(self, orient="horizontal", command=self._on_hscroll)
+        self.vbar.pack(side="right", fill="y")
+        self.hbar.pack(side="bottom", fill="x")
+        # every view change (scrollbar, wheel, moveto) re-materializes the viewport
+        self.canvas.config(yscrollcommand=self._on_canvas_yview, xscrollcommand=self._on_canvas_xview)
+        self.piano.config(yscrollcommand=self.vbar.set)
+        self.canvas.bind("<Configure>", lambda e: self.schedule_viewport())
 
         # Bindings
         self.canvas.bind("<Button-3>", self.add_note)
@@ -170,6 +224,15 @@ class SingItClanker(tk.Tk):
         self.canvas.bind("<ButtonRelease-1>", self.on_left_up)
         self.canvas.bind("<Double-1>", self.edit_lyric)
         self.bind("<Delete>", self.delete_selected)
+        # Keyboard zoom (Ctrl+wheel zooms too, see _on_mousewheel)
+        self.bind("<Control-equal>", lambda e: self._zoom_h_in())
+        self.bind("<Control-minus>", lambda e: self._zoom_h_out())
+        self.bind("<Control-plus>", lambda e: self._zoom_v_in())
+        self.bind("<Control-underscore>", lambda e: self._zoom_v_out())
+        # Undo / redo
+        self.bind("<Control-z>", self.undo)
+        self.bind("<Control-y>", self.redo)
+        self.bind("<Control-Z>", self.redo)
 
         # Make mouse wheel scroll both piano and main canvas vertically
         try:
@@ -184,29 +247,77 @@ class SingItClanker(tk.Tk):
             pass
 
         # State
-        self.notes = {}  # rect_id -> {"text": text_id, "row": row, "start_x": steps, "width_steps": steps}
-        self.selected = None
-        self.drag_mode = None
-        self.orig_coords = None
+        # the note model lives in a headless store; the canvas is a view of it
+        self.store = NoteStore()
+        self.history = History(UNDO_LIMIT)
+        # saved project and its autosave journal (None until first save/open)
+        self.project_path = None
+        self.snapshot_id = None
+        self.journal = None
+        self.note_items = {}  # note_id -> (rect_id, text_id)
+        self.item_note = {}   # rect_id / text_id -> note_id
+        self.selected = None  # primary note_id (anchor for lyrics, resize handle)
+        self.selection = set()  # every selected note_id, including self.selected
+        self.drag_mode = None   # "move", "resize" or "band"
         self.start_x = self.start_y = 0
+        # drags are applied at most once per idle cycle from the last pointer
+        # position; the store is only written on release
+        self._drag_pointer = None
+        self._drag_job = None
+        self._drag_delta = (0, 0)    # (steps, rows) currently shown
+        self._drag_bounds = None     # (min start, min row, max row, min length) of the selection
+        self._band = None            # rubber-band rectangle item
 
         self.play_line = None
         self.playing = False
         self.play_thread = None
         self.play_x = 0.0
         self.play_dragging = False
-        # playback sound state
-        self._played_notes = set()
+        # playback sound state: onsets indexed by start step, compiled on Play
+        self.timeline = EventTimeline()
         self._prev_play_x = 0.0
-
-        # zoom state
-        self.current_h_zoom = DEFAULT_ZOOM
-        self.current_v_zoom = DEFAULT_ZOOM
-
-        # Draw initial
-        self.draw_piano()
-        self.draw_grid()
-        self.play_line = self.canvas.create_line(self.play_x, 0, self.play_x, len(PITCHES)*ROW_H,
+        # one mixer/output stream for all notes; built by _init_audio once
+        # the window is up (or on first playback)
+        self.engine = None
+        self.scheduler = None
+        self.render_ahead = None   # pre-synthesizes notes ahead of the playhead
+        self.timbre = None         # synth timbre name; None = built-in additive tone
+        # loop region in grid steps, its pre-mixed buffer and snapshots of
+        # the notes edited since the region's notes were captured (filled
+        # from the UI while playing, drained by playback, which never reads
+        # the store). Edits the queue does not carry bump _loop_serial; a
+        # buffer mixed at an older serial is stale.
+        self.loop_region = None
+        self.loop_buffer = None
+        self._loop_buffer_serial = 0
+        self._loop_serial = 0
+        self._loop_edits = queue.SimpleQueue()
+        # playback's copy of the notes (render_ahead.NoteTable) and the edit
+        # snapshots made since it was taken, applied by the playback thread
+        self._play_notes = None
+        self._play_edits = queue.SimpleQueue()
+        self._loop_anchor = None
+        self.loop_rect = None
+        self._sounding = {}  # note_id -> end step of notes currently sounding
+
+        # virtualized rendering: only the viewport (plus margin) owns canvas
+        # items, and items are recycled from these pools as the view moves
+        self._note_pool = []    # hidden (rect_id, text_id) pairs
+        self._grid_rows = []
+        self._grid_lines = []
+        self._ruler_ticks = []
+        self._ruler_labels = []
+        self._ruler_tempos = []
+        self._viewport_pending = None
+        # zoom debouncing: refreshes are deferred until the input settles
+        self._zooming = False
+        self._zoom_pending = None
+        self._piano_dirty = False
+
+        # piano and grid are drawn on the first expose, see _on_first_expose
+        self._exposed = False
+        self.canvas.bind("<Expose>", self._on_first_expose, add="+")
+        self.play_line = self.canvas.create_line(self.play_x, 0, self.play_x, len(PITCHES)*self.row_h,
                                                  fill="red", width=2, tags=("playhead",))
 
         self.status = tk.Label(self, text="Right-click add note | Double-click edit lyric | Drag playhead to move", anchor="w")
@@ -217,344 +328,823 @@ class SingItClanker(tk.Tk):
 
         # protocol handler for safe shutdown
         self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.profile.mark("build window")
+        if profiling:
+            self.toggle_profiling()
+
+    def _on_first_expose(self, _=None):
+        """Draw the piano and the visible grid once the window is mapped,
+        then load the heavier backends while the UI is already usable."""
+        if self._exposed:
+            return
+        self._exposed = True
+        self.draw_piano()
+        self.refresh_viewport()
+        self.profile.mark("first expose")
+        self.after_idle(self._load_backends)
+
+    def _load_backends(self):
+        # load the G2P model off the UI thread so Assign Lyrics is instant
+        g2p_service.service.warm()
+        self._init_audio()
+        audio_backends()
+        self.profile.mark("audio backends")
+        if self.profile.enabled:
+            print(self.profile.report())
+            over = self.profile.elapsed_ms("first expose") > STARTUP_BUDGET_MS
+            self.after(0, self.on_close)
+            self._profile_exit = 1 if over else 0
+
+    def _init_audio(self):
+        """Import the audio stack and build the engine and scheduler; a no-op
+        once done."""
+        if self.engine is None:
+            from audio_engine import AudioEngine
+            from render_ahead import RenderAhead
+            from scheduler import PlaybackScheduler
+            self.engine = AudioEngine(polyphony=MAX_POLYPHONY)
+            self.scheduler = PlaybackScheduler(self.engine.clock, self.timeline, self.engine.sample_rate)
+            self.render_ahead = RenderAhead()
+        return self.engine
 
     def draw_piano(self):
         self.piano.delete("all")
         y = 0
         for p in PITCHES:
             color = "#fff" if "#" not in p else "#d0d0d0"
-            self.piano.create_rectangle(0, y, KEY_W, y+ROW_H, fill=color, outline="#aaa")
-            self.piano.create_text(KEY_W/2, y+ROW_H/2, text=p, font=("Arial", 9))
-            y += ROW_H
-
-    def draw_grid(self):
-        self.canvas.delete("grid")
-        height = len(PITCHES) * ROW_H
-        for i in range(len(PITCHES)):
-            y = i * ROW_H
+            self.piano.create_rectangle(0, y, self.key_w, y+self.row_h, fill=color, outline="#aaa")
+            self.piano.create_text(self.key_w/2, y+self.row_h/2, text=p, font=("Arial", 9))
+            y += self.row_h
+
+    @property
+    def scene_width(self):
+        return self.scene_steps * self.grid_step
+
+    def _view_bounds(self):
+        """Visible canvas rectangle widened by VIEW_MARGIN on every side."""
+        w = max(1, self.canvas.winfo_width())
+        h = max(1, self.canvas.winfo_height())
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        mx, my = w * VIEW_MARGIN, h * VIEW_MARGIN
+        return x0 - mx, y0 - my, x0 + w + mx, y0 + h + my
+
+    def _grow_scene(self, right_px):
+        """Extend the scene so there is always room to scroll right and to
+        hold every note."""
+        need = max(right_px / self.grid_step, self.store.duration() + 16)
+        if need <= self.scene_steps:
+            return
+        self.scene_steps = need + 16
+        height = len(PITCHES) * self.row_h
+        self.canvas.config(scrollregion=(0, 0, self.scene_width, height))
+        self.ruler.config(scrollregion=(0, 0, self.scene_width, RULER_H))
+
+    def schedule_viewport(self):
+        """Coalesce viewport refreshes to one per idle cycle."""
+        if self._zooming or self.drag_mode in ("move", "resize"):
+            # _zoom_settle / on_left_up refresh once the gesture ends
+            return
+        if self._viewport_pending is None:
+            self._viewport_pending = self.after_idle(self.refresh_viewport)
+
+    def refresh_viewport(self):
+        self._viewport_pending = None
+        with profiler.span("refresh_viewport", "canvas"):
+            x0, y0, x1, y1 = self._view_bounds()
+            self._grow_scene(x1)
+            self.draw_grid(x0, y0, x1, y1)
+            self._draw_visible_notes(x0, y0, x1, y1)
+        if profiler.enabled:
+            profiler.counter("canvas", items=len(self.canvas.find_all()), notes_drawn=len(self.note_items))
+
+    @staticmethod
+    def _sync_pool(canvas, pool, count, create):
+        """Grow pool to at least count items, hide the surplus, and return
+        the first count items for the caller to position."""
+        while len(pool) < count:
+            pool.append(create())
+        for item in pool[count:]:
+            canvas.itemconfig(item, state="hidden")
+        return pool[:count]
+
+    def draw_grid(self, x0=None, y0=None, x1=None, y1=None):
+        """Position pooled row bands and step lines over the visible region."""
+        if x0 is None:
+            x0, y0, x1, y1 = self._view_bounds()
+        height = len(PITCHES) * self.row_h
+        xa = max(0.0, x0)
+        xb = min(self.scene_width, x1)
+        r0 = max(0, int(y0 // self.row_h))
+        r1 = min(len(PITCHES), int(y1 // self.row_h) + 1)
+
+        def new_row():
+            item = self.canvas.create_rectangle(0, 0, 0, 0, outline="", tags="grid")
+            self.canvas.tag_lower(item)
+            return item
+
+        rows = self._sync_pool(self.canvas, self._grid_rows, max(0, r1 - r0), new_row)
+        for k, item in enumerate(rows):
+            i = r0 + k
+            y = i * self.row_h
             fill = "#222" if i % 2 == 0 else "#242424"
-            self.canvas.create_rectangle(0, y, SCENE_WIDTH, y+ROW_H, fill=fill, outline="", tags="grid")
-        for x in range(0, SCENE_WIDTH, GRID_STEP):
-            self.canvas.create_line(x, 0, x, height, fill="#333", tags="grid")
+            self.canvas.coords(item, xa, y, xb, y+self.row_h)
+            self.canvas.itemconfig(item, fill=fill, state="normal")
+
+        def new_line():
+            item = self.canvas.create_line(0, 0, 0, 0, fill="#333", tags="grid")
+            self.canvas.tag_lower(item)
+            return item
+
+        s0 = int(xa // self.grid_step) + (1 if xa % self.grid_step else 0)
+        s1 = int(xb // self.grid_step)
+        if s1 * self.grid_step >= self.scene_width:
+            s1 -= 1
+        lines = self._sync_pool(self.canvas, self._grid_lines, max(0, s1 - s0 + 1), new_line)
+        for k, item in enumerate(lines):
+            x = (s0 + k) * self.grid_step
+            self.canvas.coords(item, x, 0, x, height)
+            self.canvas.itemconfig(item, state="normal")
+        # keep row bands underneath the step lines
+        for item in rows:
+            self.canvas.tag_lower(item)
         # draw ruler alongside grid
         try:
-            self.draw_ruler()
+            self.draw_ruler(x0, x1)
         except Exception:
             pass
 
-    def draw_ruler(self):
-        """Draw a horizontal ruler where each GRID_STEP == a 16th note.
-        Labels show bar numbers (every 16 steps = 1 bar in 4/4)."""
-        self.ruler.delete("all")
-        rh = int(self.ruler['height']) if 'height' in self.ruler.keys() else 24
-        # ensure scrollregion matches scene width
-        self.ruler.config(scrollregion=(0, 0, SCENE_WIDTH, rh))
-        steps = int(SCENE_WIDTH // GRID_STEP) + 1
-        for s in range(steps):
-            x = s * GRID_STEP
-            # major tick and label every 16 steps (one bar of 16 16th-notes)
+    def draw_ruler(self, x0=None, x1=None):
+        """Draw a horizontal ruler where each grid step == a 16th note.
+        Labels show bar numbers (every 16 steps = 1 bar in 4/4).
+        Only ticks inside the visible range are materialized."""
+        if x0 is None:
+            x0, _, x1, _ = self._view_bounds()
+        rh = RULER_H
+        s0 = max(0, int(x0 // self.grid_step))
+        s1 = int(min(x1, self.scene_width) // self.grid_step)
+        steps = range(s0, s1 + 1)
+        bars = [s for s in steps if s % 16 == 0]
+        ticks = self._sync_pool(self.ruler, self._ruler_ticks, len(steps),
+                                lambda: self.ruler.create_line(0, 0, 0, 0))
+        for item, s in zip(ticks, steps):
+            x = s * self.grid_step
             if s % 16 == 0:
-                bar = s // 16 + 1
-                # longer tick
-                self.ruler.create_line(x, rh, x, 4, fill="#666", width=2)
-                # label slightly inset
-                self.ruler.create_text(x + 4, rh/2, text=str(bar), anchor="w", fill="#ddd", font=("Arial", 9))
+                # longer tick for the start of a bar
+                self.ruler.coords(item, x, rh, x, 4)
+                self.ruler.itemconfig(item, fill="#666", width=2, state="normal")
             else:
                 # short tick for other steps
-                self.ruler.create_line(x, rh, x, rh-8, fill="#444")
+                self.ruler.coords(item, x, rh, x, rh-8)
+                self.ruler.itemconfig(item, fill="#444", width=1, state="normal")
+        labels = self._sync_pool(self.ruler, self._ruler_labels, len(bars),
+                                 lambda: self.ruler.create_text(0, 0, anchor="w", fill="#ddd", font=("Arial", 9)))
+        for item, s in zip(labels, bars):
+            # label slightly inset
+            self.ruler.coords(item, s * self.grid_step + 4, rh/2)
+            self.ruler.itemconfig(item, text=str(s // 16 + 1), state="normal")
+        self._draw_loop_rect()
+        changes = [(s, b) for s, b in self.tempo_map if x0 <= s * self.grid_step <= x1]
+        marks = self._sync_pool(self.ruler, self._ruler_tempos, len(changes),
+                                lambda: self.ruler.create_text(0, 0, anchor="sw", fill="#e8a040", font=("Arial", 8)))
+        for item, (s, bpm) in zip(marks, changes):
+            self.ruler.coords(item, s * self.grid_step + 2, rh)
+            self.ruler.itemconfig(item, text=f"\u2669={bpm:g}", state="normal")
+
+    def _draw_loop_rect(self):
+        if self.loop_region is None:
+            if self.loop_rect is not None:
+                self.ruler.itemconfig(self.loop_rect, state="hidden")
+            return
+        a, b = self.loop_region
+        if self.loop_rect is None:
+            self.loop_rect = self.ruler.create_rectangle(0, 0, 0, 0, fill="#35597f", outline="#6fa0d8")
+        self.ruler.coords(self.loop_rect, a * self.grid_step, 1, b * self.grid_step, RULER_H - 1)
+        self.ruler.itemconfig(self.loop_rect, state="normal")
+        self.ruler.tag_lower(self.loop_rect)
+
+    def _loop_press(self, e):
+        self._loop_anchor = round(self.ruler.canvasx(e.x) / self.grid_step)
+
+    def _loop_drag(self, e):
+        if self._loop_anchor is None:
+            return
+        step = max(0, round(self.ruler.canvasx(e.x) / self.grid_step))
+        a, b = sorted((self._loop_anchor, step))
+        if b > a and (a, b) != self.loop_region:
+            self.loop_region = (float(a), float(b))
+            self._drain_loop_edits()
+            self._draw_loop_rect()
+
+    def _loop_release(self, e):
+        if self._loop_anchor is None:
+            return
+        self._loop_anchor = None
+        if self.loop_region is not None:
+            a, b = self.loop_region
+            self.status.config(text=f"Loop steps {a:g}-{b:g}; Play repeats it, right-click the ruler to clear")
+
+    def clear_loop(self, _=None):
+        self.loop_region = None
+        self.loop_buffer = None
+        self._drain_loop_edits()
+        self._draw_loop_rect()
+        self.status.config(text="Loop cleared")
+
+    def edit_tempo_at(self, e):
+        """Double-click on the ruler: set, change or (with 0) remove the
+        tempo change at that step."""
+        step = float(int(self.ruler.canvasx(e.x) // self.grid_step))
+        tm = self._tempo_map()
+        current = tm.bpm_at(step)
+        bpm = simpledialog.askfloat("Tempo", f"BPM from step {step:g} (0 removes a change):",
+                                    initialvalue=current, minvalue=0, maxvalue=999, parent=self)
+        if bpm is None:
+            return
+        if step == 0:
+            if bpm > 0:
+                self.set_tempo_map(tm.with_initial(bpm))
+        elif bpm > 0:
+            self.set_tempo_map(tm.with_change(step, bpm))
+        else:
+            self.set_tempo_map(tm.without_change(step))
+
+    def set_tempo_map(self, tempo_map):
+        """Install a new tempo map; playback re-anchors on its next tick."""
+        self.tempo_map = tempo_map
+        self.tempo_var.set(int(round(tempo_map.initial_bpm)))
+        try:
+            self.draw_ruler()
+        except Exception:
+            pass
+        if len(tempo_map) > 1:
+            self.status.config(text=f"Tempo map: {len(tempo_map)} tempos, "
+                                    f"{min(tempo_map.bpms):g}-{max(tempo_map.bpms):g} BPM")
+        else:
+            self.status.config(text=f"Tempo: {tempo_map.initial_bpm:g} BPM")
+
+    def _draw_visible_notes(self, x0, y0, x1, y1):
+        """Materialize notes inside the region and recycle the rest."""
+        store = self.store
+        r0 = y0 // self.row_h
+        r1 = y1 // self.row_h
+        visible = {nid for nid in store.overlapping(max(0.0, x0 / self.grid_step), x1 / self.grid_step)
+                   if r0 <= store.row[nid] <= r1}
+        for nid in [n for n in self.note_items if n not in visible]:
+            self._release_note(nid)
+        for nid in visible:
+            if nid not in self.note_items:
+                self._draw_note(nid)
 
     def snap_x(self, x):
-        return int(round(x / GRID_STEP)) * GRID_STEP
+        return int(round(x / self.grid_step)) * self.grid_step
 
     def snap_y(self, y):
-        return int(y // ROW_H) * ROW_H
+        return int(y // self.row_h) * self.row_h
 
     # Notes
+    def note_coords(self, nid):
+        """Pixel rectangle of a note from its grid position in the store."""
+        x1 = self.store.start[nid] * self.grid_step
+        x2 = x1 + self.store.length[nid] * self.grid_step
+        y = self.store.row[nid] * self.row_h
+        return x1, y + 2, x2, y + self.note_h + 2
+
+    def _draw_note(self, nid):
+        """Give a note canvas items, reusing a pooled pair when available."""
+        x1, y1, x2, y2 = self.note_coords(nid)
+        width = 3 if nid in self.selection else 2
+        if self._note_pool:
+            rect, text = self._note_pool.pop()
+            self.canvas.coords(rect, x1, y1, x2, y2)
+            self.canvas.coords(text, (x1 + x2) / 2, (y1 + y2) / 2)
+            self.canvas.itemconfig(rect, width=width, state="normal")
+            self.canvas.itemconfig(text, text=self.store.lyric(nid), state="normal")
+            self.canvas.tag_raise(rect)
+            self.canvas.tag_raise(text)
+        else:
+            rect = self.canvas.create_rectangle(x1, y1, x2, y2,
+                                                fill="#4fc3f7", outline="#003c46", width=width, tags=("note",))
+            text = self.canvas.create_text((x1 + x2) / 2, (y1 + y2) / 2, text=self.store.lyric(nid),
+                                           fill="#003c46", font=("Arial", 10), tags=("note_text",))
+        self.note_items[nid] = (rect, text)
+        self.item_note[rect] = nid
+        self.item_note[text] = nid
+
+    def _release_note(self, nid):
+        """Hide a note's canvas items and return them to the pool."""
+        items = self.note_items.pop(nid, None)
+        if items is None:
+            return
+        rect, text = items
+        self.item_note.pop(rect, None)
+        self.item_note.pop(text, None)
+        self.canvas.itemconfig(rect, state="hidden")
+        self.canvas.itemconfig(text, state="hidden")
+        self._note_pool.append(items)
+
+    def _place_note(self, nid):
+        rect, text = self.note_items[nid]
+        x1, y1, x2, y2 = self.note_coords(nid)
+        self.canvas.coords(rect, x1, y1, x2, y2)
+        self.canvas.coords(text, (x1 + x2) / 2, (y1 + y2) / 2)
+
+    def _note_at(self, x, y, slack_px=0):
+        """Note under canvas point (x, y) from the store's row index; the
+        note's right edge is widened by slack_px. Prefers selected notes,
+        then the most recently added one (drawn on top)."""
+        row = int(y // self.row_h)
+        top = row * self.row_h + 2
+        if not (top <= y <= top + self.note_h):
+            return None
+        ids = self.store.notes_at(row, x / self.grid_step, slack_px / self.grid_step)
+        if not ids:
+            return None
+        if self.selected in ids:
+            return self.selected
+        picked = [n for n in ids if n in self.selection]
+        return max(picked or ids)
+
+    def replace_notes(self, notes):
+        """Swap the whole project for (row, start, length, velocity, lyric)
+        tuples: one bulk store insert, then one viewport refresh."""
+        self._clear_view()
+        self.history.clear()
+        self.store.clear()
+        self.store.add_many(notes)
+        self.timeline.compile((k[0], k[2]) for k in self.store.sorted_keys())
+        self.refresh_viewport()
+
+    def _clear_view(self):
+        self.stop()
+        self.loop_buffer = None
+        for nid in list(self.note_items):
+            self._release_note(nid)
+        self.selection = set()
+        self.selected = None
+
+    def _attach_journal(self, path, snapshot_id):
+        """Send every further store edit to the project's journal."""
+        self._detach_journal()
+        self.journal = project_file.Journal(path, snapshot_id)
+        self.store.journal = self.journal
+
+    def _detach_journal(self):
+        if self.journal is not None:
+            self.store.journal = None
+            self.journal.close()
+            self.journal = None
+
+    def _close_project(self):
+        """Stop journaling to the open project and forget it, so notes
+        loaded from elsewhere are neither replayed into it nor saved over
+        it without asking for a file."""
+        self._detach_journal()
+        self.project_path = None
+        self.snapshot_id = None
+
+    def open_project(self):
+        path = filedialog.askopenfilename(filetypes=[('Sing it Clanker projects', '*.sicp'), ('All files', '*.*')],
+                                          title='Open Project')
+        if not path:
+            return
+        try:
+            store, tempo, snapshot_id, replayed = project_file.open_project(path)
+        except Exception as ex:
+            messagebox.showerror("Open Project", f"Could not open {os.path.basename(path)}:\n{ex}")
+            return
+        self._detach_journal()
+        self._clear_view()
+        self.history.clear()
+        self.store = store
+        self.project_path = path
+        self.snapshot_id = snapshot_id
+        self._attach_journal(path, snapshot_id)
+        self.timeline.compile((k[0], k[2]) for k in store.sorted_keys())
+        self.set_tempo_map(tempo)
+        self.refresh_viewport()
+        msg = f"Opened {os.path.basename(path)}: {len(store)} note(s)"
+        if replayed:
+            msg += f", recovered {replayed} unsaved edit(s) from the journal"
+        self.status.config(text=msg)
+
+    def save_project(self):
+        path = self.project_path
+        if not path:
+            path = filedialog.asksaveasfilename(defaultextension='.sicp',
+                                                filetypes=[('Sing it Clanker projects', '*.sicp')],
+                                                title='Save Project as')
+            if not path:
+                return
+        # the journal must be flushed and closed before the snapshot resets it
+        self._detach_journal()
+        try:
+            snapshot_id = project_file.save(self.store, path, self._tempo_map())
+        except Exception as ex:
+            # keep journaling against the snapshot that is still on disk
+            if self.project_path:
+                self._attach_journal(self.project_path, self.snapshot_id)
+            messagebox.showerror("Save Project", f"Could not save {os.path.basename(path)}:\n{ex}")
+            return
+        self.project_path = path
+        self.snapshot_id = snapshot_id
+        self._attach_journal(path, snapshot_id)
+        self.status.config(text=f"Saved {os.path.basename(path)} ({len(self.store)} note(s)); edits autosave to the journal")
+
+    def open_midi(self):
+        path = filedialog.askopenfilename(filetypes=[('MIDI files', '*.mid *.midi'), ('All files', '*.*')],
+                                          title='Open MIDI')
+        if not path:
+            return
+        try:
+            data = midi_reader.read_midi(path)
+        except Exception as ex:
+            messagebox.showerror("Open MIDI", f"Could not read {os.path.basename(path)}:\n{ex}")
+            return
+        notes, skipped = song_io.midi_to_notes(data)
+        self._close_project()
+        self.replace_notes(notes)
+        self.set_tempo_map(song_io.midi_tempo_map(data))
+        msg = f"Loaded {len(notes)} note(s) from {os.path.basename(path)}"
+        if skipped:
+            msg += f" ({skipped} outside {PITCHES[-1]}-{PITCHES[0]} skipped)"
+        self.status.config(text=msg)
+
+    def load_tuning(self):
+        """Pick a Scala .scl scale; a .kbm keyboard mapping with the same
+        name next to it is used too. Cancelling while a scale is loaded
+        offers to go back to equal temperament."""
+        path = filedialog.askopenfilename(filetypes=[('Scala scales', '*.scl'), ('All files', '*.*')],
+                                          title='Load tuning')
+        if not path:
+            if tuning.current != tuning.EQUAL and messagebox.askyesno(
+                    "Tuning", f"Return from {tuning.current} to {tuning.EQUAL}?"):
+                tuning.reset()
+                self.status.config(text=f"Tuning: {tuning.EQUAL}")
+            return
+        kbm = os.path.splitext(path)[0] + '.kbm'
+        try:
+            name = tuning.load_scala(path, kbm if os.path.exists(kbm) else None)
+        except Exception as ex:
+            messagebox.showerror("Tuning", f"Could not load {os.path.basename(path)}:\n{ex}")
+            return
+        self.status.config(text=f"Tuning: {name}")
+
+    def load_sample_bank(self):
+        """Pick a sample-bank directory (WAVs plus optional keymap.json) as
+        the voice for playback and audio export. Cancelling while a bank
+        is loaded offers to go back to the built-in tone."""
+        path = filedialog.askdirectory(title='Sample bank directory', mustexist=True)
+        if not path:
+            if self.timbre is not None and messagebox.askyesno("Sample Bank", "Return to the built-in tone?"):
+                self.timbre = None
+                self.status.config(text="Voice: built-in tone")
+            return
+        import sampler
+        try:
+            bank = sampler.load_bank(path)
+        except Exception as ex:
+            messagebox.showerror("Sample Bank", f"Could not load {os.path.basename(path)}:\n{ex}")
+            return
+        self.timbre = sampler.timbre_for(path)
+        self.status.config(text=f"Voice: {bank.name} ({len(bank.zones)} sample(s), "
+                                f"{bank.seconds:.1f} s mapped)")
+
+    def _timbre(self):
+        from synth import DEFAULT_TIMBRE   # audio stack, see _init_audio
+        return self.timbre or DEFAULT_TIMBRE
+
     def add_note(self, event):
         x = self.snap_x(self.canvas.canvasx(event.x))
         y = self.snap_y(self.canvas.canvasy(event.y))
-        rect = self.canvas.create_rectangle(x, y+2, x+GRID_STEP, y+NOTE_H+2,
-                                            fill="#4fc3f7", outline="#003c46", width=2, tags=("note",))
-        text = self.canvas.create_text(x + GRID_STEP/2, y+NOTE_H/2+2, text="", fill="#003c46", font=("Arial", 10), tags=("note_text",))
         # store grid-based positions so zoom/redraw can recompute pixels
-        self.notes[rect] = {"text": text, "row": int(y // ROW_H), "start_x": int(x // GRID_STEP), "width_steps": 1}
-        self.select(rect)
-
-    def select(self, rect):
-        if self.selected and self.selected in self.canvas.find_all():
-            try:
-                self.canvas.itemconfig(self.selected, width=1)
-            except Exception:
-                pass
-        self.selected = rect
-        if rect:
-            self.canvas.tag_raise(rect)
-            self.canvas.itemconfig(rect, width=3)
+        nid = self.store.add(int(y // self.row_h), int(x // self.grid_step), 1)
+        self._draw_note(nid)
+        self.timeline.insert(nid, self.store.start[nid])
+        if self.render_ahead is not None:
+            self.render_ahead.invalidate()
+        self._notes_edited((nid,))
+        self.history.push(AddNotes(self.store, [nid]))
+        self.select(nid)
+
+    def select(self, nid, add=False):
+        """Select a single note, or with add=True toggle it in the selection."""
+        if not add:
+            self.set_selection(() if nid is None else (nid,), primary=nid)
+        elif nid in self.selection:
+            rest = self.selection - {nid}
+            primary = self.selected if self.selected != nid else (max(rest) if rest else None)
+            self.set_selection(rest, primary=primary)
+        elif nid is not None:
+            self.set_selection(self.selection | {nid}, primary=nid)
+
+    def set_selection(self, ids, primary=None):
+        ids = set(ids)
+        for nid in self.selection - ids:
+            if nid in self.note_items:
+                try:
+                    self.canvas.itemconfig(self.note_items[nid][0], width=1)
+                except Exception:
+                    pass
+        for nid in ids - self.selection:
+            if nid in self.note_items:
+                rect, text = self.note_items[nid]
+                self.canvas.tag_raise(rect)
+                self.canvas.tag_raise(text)
+                self.canvas.itemconfig(rect, width=3)
+        self.selection = ids
+        if primary is None and ids:
+            primary = max(ids)
+        self.selected = primary
 
     def edit_lyric(self, event):
         x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
-        hits = self.canvas.find_overlapping(x, y, x, y)
-        for item in hits:
-            if item in self.notes:
-                text_id = self.notes[item]["text"]
-                cur_text = self.canvas.itemcget(text_id, "text")
-                new = simpledialog.askstring("Edit Lyric", "Enter lyric:", initialvalue=cur_text, parent=self)
-                if new is not None:
-                    self.canvas.itemconfig(text_id, text=new)
-                return
-    def text_to_phonemes(self, text: str):
-        """Convert input text to a list of phoneme tokens using G2P.
-
-        Preference order:
-        1. `g2p_en` (best if installed)
-        2. `pronouncing` (CMUdict lookup)
-        3. fallback to simple grapheme split (characters)
-        """
-        if not text:
-            return []
-        words = text.strip().split()
-
-        # Try g2p_en first
-        try:
-            from g2p_en import G2p
-            g2p = G2p()
-            phonemes = []
-            for w in words:
-                toks = g2p(w)
-                # g2p returns a list; filter empty/space tokens
-                toks = [t for t in toks if t and not t.isspace()]
-                if toks:
-                    phonemes.extend(toks)
-                else:
-                    phonemes.extend(list(w))
-            return phonemes
-        except Exception:
-            pass
+        nid = self._note_at(x, y)
+        if nid is None:
+            return
+        cur_text = self.store.lyric(nid)
+        new = simpledialog.askstring("Edit Lyric", "Enter lyric:", initialvalue=cur_text, parent=self)
+        if new is not None:
+            self._run(SetLyrics(self.store, [(nid, new)]))
 
-        # Next try pronouncing (CMUdict) as a lighter-weight fallback
-        try:
-            import pronouncing
-            phonemes = []
-            for w in words:
-                phones = pronouncing.phones_for_word(w.lower())
-                if phones:
-                    phonemes.extend(phones[0].split())
-                else:
-                    phonemes.extend(list(w))
-            return phonemes
-        except Exception:
-            # Final fallback: split into characters (graphemes)
-            out = []
-            for w in words:
-                out.extend(list(w))
-            return out
+    def text_to_phonemes(self, text: str):
+        """Convert input text to a list of phoneme tokens using the shared
+        G2P service (g2p_en, then pronouncing, then graphemes)."""
+        return g2p_service.service.text_to_phonemes(text)
 
     def assign_lyrics(self):
-        """Assign phoneme tokens from the lyrics entry to notes.
+        """Assign the lyrics entry to notes in chronological order.
 
         Mapping rules:
-        - Phonemes are assigned to consecutive notes ordered by start_x (then row).
+        - Units (phonemes, or syllables in syllable mode) go to consecutive
+          notes ordered by start (then row); a "-" or "_" holds the previous
+          syllable over the next note.
         - If a note is selected, assignment starts from that note; otherwise from first note.
-        - If phonemes exceed remaining notes, assignment stops when notes run out.
+        - If units exceed remaining notes, assignment stops when notes run out.
+        Results are reported in the status bar; nothing blocks with a dialog.
         """
         lyrics = self.lyric_var.get().strip()
         if not lyrics:
-            messagebox.showinfo("Assign Lyrics", "No lyrics provided.")
+            self.status.config(text="Assign Lyrics: no lyrics provided.")
             return
-        phonemes = self.text_to_phonemes(lyrics)
-        if not phonemes:
-            messagebox.showinfo("Assign Lyrics", "No phonemes generated from input.")
+        keys = self.store.sorted_keys()
+        if not keys:
+            self.status.config(text="Assign Lyrics: no notes to assign lyrics to.")
             return
-
-        # If the extracted token count is suspiciously low (e.g. one token per word),
-        # try a per-word expansion to get finer-grained tokens.
-        words = lyrics.split()
-        try:
-            if len(phonemes) <= len(words):
-                alt = []
-                # try pronouncing per-word expansion
-                try:
-                    import pronouncing
-                    for w in words:
-                        phones = pronouncing.phones_for_word(w.lower())
-                        if phones:
-                            alt.extend(phones[0].split())
-                        else:
-                            alt.extend(list(w))
-                except Exception:
-                    # try g2p per-word
-                    try:
-                        from g2p_en import G2p
-                        g2p = G2p()
-                        for w in words:
-                            toks = [t for t in g2p(w) if t and not t.isspace()]
-                            if toks:
-                                alt.extend(toks)
-                            else:
-                                alt.extend(list(w))
-                    except Exception:
-                        # final fallback to characters
-                        for w in words:
-                            alt.extend(list(w))
-
-                if len(alt) > len(phonemes):
-                    phonemes = alt
-        except Exception:
-            pass
-
-        # Debug: show tokens to the user so they can see what will be assigned
-        try:
-            dbg = ", ".join(str(p) for p in phonemes[:200])
-            messagebox.showinfo("Assign Lyrics - Tokens", f"First tokens: {dbg}")
-        except Exception:
-            pass
-
-        # Sort notes by start_x then row to get chronological ordering
-        notes_sorted = sorted(self.notes.items(), key=lambda it: (it[1]["start_x"], it[1]["row"]))
-        if not notes_sorted:
-            messagebox.showinfo("Assign Lyrics", "No notes available to assign lyrics to.")
+        with profiler.span("lyric units", "g2p") as span:
+            units = lyric_align.lyric_units(lyrics, g2p_service.service.word_phonemes,
+                                            self.lyric_mode_var.get())
+            span.set(units=len(units))
+        if not units:
+            self.status.config(text="Assign Lyrics: no phonemes generated from input.")
             return
 
-        rects = [r for r, _ in notes_sorted]
         start_idx = 0
-        if self.selected and self.selected in rects:
-            start_idx = rects.index(self.selected)
+        if self.selected is not None and self.selected in self.store:
+            start_idx = self.store.rank(self.selected)
+        pairs = lyric_align.align(units, keys, start_idx)
 
-        assigned = 0
-        for i, ph in enumerate(phonemes):
-            idx = start_idx + i
-            if idx >= len(rects):
-                break
-            rect_id, info = notes_sorted[idx]
-            text_id = info["text"]
-            try:
-                self.canvas.itemconfig(text_id, text=ph)
-                assigned += 1
-            except Exception:
-                pass
+        # one batched store update (and undo step); only materialized notes
+        # have text items to change
+        self._run(SetLyrics(self.store, pairs))
 
-        messagebox.showinfo("Assign Lyrics", f"Assigned {assigned} phoneme(s) starting at note #{start_idx+1}.")
+        stats = g2p_service.service.stats()
+        self.status.config(text=f"Assigned {len(pairs)} of {len(units)} lyric unit(s) from note #{start_idx+1} | "
+                                f"G2P ({stats['backend']}) hit rate {stats['hit_rate']:.0%}, "
+                                f"{stats['misses']} miss(es)")
 
     # Dragging
     def on_left_down(self, e):
         x = self.canvas.canvasx(e.x); y = self.canvas.canvasy(e.y)
-        hits = self.canvas.find_overlapping(x, y, x, y)
 
         # check playhead first
-        for item in hits:
-            if "playhead" in self.canvas.gettags(item):
-                self.play_dragging = True
-                self.stop()
-                return
+        if abs(x - self.play_x) <= PLAYHEAD_GRAB:
+            self.play_dragging = True
+            self.stop()
+            return
 
-        rect = next((i for i in hits if i in self.notes), None)
-        if rect:
-            self.select(rect)
-            x1, y1, x2, y2 = self.canvas.coords(rect)
-            if (x2 - 8) <= x <= (x2 + 4):
-                self.drag_mode = "resize"
-            else:
-                self.drag_mode = "move"
-            self.start_x, self.start_y = x, y
-            self.orig_coords = (x1, y1, x2, y2)
+        shift = bool(e.state & 0x0001)
+        self.start_x, self.start_y = x, y
+        self._drag_pointer = (x, y)
+        self._drag_delta = (0, 0)
+
+        # the resize handle reaches a few px past the note's right edge
+        nid = self._note_at(x, y, slack_px=4)
+        if nid is None:
+            # empty space: start a rubber band (shift extends the selection)
+            if not shift:
+                self.select(None)
+            self.drag_mode = "band"
+            if self._band is None:
+                self._band = self.canvas.create_rectangle(x, y, x, y, outline="#ddd", dash=(3, 3),
+                                                          tags=("band",))
+            self.canvas.coords(self._band, x, y, x, y)
+            self.canvas.itemconfig(self._band, state="normal")
+            self.canvas.tag_raise(self._band)
+            return
+
+        if shift:
+            self.select(nid, add=True)
+            if nid not in self.selection:
+                return
+        elif nid not in self.selection:
+            self.select(nid)
         else:
-            self.select(None)
+            self.selected = nid
+        x1, y1, x2, y2 = self.note_coords(nid)
+        self.drag_mode = "resize" if (x2 - 8) <= x <= (x2 + 4) else "move"
+        store = self.store
+        sel = self.selection
+        self._drag_bounds = (min(store.start[n] for n in sel),
+                             min(store.row[n] for n in sel),
+                             max(store.row[n] for n in sel),
+                             min(store.length[n] for n in sel))
+        # one tag lets a whole selection move with a single canvas call
+        for n in sel:
+            items = self.note_items.get(n)
+            if items:
+                self.canvas.addtag_withtag("dragging", items[0])
+                self.canvas.addtag_withtag("dragging", items[1])
 
     def on_drag(self, e):
-        x = self.canvas.canvasx(e.x); y = self.canvas.canvasy(e.y)
+        self._drag_pointer = (self.canvas.canvasx(e.x), self.canvas.canvasy(e.y))
+        if self._drag_job is None and (self.play_dragging or self.drag_mode):
+            self._drag_job = self.after_idle(self._apply_drag)
+
+    def _apply_drag(self):
+        """Show the latest pointer position; runs at most once per idle cycle."""
+        self._drag_job = None
+        x, y = self._drag_pointer
 
         if self.play_dragging:
-            self.play_x = max(0.0, min(SCENE_WIDTH, x))
-            self.canvas.coords(self.play_line, self.play_x, 0, self.play_x, len(PITCHES)*ROW_H)
+            self.play_x = max(0.0, min(self.scene_width, x))
+            self.canvas.coords(self.play_line, self.play_x, 0, self.play_x, len(PITCHES)*self.row_h)
             self.status.config(text=f"Playhead px={int(self.play_x)}")
             return
 
-        if not self.selected or not self.drag_mode:
+        if self.drag_mode == "band":
+            self.canvas.coords(self._band, self.start_x, self.start_y, x, y)
             return
 
-        dx = x - self.start_x
-        dy = y - self.start_y
-        x1, y1, x2, y2 = self.orig_coords
-        rect = self.selected
-        txt = self.notes[rect]["text"]
+        if not self.drag_mode or not self.selection:
+            return
 
+        min_start, min_row, max_row, min_len = self._drag_bounds
+        steps = int(round((x - self.start_x) / self.grid_step))
         if self.drag_mode == "move":
-            new_x = self.snap_x(x1 + dx)
-            new_y = self.snap_y(y1 + dy)
-            w = x2 - x1
-            new_x = max(0, min(SCENE_WIDTH - w, new_x))
-            new_y = max(0, min(len(PITCHES)*ROW_H - NOTE_H, new_y))
-            self.canvas.coords(rect, new_x, new_y, new_x + w, new_y + NOTE_H)
-            self.canvas.coords(txt, new_x + w/2, new_y + NOTE_H/2)
-            # update stored grid positions
-            self.notes[rect]["start_x"] = int(new_x // GRID_STEP)
-            self.notes[rect]["row"] = int(new_y // ROW_H)
+            # the earliest note may move back to step 0, not past it
+            steps = max(-math.floor(min_start), steps)
+            rows = int(round((y - self.start_y) / self.row_h))
+            rows = max(-min_row, min(len(PITCHES) - 1 - max_row, rows))
+            shown_steps, shown_rows = self._drag_delta
+            if (steps, rows) != (shown_steps, shown_rows):
+                self.canvas.move("dragging", (steps - shown_steps) * self.grid_step, (rows - shown_rows) * self.row_h)
+            self._drag_delta = (steps, rows)
+            self.status.config(text=f"Move {len(self.selection)} note(s) by {steps:+d} steps, {rows:+d} rows")
         else:
-            new_x2 = max(x1 + NOTE_MIN_W, self.snap_x(x2 + dx))
-            new_x2 = min(SCENE_WIDTH, new_x2)
-            self.canvas.coords(rect, x1, y1, new_x2, y2)
-            self.canvas.coords(txt, (x1 + new_x2) / 2, y1 + NOTE_H/2)
-            # update width in grid steps
-            self.notes[rect]["width_steps"] = max(1, int((new_x2 - x1) // GRID_STEP))
+            # fractional lengths (MIDI import) may shrink while still > 0
+            steps = max(1 - math.ceil(min_len), steps)
+            if steps != self._drag_delta[0]:
+                for nid in self.selection:
+                    items = self.note_items.get(nid)
+                    if items is None:
+                        continue
+                    x1, y1, x2, y2 = self.note_coords(nid)
+                    x2 += steps * self.grid_step
+                    self.canvas.coords(items[0], x1, y1, x2, y2)
+                    self.canvas.coords(items[1], (x1 + x2) / 2, (y1 + y2) / 2)
+            self._drag_delta = (steps, 0)
+            self.status.config(text=f"Resize {len(self.selection)} note(s) by {steps:+d} steps")
 
     def on_left_up(self, e):
-        self.drag_mode = None
+        if self._drag_job is not None:
+            self.after_cancel(self._drag_job)
+            self._apply_drag()
+        mode, self.drag_mode = self.drag_mode, None
         if self.play_dragging:
             self.play_dragging = False
             self.status.config(text=f"Playhead set to px={int(self.play_x)}")
+        elif mode == "band":
+            self.canvas.itemconfig(self._band, state="hidden")
+            x0, x1 = sorted((self.start_x, self._drag_pointer[0]))
+            y0, y1 = sorted((self.start_y, self._drag_pointer[1]))
+            if x1 - x0 < 2 and y1 - y0 < 2:
+                return
+            r0, r1 = int(y0 // self.row_h), int(y1 // self.row_h)
+            store = self.store
+            hits = {nid for nid in store.overlapping(max(0.0, x0 / self.grid_step), x1 / self.grid_step)
+                    if r0 <= store.row[nid] <= r1}
+            if e.state & 0x0001:
+                hits |= self.selection
+            self.set_selection(hits)
+            self.status.config(text=f"{len(hits)} note(s) selected")
+        elif mode in ("move", "resize"):
+            self.canvas.dtag("dragging", "dragging")
+            self._commit_drag(mode, *self._drag_delta)
+            self.schedule_viewport()
+
+    def _commit_drag(self, mode, steps, rows):
+        """Write a finished move/resize of the selection to the store once,
+        as a single undoable step."""
+        if steps == 0 and rows == 0:
+            return
+        if mode == "move":
+            cmd = MoveNotes(self.selection, steps, rows)
         else:
-            # finalize storing grid-aligned positions for selected note
-            if self.selected and self.selected in self.notes:
-                x1, y1, x2, y2 = self.canvas.coords(self.selected)
-                self.notes[self.selected]["start_x"] = int(x1 // GRID_STEP)
-                self.notes[self.selected]["width_steps"] = max(1, int((x2 - x1) // GRID_STEP))
-                self.notes[self.selected]["row"] = int(y1 // ROW_H)
+            cmd = ResizeNotes(self.selection, steps)
+        self._run(cmd)
 
     def delete_selected(self, _=None):
-        if not self.selected:
+        if not self.selection:
             return
-        rect = self.selected
-        text_id = self.notes[rect]["text"]
-        self.canvas.delete(rect)
-        self.canvas.delete(text_id)
-        del self.notes[rect]
-        self.selected = None
+        self._run(DeleteNotes(self.store, self.selection))
+
+    # Undo / redo
+    def _run(self, cmd):
+        """Apply a new edit, record it and redraw what it touched."""
+        self._refresh_notes(cmd.apply(self.store, self.timeline))
+        self.history.push(cmd)
+
+    def undo(self, _=None):
+        cmd = self.history.undo()
+        if cmd is None:
+            self.status.config(text="Nothing to undo")
+            return
+        self._refresh_notes(cmd.revert(self.store, self.timeline))
+        self.status.config(text=f"Undid {cmd.label} of {len(cmd.ids)} note(s)")
+
+    def redo(self, _=None):
+        cmd = self.history.redo()
+        if cmd is None:
+            self.status.config(text="Nothing to redo")
+            return
+        self._refresh_notes(cmd.apply(self.store, self.timeline))
+        self.status.config(text=f"Redid {cmd.label} of {len(cmd.ids)} note(s)")
+
+    def _refresh_notes(self, ids):
+        """One batched redraw after an edit: reposition or release the
+        touched notes that are drawn; the viewport pass draws the rest."""
+        store = self.store
+        removed = False
+        if self.render_ahead is not None:
+            self.render_ahead.invalidate()
+        self._notes_edited(ids)
+        for nid in ids:
+            if nid in store:
+                if nid in self.note_items:
+                    self._place_note(nid)
+                    self.canvas.itemconfig(self.note_items[nid][1], text=store.lyric(nid))
+                continue
+            removed = True
+            self._release_note(nid)
+            if self._sounding.pop(nid, None) is not None:
+                self.engine.note_off(nid)
+        if removed:
+            live = {n for n in self.selection if n in store}
+            self.set_selection(live, primary=self.selected if self.selected in live else None)
+        self.schedule_viewport()
 
     # Playback
     def play(self):
         if self.playing:
             return
         self.playing = True
-        # reset playback note history for this run
-        self._played_notes = set()
+        self._init_audio()
+        if self.loop_region is not None and not self.engine.available:
+            self.status.config(text="Loop playback needs an audio output stream; playing through once")
+        # compile the onset index once for this run; play_loop seeks it
+        self.timeline.compile((k[0], k[2]) for k in self.store.sorted_keys())
+        # the playback thread reads this copy of the notes, never the store
+        from render_ahead import NoteTable
+        while not self._play_edits.empty():
+            self._play_edits.get()
+        self._play_notes = NoteTable(self.store)
         self._prev_play_x = self.play_x
         if not self.play_line:
-            self.play_line = self.canvas.create_line(self.play_x, 0, self.play_x, len(PITCHES)*ROW_H,
+            self.play_line = self.canvas.create_line(self.play_x, 0, self.play_x, len(PITCHES)*self.row_h,
                                                      fill="red", width=2, tags=("playhead",))
         self.play_thread = threading.Thread(target=self.play_loop, daemon=True)
         self.play_thread.start()
 
-    def stop(self):
-        # Stop playback without resetting playhead by default.
-        # Pass reset=True to also move the playhead back to start (x=0)
-        self.playing = False
-
     def stop(self, reset: bool = False):
         # Backwards-compatible stop that can optionally reset playhead
         self.playing = False
+        if self.engine is not None:
+            self.engine.clear_loop()
+            self.engine.all_notes_off()
+            self.render_ahead.stop()
+        self._sounding.clear()
+        self._drain_loop_edits()
         if reset:
             try:
                 self.play_x = 0.0
                 self._prev_play_x = 0.0
-                # clear played-note history so notes will play again on next run
-                try:
-                    self._played_notes.clear()
-                except Exception:
-                    self._played_notes = set()
+                # rewind the onset cursor so notes will play again on next run
+                self.timeline.seek(0.0)
                 if self.play_line:
                     # update on the main thread
                     try:
-                        self.canvas.after(0, lambda: self.canvas.coords(self.play_line, 0.0, 0, 0.0, len(PITCHES)*ROW_H))
+                        self.canvas.after(0, lambda: self.canvas.coords(self.play_line, 0.0, 0, 0.0, len(PITCHES)*self.row_h))
                     except Exception:
                         pass
                 try:
@@ -566,17 +1156,17 @@ class SingItClanker(tk.Tk):
 
     def render_audio(self):
         """Export the piano-roll as a MIDI file plus a Stylesinger-compatible
-        lyric timing file. The user picks a destination .mid path; a matching
-        .lab (text) file is written alongside it containing lines:
+        lyric timing file, and render the audio to a matching .wav. The user
+        picks a destination .mid path; a matching .lab (text) file is written
+        alongside it containing lines:
 
             <start_seconds> <duration_seconds> <lyric>
 
-        Times are computed using the current tempo (BPM) and the grid mapping
-        where 1 grid step == 1 beat (quarter note) as used by playback.
+        Times follow the tempo map and the grid mapping where 1 grid step ==
+        1 beat (quarter note) as used by playback.
         """
-        # collect notes
-        notes_sorted = sorted(self.notes.items(), key=lambda it: (it[1]["start_x"], it[1]["row"]))
-        if not notes_sorted:
+        store = self.store
+        if not len(store):
             messagebox.showinfo("Render Audio", "No notes to export.")
             return
 
@@ -587,175 +1177,271 @@ class SingItClanker(tk.Tk):
         base, _ = os.path.splitext(out_mid)
         out_lab = base + '.lab'
 
-        # tempo and timing
+        tempo = self._tempo_map()
+        with profiler.span("export midi", "export", notes=len(store)):
+            song_io.write_midi(store, out_mid, tempo)
+        with profiler.span("export lab", "export"):
+            song_io.write_lab(store, out_lab, tempo)
+        with profiler.span("wav notes", "export"):
+            wav_notes = song_io.wav_notes(store, tempo)
+        # synthesize the WAV in a background process pool; UI stays responsive
+        self._start_wav_render(wav_notes, base + '.wav', out_mid, out_lab)
+
+    def _start_wav_render(self, wav_notes, out_wav, out_mid, out_lab):
+        """Run offline_render.render_wav on a worker thread and report its
+        progress in the status bar by polling a queue from the Tk loop."""
+        progress_q = queue.Queue()
+        timbre = self._timbre()
+
+        def worker():
+            try:
+                import offline_render
+                with profiler.span("render wav", "export", notes=len(wav_notes)):
+                    offline_render.render_wav(wav_notes, out_wav, timbre=timbre,
+                                              progress=lambda done, total: progress_q.put(("progress", done, total)),
+                                              cancel=lambda: self.shutting_down)
+                progress_q.put(("done", None, None))
+            except Exception as exc:
+                progress_q.put(("error", str(exc), None))
+
+        def poll():
+            if self.shutting_down:
+                return
+            finished = None
+            try:
+                while True:
+                    kind, a, b = progress_q.get_nowait()
+                    if kind == "progress":
+                        pct = int(100 * a / b) if b else 100
+                        self.status.config(text=f"Rendering audio... {pct}%")
+                    else:
+                        finished = (kind, a)
+            except queue.Empty:
+                pass
+            if finished is None:
+                self.after(100, poll)
+                return
+            if finished[0] == "done":
+                self.status.config(text=f"Rendered {out_wav}")
+                messagebox.showinfo("Render Audio", f"Exported MIDI to:\n{out_mid}\nlabels to:\n{out_lab}\nand audio to:\n{out_wav}")
+            else:
+                self.status.config(text="Audio render failed")
+                messagebox.showerror("Render Audio", f"Exported MIDI and labels, but audio rendering failed:\n{finished[1]}")
+
+        self.status.config(text="Rendering audio...")
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(100, poll)
+
+    def _current_tempo(self):
         try:
             tempo = int(self.tempo_var.get())
         except Exception:
             tempo = PLAY_BPM
         if tempo <= 0:
             tempo = PLAY_BPM
-        beat_time = 60.0 / float(tempo)  # seconds per beat
-
-        # helper: convert note name to MIDI number
-        def note_name_to_midi(name: str) -> int:
-            name = name.strip()
-            if not name:
-                return 60
-            i = len(name) - 1
-            while i >= 0 and name[i].isdigit():
-                i -= 1
-            note = name[: i+1]
-            octave = name[i+1:]
-            try:
-                oct_i = int(octave)
-            except Exception:
-                oct_i = 4
-            semis = {
-                'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4,
-                'F': 5, 'F#': 6, 'G': 7, 'G#': 8, 'A': 9,
-                'A#': 10, 'B': 11
-            }
-            note = note.replace('Bb', 'A#').replace('Db', 'C#').replace('Eb', 'D#').replace('Gb', 'F#').replace('Ab', 'G#')
-            semitone = semis.get(note, 9)
-            midi = (oct_i + 1) * 12 + semitone
-            return int(midi)
-
-        # build event list: (tick, type, channel, note, velocity)
-        PPQ = 480
-        events = []
-        for rect_id, info in notes_sorted:
-            start_beats = info.get('start_x', 0)
-            dur_beats = info.get('width_steps', 1)
-            start_tick = int(start_beats * PPQ)
-            dur_tick = int(dur_beats * PPQ)
-            row = info.get('row', 0)
-            if 0 <= row < len(PITCHES):
-                note_name = PITCHES[row]
-                midi_note = note_name_to_midi(note_name)
-                velocity = 100
-                events.append((start_tick, 'on', midi_note, velocity, rect_id))
-                events.append((start_tick + dur_tick, 'off', midi_note, 0, rect_id))
-
-        # sort events by tick
-        events.sort(key=lambda e: e[0])
-
-        # helper to write variable length quantity
-        def write_varlen(n: int) -> bytes:
-            buf = bytearray()
-            val = n & 0x0fffffff
-            stack = []
-            stack.append(val & 0x7f)
-            val >>= 7
-            while val:
-                stack.append((val & 0x7f) | 0x80)
-                val >>= 7
-            return bytes(reversed(stack))
-
-        # assemble MIDI track data
-        track_data = bytearray()
-        # set tempo meta (microseconds per quarter)
-        us_per_q = int(60.0 / tempo * 1_000_000)
-        track_data += b'\x00' + b'\xff\x51\x03' + struct.pack('>I', us_per_q)[1:]
-
-        last_tick = 0
-        for ev in events:
-            tick, kind, midi_note, vel, rid = ev
-            delta = tick - last_tick
-            track_data += write_varlen(delta)
-            if kind == 'on':
-                track_data += bytes([0x90, midi_note & 0x7f, vel & 0x7f])
-            else:
-                track_data += bytes([0x80, midi_note & 0x7f, vel & 0x7f])
-            last_tick = tick
-
-        # End of track
-        track_data += write_varlen(0)
-        track_data += b'\xff\x2f\x00'
-
-        # write MIDI file (header + single track)
-        with open(out_mid, 'wb') as f:
-            # Header: MThd, length 6, format 0, ntrks 1, division PPQ
-            f.write(b'MThd')
-            f.write(struct.pack('>I', 6))
-            f.write(struct.pack('>H', 0))
-            f.write(struct.pack('>H', 1))
-            f.write(struct.pack('>H', PPQ))
-            # Track chunk
-            f.write(b'MTrk')
-            f.write(struct.pack('>I', len(track_data)))
-            f.write(track_data)
-
-        # write label file: start_seconds duration_seconds lyric_token
-        with open(out_lab, 'w', encoding='utf-8') as lf:
-            for rect_id, info in notes_sorted:
-                start_beats = info.get('start_x', 0)
-                dur_beats = info.get('width_steps', 1)
-                start_s = start_beats * beat_time
-                dur_s = dur_beats * beat_time
-                text_id = info.get('text')
-                lyric = ''
-                try:
-                    lyric = self.canvas.itemcget(text_id, 'text') or ''
-                except Exception:
-                    lyric = ''
-                lf.write(f"{start_s:.4f} {dur_s:.4f} {lyric}\n")
+        return tempo
 
-        messagebox.showinfo("Render Audio", f"Exported MIDI to:\n{out_mid}\nand labels to:\n{out_lab}")
+    def _tempo_map(self):
+        """The tempo map with the spinbox applied as its first tempo. The
+        same object is returned until something changes, so playback can
+        compare by identity."""
+        bpm = self._current_tempo()
+        if bpm != round(self.tempo_map.initial_bpm):
+            self.tempo_map = self.tempo_map.with_initial(bpm)
+        return self.tempo_map
 
     def play_loop(self):
-        # incremental playhead update using live tempo (supports tempo changes during playback)
-        last_time = time.time()
-        prev = self._prev_play_x
+        if self.loop_region is not None and self.engine.available:
+            self._play_loop_region()
+            return
+        # the playhead is derived from the audio engine's sample clock, and
+        # onsets inside the look-ahead window are queued at exact frames
+        from scheduler import LOOKAHEAD_S
+        sched = self.scheduler
+        sched.lookahead_s = LOOKAHEAD_S + self.engine.mix_ahead_s if self.engine.available else 0.0
+        sched.start(self.play_x / self.grid_step, self._tempo_map())
+        self.engine.reset_onset_stats()
+        planned = time.perf_counter()
         while self.playing:
-            now = time.time()
-            dt = now - last_time
-            last_time = now
-
+            # how late this tick woke up relative to its 10 ms period
+            late_ms = (time.perf_counter() - planned) * 1000.0
+            with profiler.span("tick", "playback"):
+                due = self._play_tick(sched)
+            if profiler.enabled:
+                slack = sched.min_slack
+                profiler.counter("playback", voices=self.engine.active_voices(), scanned=len(due),
+                                 sounding=len(self._sounding), wake_late_ms=round(late_ms, 2),
+                                 min_slack_ms=round(slack * 1000.0 / sched.sample_rate, 2) if slack is not None else 0,
+                                 late_onsets=sched.late_onsets)
+                ahead = self.render_ahead
+                profiler.counter("render ahead", prepared=ahead.prepared, pending=ahead.pending(),
+                                 ready=ahead.ready, missed=ahead.missed, cancelled=ahead.cancelled)
+            if not self.playing:
+                break
+            planned = time.perf_counter() + 0.01
+            time.sleep(0.01)
+        self.playing = False
+        stats = self.engine.onset_stats()
+        if stats["count"] and not self.shutting_down:
+            msg = (f"Onset error: mean {stats['mean_ms']:.2f} ms, max {stats['max_ms']:.2f} ms "
+                   f"over {stats['count']} notes")
             try:
-                tempo = int(self.tempo_var.get())
+                self.canvas.after(0, lambda: self.status.config(text=msg))
             except Exception:
-                tempo = PLAY_BPM
-            if tempo <= 0:
-                tempo = PLAY_BPM
-            beat_time = 60.0 / float(tempo)
-
-            # advance playhead by dt relative to beat_time: GRID_STEP pixels per beat
-            delta_px = (dt / beat_time) * GRID_STEP
-            self.play_x += delta_px
-
-            # detect notes crossed by the playhead between prev and current
-            lower = min(prev, self.play_x)
-            upper = max(prev, self.play_x)
-            for rect_id, note_info in list(self.notes.items()):
-                try:
-                    start_px = note_info.get("start_x", 0) * GRID_STEP
-                    if rect_id in self._played_notes:
-                        continue
-                    if lower <= start_px <= upper:
-                        row = note_info.get("row", 0)
-                        if 0 <= row < len(PITCHES):
-                            pitch_name = PITCHES[row]
-                            freq = pitch_to_freq(pitch_name)
-                            duration_ms = note_info.get("width_steps", 1) * beat_time * 1000.0
-                            threading.Thread(target=play_tone, args=(freq, duration_ms), daemon=True).start()
-                        self._played_notes.add(rect_id)
-                except Exception:
-                    pass
-
-            prev = self.play_x
-            self._prev_play_x = self.play_x
+                pass
 
-            if self.play_x > SCENE_WIDTH:
-                self.playing = False
+    def _notes_edited(self, ids):
+        """UI thread: while playing, queue the new values of edited notes
+        for playback's copy of the notes and, with a loop region set, for
+        the loop buffer. Nothing drains the queues while stopped, so then
+        the loop buffer is only marked stale."""
+        if not self.playing:
+            self._loop_serial += 1
+            return
+        from loop_region import snapshot   # audio stack, see _init_audio
+        changes = snapshot(self.store, ids)
+        self._play_edits.put(changes)
+        if self.loop_region is not None:
+            self._loop_edits.put(changes)
+
+    def _drain_loop_edits(self):
+        """UI thread: drop queued loop edits (region set or cleared,
+        playback stopped); a buffer they never reached is stale."""
+        if self._loop_edits.empty():
+            return
+        while not self._loop_edits.empty():
+            self._loop_edits.get()
+        self._loop_serial += 1
+
+    def _capture_loop_notes(self, a, b, out):
+        """UI thread: snapshot the notes of loop region [a, b) for the
+        playback thread. Queued edits are already in the snapshot."""
+        from loop_region import capture
+        while not self._loop_edits.empty():
+            self._loop_edits.get()
+        out.put((self._loop_serial, capture(self.store, a, b)))
+
+    def _loop_buffer(self):
+        """The mix of the loop region: the previous buffer patched with
+        the edits made since, or a fresh mix if the region, tempo map,
+        tuning or project changed. Runs on the playback thread and only
+        mixes from snapshots taken on the UI thread; returns None if
+        playback stops while it waits for one."""
+        from loop_region import LoopBuffer
+        tm = self._tempo_map()
+        a, b = self.loop_region
+        timbre = self._timbre()
+        buf = self.loop_buffer
+        if (buf is not None and self._loop_buffer_serial == self._loop_serial
+                and buf.matches(tm, a, b, timbre)):
+            changes = {}
+            while not self._loop_edits.empty():
+                changes.update(self._loop_edits.get())
+            if changes:
+                with profiler.span("loop remix", "playback", notes=len(changes)):
+                    buf.update(changes)
+            return buf
+        captured = queue.SimpleQueue()
+        try:
+            self.after(0, self._capture_loop_notes, a, b, captured)
+        except Exception:
+            return None
+        while True:
+            try:
+                serial, notes = captured.get(timeout=LOOP_TICK_S)
+                break
+            except queue.Empty:
+                if not self.playing:
+                    return None
+        with profiler.span("loop mix", "playback"):
+            buf = LoopBuffer(notes, tm, a, b, timbre=timbre)
+        self._loop_buffer_serial = serial
+        self.loop_buffer = buf
+        return buf
+
+    def _play_loop_region(self):
+        """Play the pre-mixed loop buffer gaplessly until stopped. The
+        engine only copies buffer slices; this thread wakes a few times a
+        second to move the playhead and fold in edits."""
+        engine = self.engine
+        buf = None
+        step = self.play_x / self.grid_step
+        while self.playing and self.loop_region is not None:
+            current = self._loop_buffer()
+            if current is None:
                 break
+            if current is not buf:
+                # (re)start, keeping the playhead where it is inside the loop
+                offset = current.frame_of(step) if current.start_step <= step < current.end_step else 0
+                engine.set_loop(current.pcm, engine.clock() - offset)
+                buf = current
+            step = buf.step_at(engine.loop_offset())
+            self.play_x = step * self.grid_step
             px = self.play_x
             try:
-                self.canvas.after(0, lambda p=px: self.canvas.coords(self.play_line, p, 0, p, len(PITCHES)*ROW_H))
+                self.canvas.after(0, lambda p=px: self.canvas.coords(self.play_line, p, 0, p, len(PITCHES)*self.row_h))
             except Exception:
                 pass
-            time.sleep(0.02)
+            if profiler.enabled:
+                profiler.counter("loop", seconds=round(buf.seconds, 3), frames_mixed=buf.frames_mixed)
+            time.sleep(LOOP_TICK_S)
+        engine.clear_loop()
         self.playing = False
 
+    def _play_tick(self, sched):
+        """One playback tick: queue due onsets, release finished notes and
+        move the playhead. Returns the onsets handled."""
+        from render_ahead import note_tone   # audio stack, see _init_audio
+        tm = self._tempo_map()
+        sched.set_tempo(tm)
+        timbre = self._timbre()
+
+        notes = self._play_notes
+        while not self._play_edits.empty():
+            notes.apply(self._play_edits.get())
+        ahead = self.render_ahead
+        due = sched.due()
+        for nid, onset_frame in due:
+            if nid not in notes:
+                continue
+            try:
+                tone = note_tone(notes, nid, tm, timbre)
+                if tone is not None:
+                    freq, duration_ms, _ = tone
+                    if self.engine.available:
+                        ahead.collect(*tone)
+                        self.engine.note_on(nid, freq, duration_ms, timbre, at_frame=onset_frame)
+                        self._sounding[nid] = notes.end(nid)
+                    else:
+                        # winsound-only fallback cannot mix; beep per note
+                        threading.Thread(target=play_tone, args=(freq, duration_ms), daemon=True).start()
+            except Exception:
+                pass
+
+        step = sched.position()
+        if self.engine.available:
+            ahead.update(notes, self.timeline, step, tm, timbre)
+
+        # note-offs for notes whose width the playhead has passed; the UI
+        # thread may drop entries meanwhile (deletes, undo), so pop
+        if self._sounding:
+            for nid, end_step in list(self._sounding.items()):
+                if step >= end_step and self._sounding.pop(nid, None) is not None:
+                    self.engine.note_off(nid)
+
+        self.play_x = step * self.grid_step
+        self._prev_play_x = self.play_x
+
+        if self.play_x > self.scene_width:
+            self.playing = False
+            return due
+        px = self.play_x
+        try:
+            self.canvas.after(0, lambda p=px: self.canvas.coords(self.play_line, p, 0, p, len(PITCHES)*self.row_h))
+        except Exception:
+            pass
+        return due
+
     # Scroll synchronization handlers
     def _on_vscroll(self, *args):
         self.canvas.yview(*args)
@@ -766,10 +1452,18 @@ class SingItClanker(tk.Tk):
 
     def _on_hscroll(self, *args):
         self.canvas.xview(*args)
+
+    def _on_canvas_xview(self, first, last):
+        self.hbar.set(first, last)
         try:
-            self.piano.xview(*args)
+            self.ruler.xview_moveto(first)
         except Exception:
             pass
+        self.schedule_viewport()
+
+    def _on_canvas_yview(self, first, last):
+        self.vbar.set(first, last)
+        self.schedule_viewport()
 
     def _on_mousewheel(self, event):
         """Handle vertical mouse wheel scrolling for both canvases.
@@ -790,6 +1484,15 @@ class SingItClanker(tk.Tk):
             lines = -int(delta / 120)
             if lines == 0:
                 return
+            state = getattr(event, 'state', 0)
+            if state & 0x0004:
+                # Ctrl+wheel zooms around the pointer; with Shift, vertically
+                step = -0.25 * lines
+                if state & 0x0001:
+                    self.v_zoom_set(self.current_v_zoom + step, anchor_y=event.y)
+                else:
+                    self.h_zoom_set(self.current_h_zoom + step, anchor_x=event.x)
+                return
             try:
                 self.canvas.yview_scroll(lines, 'units')
                 self.piano.yview_scroll(lines, 'units')
@@ -800,36 +1503,23 @@ class SingItClanker(tk.Tk):
 
     # Zoom & redraw helpers
     def update_measurements(self):
-        """Update module measurements based on current zoom levels"""
-        global ROW_H, KEY_W, GRID_STEP, NOTE_MIN_W, NOTE_H
-        ROW_H = int(BASE_ROW_H * self.current_v_zoom)
-        KEY_W = BASE_KEY_W  # piano width left constant for now
-        GRID_STEP = max(1, int(BASE_GRID_STEP * self.current_h_zoom))
-        NOTE_MIN_W = max(4, int(BASE_NOTE_MIN_W * self.current_h_zoom))
-        NOTE_H = max(4, ROW_H - 4)
+        """Derive this editor's pixel measurements from its zoom levels.
+        ROW_H, GRID_STEP and friends are the sizes at zoom 1 and never
+        change."""
+        self.row_h = int(ROW_H * self.current_v_zoom)
+        self.key_w = KEY_W  # piano width left constant for now
+        self.grid_step = max(1, int(GRID_STEP * self.current_h_zoom))
+        self.note_min_w = max(4, int(NOTE_MIN_W * self.current_h_zoom))
+        self.note_h = max(4, self.row_h - 4)
 
     def redraw_notes(self):
-        """Redraw all notes using stored grid units"""
-        for rect_id, note_info in list(self.notes.items()):
-            start_x = note_info.get("start_x")
-            width_steps = note_info.get("width_steps", 1)
-            row = note_info.get("row", 0)
-            if start_x is None:
-                x1, _, x2, _ = self.canvas.coords(rect_id)
-                start_x = int(x1 // GRID_STEP)
-                width_steps = max(1, int((x2 - x1) // GRID_STEP))
-                note_info["start_x"] = start_x
-                note_info["width_steps"] = width_steps
-            new_x1 = start_x * GRID_STEP
-            new_x2 = new_x1 + (width_steps * GRID_STEP)
-            new_y = row * ROW_H
-            new_h = NOTE_H
+        """Redraw the materialized notes using stored grid units"""
+        for nid in self.note_items:
             try:
-                self.canvas.coords(rect_id, new_x1, new_y + 2, new_x2, new_y + new_h + 2)
-                text_id = note_info["text"]
-                self.canvas.coords(text_id, (new_x1 + new_x2) / 2, new_y + new_h/2 + 2)
+                self._place_note(nid)
             except Exception:
                 pass
+        self.schedule_viewport()
 
     def _zoom_h_in(self):
         new_zoom = min(self.current_h_zoom + 0.25, MAX_ZOOM)
@@ -847,34 +1537,109 @@ class SingItClanker(tk.Tk):
         new_zoom = max(self.current_v_zoom - 0.25, MIN_ZOOM)
         self.v_zoom_set(new_zoom)
 
-    def h_zoom_set(self, value):
-        old_zoom = self.current_h_zoom
-        self.current_h_zoom = float(value)
+    def h_zoom_set(self, value, anchor_x=None):
+        """Horizontal zoom. Existing items are transformed in place with
+        canvas.scale for instant feedback; the exact re-layout and viewport
+        refresh run once the zoom input settles. anchor_x is the window x
+        that stays fixed (defaults to the view center)."""
+        value = max(MIN_ZOOM, min(MAX_ZOOM, float(value)))
+        old_step = self.grid_step
+        self.current_h_zoom = value
         self.update_measurements()
-        xview = self.canvas.xview()
-        center = (xview[0] + xview[1]) / 2
-        self.draw_piano()
-        self.draw_grid()
-        self.redraw_notes()
-        height = len(PITCHES) * ROW_H
-        self.canvas.config(scrollregion=(0, 0, SCENE_WIDTH, height))
-        self.piano.config(scrollregion=(0, 0, KEY_W, height))
-        self.canvas.xview_moveto(center)
-
-    def v_zoom_set(self, value):
-        old_zoom = self.current_v_zoom
-        self.current_v_zoom = float(value)
+        fx = self.grid_step / old_step
+        if fx == 1:
+            return
+        if anchor_x is None:
+            anchor_x = self.canvas.winfo_width() / 2
+        cx = self.canvas.canvasx(anchor_x)
+        self._zooming = True
+        self.canvas.scale("note", 0, 0, fx, 1)
+        self.canvas.scale("note_text", 0, 0, fx, 1)
+        self.canvas.scale("grid", 0, 0, fx, 1)
+        self.ruler.scale("all", 0, 0, fx, 1)
+        self.play_x *= fx
+        self.canvas.coords(self.play_line, self.play_x, 0, self.play_x, len(PITCHES)*self.row_h)
+        height = len(PITCHES) * self.row_h
+        self.canvas.config(scrollregion=(0, 0, self.scene_width, height))
+        self.ruler.config(scrollregion=(0, 0, self.scene_width, RULER_H))
+        self.canvas.xview_moveto(max(0.0, (cx * fx - anchor_x) / self.scene_width))
+        self._schedule_zoom_settle()
+
+    def v_zoom_set(self, value, anchor_y=None):
+        """Vertical zoom; see h_zoom_set."""
+        value = max(MIN_ZOOM, min(MAX_ZOOM, float(value)))
+        old_row = self.row_h
+        self.current_v_zoom = value
         self.update_measurements()
-        yview = self.canvas.yview()
-        center = (yview[0] + yview[1]) / 2
-        self.draw_piano()
-        self.draw_grid()
-        self.redraw_notes()
-        height = len(PITCHES) * ROW_H
-        self.canvas.config(scrollregion=(0, 0, SCENE_WIDTH, height))
-        self.piano.config(scrollregion=(0, 0, KEY_W, height))
-        self.canvas.yview_moveto(center)
-        self.piano.yview_moveto(center)
+        fy = self.row_h / old_row
+        if fy == 1:
+            return
+        if anchor_y is None:
+            anchor_y = self.canvas.winfo_height() / 2
+        cy = self.canvas.canvasy(anchor_y)
+        self._zooming = True
+        self.canvas.scale("note", 0, 0, 1, fy)
+        self.canvas.scale("note_text", 0, 0, 1, fy)
+        self.canvas.scale("grid", 0, 0, 1, fy)
+        self.piano.scale("all", 0, 0, 1, fy)
+        self._piano_dirty = True
+        height = len(PITCHES) * self.row_h
+        self.canvas.coords(self.play_line, self.play_x, 0, self.play_x, height)
+        self.canvas.config(scrollregion=(0, 0, self.scene_width, height))
+        self.piano.config(scrollregion=(0, 0, self.key_w, height))
+        top = max(0.0, (cy * fy - anchor_y) / height)
+        self.canvas.yview_moveto(top)
+        self.piano.yview_moveto(top)
+        self._schedule_zoom_settle()
+
+    def _schedule_zoom_settle(self):
+        """Debounce: restart the settle timer on every zoom step."""
+        if self._zoom_pending is not None:
+            self.after_cancel(self._zoom_pending)
+        self._zoom_pending = self.after(ZOOM_SETTLE_MS, self._zoom_settle)
+
+    @profiler.traced("zoom_settle", "canvas")
+    def _zoom_settle(self):
+        self._zoom_pending = None
+        self._zooming = False
+        # exact integer layout for what the approximate transform touched
+        for nid in self.note_items:
+            try:
+                self._place_note(nid)
+            except Exception:
+                pass
+        if self._piano_dirty:
+            self._piano_dirty = False
+            self.draw_piano()
+        self.refresh_viewport()
+
+    # Profiling
+    def toggle_profiling(self):
+        on = bool(self.profile_var.get())
+        if on and not profiler.enabled:
+            profiler.clear()
+            self.after(PROFILE_REFRESH_MS, self._show_profile)
+        profiler.enable(on)
+        if not on:
+            self.status.config(text="Profiling off")
+
+    def _show_profile(self):
+        if not profiler.enabled or self.shutting_down:
+            return
+        self.status.config(text=profiler.summary())
+        self.after(PROFILE_REFRESH_MS, self._show_profile)
+
+    def save_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('Chrome trace', '*.json')],
+                                            title='Save Trace as')
+        if not path:
+            return
+        try:
+            count = profiler.export_chrome(path)
+        except Exception as ex:
+            messagebox.showerror("Save Trace", f"Could not write trace:\n{ex}")
+            return
+        self.status.config(text=f"Wrote {count} trace event(s) to {os.path.basename(path)}")
 
     def on_close(self):
         """Safely stop playback and close the app."""
@@ -886,6 +1651,11 @@ class SingItClanker(tk.Tk):
         # join thread briefly
         if self.play_thread and self.play_thread.is_alive():
             self.play_thread.join(timeout=1.0)
+        if self.engine is not None:
+            self.engine.close()
+            self.render_ahead.close()
+        g2p_service.service.save()
+        self._detach_journal()
         try:
             self.destroy()
         except Exception:
@@ -894,130 +1664,7 @@ class SingItClanker(tk.Tk):
 
 # ---------------- RUN ----------------
 if __name__ == "__main__":
-    app = SingItClanker()
-    app.mainloop()
-    def update_measurements(self):
-        """Update measurements based on current zoom levels"""
-        global ROW_H, KEY_W, GRID_STEP, NOTE_MIN_W, NOTE_H
-        
-        ROW_H = int(BASE_ROW_H * self.current_v_zoom)
-        KEY_W = BASE_KEY_W  # Piano width stays constant
-        GRID_STEP = int(BASE_GRID_STEP * self.current_h_zoom)
-        NOTE_MIN_W = int(BASE_NOTE_MIN_W * self.current_h_zoom)
-        NOTE_H = ROW_H - 4
-
-    def _on_horizontal_zoom(self, value):
-        """Handle horizontal zoom changes"""
-        old_zoom = self.current_h_zoom
-        self.current_h_zoom = float(value)
-        self.update_measurements()
-        
-        # Get current view fractions for maintaining position
-        xview = self.canvas.xview()
-        center = (xview[0] + xview[1]) / 2
-        
-        # Redraw everything
-        self.draw_piano()
-        self.draw_grid()
-        self.redraw_notes()
-        
-        # Update scroll regions
-        height = len(PITCHES) * ROW_H
-        self.canvas.config(scrollregion=(0, 0, SCENE_WIDTH, height))
-        self.piano.config(scrollregion=(0, 0, KEY_W, height))
-        
-        # Maintain view center
-        self.canvas.xview_moveto(center - (self.current_h_zoom / old_zoom - 1) / 2)
-
-    def _on_vertical_zoom(self, value):
-        """Handle vertical zoom changes"""
-        old_zoom = self.current_v_zoom
-        self.current_v_zoom = float(value)
-        self.update_measurements()
-        
-        # Get current view fractions for maintaining position
-        yview = self.canvas.yview()
-        center = (yview[0] + yview[1]) / 2
-        
-        # Redraw everything
-        self.draw_piano()
-        self.draw_grid()
-        self.redraw_notes()
-        
-        # Update scroll regions
-        height = len(PITCHES) * ROW_H
-        self.canvas.config(scrollregion=(0, 0, SCENE_WIDTH, height))
-        self.piano.config(scrollregion=(0, 0, KEY_W, height))
-        
-        # Maintain view center
-        self.canvas.yview_moveto(center - (self.current_v_zoom / old_zoom - 1) / 2)
-
-    def redraw_notes(self):
-        """Redraw all notes with current zoom levels"""
-        for rect_id, note_info in self.notes.items():
-            # Always use stored grid positions for x and width
-            start_x = note_info.get("start_x")
-            width_steps = note_info.get("width_steps", 1)
-            row = note_info["row"]
-            if start_x is None:
-                # If missing, calculate from current position
-                x1, _, x2, _ = self.canvas.coords(rect_id)
-                start_x = x1 / GRID_STEP
-                width_steps = max(1, (x2 - x1) / GRID_STEP)
-                note_info["start_x"] = start_x
-                note_info["width_steps"] = width_steps
-            new_x1 = start_x * GRID_STEP
-            new_x2 = new_x1 + (width_steps * GRID_STEP)
-            new_y = row * ROW_H
-            new_h = NOTE_H
-            self.canvas.coords(rect_id, new_x1, new_y + 2, new_x2, new_y + new_h + 2)
-            text_id = note_info["text"]
-            self.canvas.coords(text_id, (new_x1 + new_x2) / 2, new_y + new_h/2 + 2)
-
-    def _zoom_h_in(self):
-        new_zoom = min(self.current_h_zoom + 0.25, MAX_ZOOM)
-        self.h_zoom_set(new_zoom)
-    def _zoom_h_out(self):
-        new_zoom = max(self.current_h_zoom - 0.25, MIN_ZOOM)
-        self.h_zoom_set(new_zoom)
-    def _zoom_v_in(self):
-        new_zoom = min(self.current_v_zoom + 0.25, MAX_ZOOM)
-        self.v_zoom_set(new_zoom)
-    def _zoom_v_out(self):
-        new_zoom = max(self.current_v_zoom - 0.25, MIN_ZOOM)
-        self.v_zoom_set(new_zoom)
-    def h_zoom_set(self, value):
-        self.current_h_zoom = float(value)
-        self.update_measurements()
-        xview = self.canvas.xview()
-        center = (xview[0] + xview[1]) / 2
-        self.draw_piano()
-        self.draw_grid()
-        self.redraw_notes()
-        height = len(PITCHES) * ROW_H
-        self.canvas.config(scrollregion=(0, 0, SCENE_WIDTH, height))
-        self.piano.config(scrollregion=(0, 0, KEY_W, height))
-        self.canvas.xview_moveto(center)
-    def v_zoom_set(self, value):
-        self.current_v_zoom = float(value)
-        self.update_measurements()
-        yview = self.canvas.yview()
-        center = (yview[0] + yview[1]) / 2
-        self.draw_piano()
-        self.draw_grid()
-        self.redraw_notes()
-        height = len(PITCHES) * ROW_H
-        self.canvas.config(scrollregion=(0, 0, SCENE_WIDTH, height))
-        self.piano.config(scrollregion=(0, 0, KEY_W, height))
-        self.canvas.yview_moveto(center)
-        self.piano.yview_moveto(center)
-
-
-# ---------------- RUN ----------------
-if __name__ == "__main__":
-    app = SingItClanker()
+    app = SingItClanker(startup_profile="--startup-profile" in sys.argv[1:],
+                        profiling="--profile" in sys.argv[1:])
     app.mainloop()
-
-
-
-
+    sys.exit(getattr(app, "_profile_exit", 0))
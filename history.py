@@ -0,0 +1,155 @@
+"""Undo/redo history of note edits.
+
+Each entry is a compact delta rather than a snapshot: a move stores the
+ids and one (steps, rows) offset, a lyric change stores only the labels
+that changed, a delete stores the removed notes. Memory therefore grows
+with the size of each edit, and the number of entries is capped.
+
+Commands work on the headless NoteStore and EventTimeline only. `apply`
+and `revert` return the ids they touched so the caller can redraw them in
+one batch.
+"""
+from array import array
+from collections import deque
+
+HISTORY_LIMIT = 200
+
+
+class MoveNotes:
+    __slots__ = ("ids", "steps", "rows")
+    label = "move"
+
+    def __init__(self, ids, steps, rows):
+        self.ids = array('i', ids)
+        self.steps = steps
+        self.rows = rows
+
+    def _shift(self, store, timeline, sign):
+        ds, dr = sign * self.steps, sign * self.rows
+        start = store.start
+        old = [start[nid] for nid in self.ids]
+        store.shift_many(self.ids, ds, dr)
+        timeline.move_many([(nid, s, start[nid]) for nid, s in zip(self.ids, old)])
+        return self.ids
+
+    def apply(self, store, timeline):
+        return self._shift(store, timeline, 1)
+
+    def revert(self, store, timeline):
+        return self._shift(store, timeline, -1)
+
+
+class ResizeNotes:
+    __slots__ = ("ids", "steps")
+    label = "resize"
+
+    def __init__(self, ids, steps):
+        self.ids = array('i', ids)
+        self.steps = steps
+
+    def _grow(self, store, steps):
+        store.resize_many(self.ids, steps)
+        return self.ids
+
+    def apply(self, store, timeline):
+        return self._grow(store, self.steps)
+
+    def revert(self, store, timeline):
+        return self._grow(store, -self.steps)
+
+
+class AddNotes:
+    """Notes that were added (apply restores them, revert removes them)."""
+    __slots__ = ("ids", "notes")
+    label = "add"
+
+    def __init__(self, store, ids):
+        self.ids = array('i', ids)
+        self.notes = [store.snapshot(nid) for nid in ids]
+
+    def apply(self, store, timeline):
+        for nid, note in zip(self.ids, self.notes):
+            store.restore(nid, *note)
+            timeline.insert(nid, store.start[nid])
+        return self.ids
+
+    def revert(self, store, timeline):
+        for nid in self.ids:
+            timeline.remove(nid, store.start[nid])
+            store.remove(nid)
+        return self.ids
+
+
+class DeleteNotes(AddNotes):
+    """Notes that were deleted; the inverse of AddNotes."""
+    __slots__ = ()
+    label = "delete"
+
+    def apply(self, store, timeline):
+        return AddNotes.revert(self, store, timeline)
+
+    def revert(self, store, timeline):
+        return AddNotes.apply(self, store, timeline)
+
+
+class SetLyrics:
+    __slots__ = ("ids", "before", "after")
+    label = "lyrics"
+
+    def __init__(self, store, pairs):
+        # only labels that actually change are kept
+        changed = [(nid, store.lyric(nid), text) for nid, text in pairs if store.lyric(nid) != text]
+        self.ids = array('i', (c[0] for c in changed))
+        self.before = [c[1] for c in changed]
+        self.after = [c[2] for c in changed]
+
+    def apply(self, store, timeline):
+        store.set_lyrics(zip(self.ids, self.after))
+        return self.ids
+
+    def revert(self, store, timeline):
+        store.set_lyrics(zip(self.ids, self.before))
+        return self.ids
+
+
+class History:
+    """Bounded undo stack with a redo stack that new edits clear."""
+
+    def __init__(self, limit: int = HISTORY_LIMIT):
+        self._undo = deque(maxlen=max(1, int(limit)))
+        self._redo = []
+
+    @property
+    def limit(self):
+        return self._undo.maxlen
+
+    def set_limit(self, limit: int):
+        self._undo = deque(self._undo, maxlen=max(1, int(limit)))
+
+    def push(self, command):
+        """Record an edit that has already been applied."""
+        if not len(command.ids):
+            return
+        self._undo.append(command)
+        self._redo.clear()
+
+    def undo(self):
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        self._redo.append(command)
+        return command
+
+    def redo(self):
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        self._undo.append(command)
+        return command
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def __len__(self):
+        return len(self._undo)
@@ -0,0 +1,162 @@
+"""Pre-mixed PCM buffer for loop-region playback.
+
+A loop region [start_step, end_step) is mixed once, with the offline
+renderer's chunk mixer, into a single int16 buffer. The audio engine then
+repeats it gaplessly (AudioEngine.set_loop). Notes that ring past the loop
+end are cut there. Notes that began before the loop start contribute
+their remaining part. Both seams get a short fade so the wrap does not
+click.
+
+The buffer mixes from a snapshot of the region's notes (`capture`), not
+from the live NoteStore, so it can be built and patched on the playback
+thread while the UI keeps editing. It remembers which frames every note
+covers. When notes change, `update(changes)` takes their new values
+(`snapshot`), re-mixes only the frame ranges those notes covered before
+and cover now, and splices the result into the same bytearray while it
+plays. Changing the tempo map, the tuning, the voice or the region needs
+a new buffer (see `matches`).
+"""
+from array import array
+
+import synth
+import tuning
+from audio_engine import RELEASE_FRAMES
+from offline_render import render_chunk
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+SEAM_FRAMES = RELEASE_FRAMES
+
+
+def snapshot(store, ids):
+    """{id: (row, start, length)} of notes `ids`, None for removed ones."""
+    return {nid: (store.row[nid], store.start[nid], store.length[nid]) if nid in store else None
+            for nid in ids}
+
+
+def capture(store, start_step: float, end_step: float):
+    """Snapshot of the notes sounding in [start_step, end_step)."""
+    return snapshot(store, store.overlapping(start_step, end_step))
+
+
+class LoopBuffer:
+    def __init__(self, notes, tempo_map, start_step: float, end_step: float,
+                 sample_rate: int = synth.SAMPLE_RATE, timbre: str = synth.DEFAULT_TIMBRE):
+        self.notes = {}         # note id -> (row, start, length), as captured
+        self.tempo_map = tempo_map
+        self.start_step = float(start_step)
+        self.end_step = float(end_step)
+        self.sample_rate = sample_rate
+        self.timbre = timbre
+        self.tuning = tuning.current
+        self.t0 = tempo_map.seconds(self.start_step)
+        self.frames = max(1, int(round((tempo_map.seconds(self.end_step) - self.t0) * sample_rate)))
+        self.pcm = bytearray(2 * self.frames)
+        self._extent = {}       # note id -> (first, last) frame it covers
+        self.frames_mixed = 0
+        self._keep(notes)
+        self._mix(0, self.frames)
+
+    def matches(self, tempo_map, start_step, end_step, timbre=synth.DEFAULT_TIMBRE):
+        """True if this buffer is still the mix of that region."""
+        return (tempo_map is self.tempo_map and tuning.current == self.tuning
+                and timbre == self.timbre
+                and (float(start_step), float(end_step)) == (self.start_step, self.end_step))
+
+    @property
+    def seconds(self):
+        return self.frames / float(self.sample_rate)
+
+    def step_at(self, offset: int) -> float:
+        """Grid step playing at a frame offset into the loop."""
+        return self.tempo_map.step_at(self.t0 + offset / float(self.sample_rate))
+
+    def frame_of(self, step: float) -> int:
+        return int(round((self.tempo_map.seconds(step) - self.t0) * self.sample_rate))
+
+    def _keep(self, changes):
+        """Fold snapshot `changes` into self.notes, keeping only notes
+        that sound inside the region."""
+        for nid, note in changes.items():
+            if note is not None and note[1] < self.end_step and note[1] + note[2] > self.start_step:
+                self.notes[nid] = note
+            else:
+                self.notes.pop(nid, None)
+
+    def _note(self, nid):
+        """(start_frame, freq, duration_ms, first, last) of a note that
+        sounds inside the loop, else None."""
+        row, start, length = self.notes[nid]
+        freqs = tuning.ROW_FREQ
+        if not 0 <= row < len(freqs):
+            return None
+        tm = self.tempo_map
+        t_on = tm.seconds(start)
+        dur_s = tm.seconds(start + length) - t_on
+        sf = int(round((t_on - self.t0) * self.sample_rate))
+        nf = synth.tone_frames(dur_s * 1000.0)
+        first, last = max(0, sf), min(self.frames, sf + nf)
+        if last <= first:
+            return None
+        return sf, freqs[row], dur_s * 1000.0, first, last
+
+    def _mix(self, f0, f1):
+        """Re-mix frames [f0, f1) from the snapshot and splice them in."""
+        s0, s1 = self.step_at(f0), self.step_at(f1)
+        notes = []
+        for nid, (_, start, length) in self.notes.items():
+            if start >= s1 or start + length <= s0:
+                continue
+            note = self._note(nid)
+            if note is None:
+                continue
+            sf, freq, dur_ms, first, last = note
+            self._extent[nid] = (first, last)
+            if first < f1 and last > f0:
+                notes.append((sf, freq, dur_ms))
+        pcm = render_chunk((f0, f1 - f0, notes, self.timbre))
+        self.pcm[2 * f0:2 * f1] = self._fade_seams(pcm, f0, f1)
+        self.frames_mixed += f1 - f0
+
+    def _fade_seams(self, pcm, f0, f1):
+        n, seam = self.frames, min(SEAM_FRAMES, self.frames // 2)
+        if f0 >= seam and f1 <= n - seam:
+            return pcm
+        if np is not None:
+            data = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+            pos = np.arange(f0, f1, dtype=np.float32)
+            gain = np.clip(np.minimum(pos, n - 1 - pos) / max(1, seam), 0.0, 1.0)
+            return (data * gain).astype("<i2").tobytes()
+        data = array('h', pcm)
+        for i, j in enumerate(range(f0, f1)):
+            g = min(j, n - 1 - j) / max(1, seam)
+            if g < 1.0:
+                data[i] = int(data[i] * g)
+        return data.tobytes()
+
+    def update(self, changes):
+        """Notes were added, removed or changed (a `snapshot` of them):
+        re-mix the frames they covered before and cover now. Returns the
+        frames re-mixed."""
+        self._keep(changes)
+        ranges = []
+        for nid in changes:
+            old = self._extent.pop(nid, None)
+            if old is not None:
+                ranges.append(old)
+            if nid in self.notes:
+                note = self._note(nid)
+                if note is not None:
+                    ranges.append(note[3:])
+        merged = []
+        for a, b in sorted(ranges):
+            if merged and a <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        for a, b in merged:
+            self._mix(a, b)
+        return sum(b - a for a, b in merged)
@@ -0,0 +1,86 @@
+"""Map a lyric sheet onto notes in chronological order.
+
+A sheet is whitespace-separated words. A hyphen inside a word spells out
+its syllables ("hel-lo"), and a standalone "-" or "_" holds the previous
+syllable over the next note (melisma); those notes get the HOLD label.
+
+Words are converted to phonemes and then grouped into per-note units:
+"phoneme" mode gives every phoneme its own note (the editor's original
+behaviour), "syllable" mode puts each syllable's phonemes on one note.
+Alignment is a single pass over the note order; nothing touches Tk.
+"""
+HOLD = "-"
+MELISMA_MARKS = ("-", "_")
+MODES = ("phoneme", "syllable")
+
+_VOWELS = "AEIOUaeiou"
+
+
+def _is_vowel(p):
+    # ARPAbet vowels all start with a vowel letter (AH0, ER1, ...); the
+    # grapheme fallback uses plain letters
+    return bool(p) and p[0] in _VOWELS
+
+
+def syllabify(phones):
+    """Split a word's phonemes into syllables, one vowel nucleus each.
+
+    A single consonant between two nuclei starts the next syllable; of a
+    longer cluster the first consonant closes the previous one. Runs of
+    single-letter vowels (grapheme fallback, "oo") count as one nucleus.
+    """
+    nuclei = []
+    for i, p in enumerate(phones):
+        if not _is_vowel(p):
+            continue
+        if nuclei and i > 0 and len(p) == 1 and _is_vowel(phones[i - 1]):
+            continue
+        nuclei.append(i)
+    if len(nuclei) < 2:
+        return [list(phones)] if phones else []
+    cuts = [0]
+    for a, b in zip(nuclei, nuclei[1:]):
+        end_a = a
+        while end_a + 1 < b and _is_vowel(phones[end_a + 1]):
+            end_a += 1
+        gap = b - end_a - 1
+        if gap == 0:
+            cuts.append(b)
+        elif gap == 1:
+            cuts.append(b - 1)
+        else:
+            cuts.append(end_a + 2)
+    cuts.append(len(phones))
+    return [list(phones[i:j]) for i, j in zip(cuts, cuts[1:])]
+
+
+def lyric_units(sheet, to_phonemes, mode="phoneme"):
+    """Per-note labels for a sheet; None marks a melisma hold.
+
+    `to_phonemes(word)` returns the phoneme list for one word.
+    """
+    units = []
+    for word in sheet.split():
+        if word in MELISMA_MARKS:
+            units.append(None)
+            continue
+        pieces = [w for w in word.split("-") if w]
+        for piece in pieces:
+            phones = to_phonemes(piece)
+            if not phones:
+                continue
+            if mode == "phoneme":
+                units.extend(phones)
+            elif len(pieces) > 1:
+                # the sheet already spelled this syllable out
+                units.append(" ".join(phones))
+            else:
+                units.extend(" ".join(s) for s in syllabify(phones))
+    return units
+
+
+def align(units, keys, start=0):
+    """Pair units with notes from position `start` of the sorted
+    (start, row, id) keys. Returns [(note_id, label)]."""
+    n = min(len(units), max(0, len(keys) - start))
+    return [(keys[start + i][2], HOLD if units[i] is None else units[i]) for i in range(n)]
@@ -0,0 +1,141 @@
+"""Standard MIDI File reader.
+
+The file is memory-mapped and decoded in one pass per track: variable
+length deltas and running status are handled inline, note-ons are paired
+with their note-offs through per-(channel, note) queues (the earliest
+open note of a pitch is closed first, as most sequencers do), and lyric meta
+events are attached to the next note that starts in the same track.
+Nothing is imported from the editor; callers map notes onto the grid.
+"""
+import mmap
+import struct
+
+
+class MidiData:
+    """Decoded contents of a MIDI file."""
+
+    def __init__(self, fmt, ppq):
+        self.format = fmt
+        self.ppq = ppq
+        self.tempos = []   # (tick, microseconds per quarter)
+        # (start_tick, length_ticks, note, velocity, channel, lyric), per
+        # track in start order
+        self.notes = []
+        self.unpaired = 0  # note-ons that never got a note-off
+
+    @property
+    def bpm(self):
+        """Initial tempo, 120 if the file has none."""
+        if not self.tempos:
+            return 120.0
+        return 60_000_000 / min(self.tempos)[1]
+
+
+def read_midi(path) -> MidiData:
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return _decode(buf)
+
+
+def _decode(buf):
+    if buf[:4] != b"MThd":
+        raise ValueError("not a Standard MIDI File")
+    hlen, fmt, ntrks, division = struct.unpack_from(">IHHH", buf, 4)
+    if division & 0x8000:
+        raise ValueError("SMPTE time division is not supported")
+    data = MidiData(fmt, division)
+    pos = 8 + hlen
+    size = len(buf)
+    for _ in range(ntrks):
+        # skip unknown chunks between tracks
+        while pos + 8 <= size and buf[pos:pos + 4] != b"MTrk":
+            pos += 8 + struct.unpack_from(">I", buf, pos + 4)[0]
+        if pos + 8 > size:
+            break
+        length = struct.unpack_from(">I", buf, pos + 4)[0]
+        start = pos + 8
+        end = min(size, start + length)
+        _decode_track(buf, start, end, data)
+        pos = start + length
+    return data
+
+
+def _decode_track(buf, pos, end, data):
+    tick = 0
+    status = 0
+    open_notes = {}   # (channel, note) -> open (start_tick, velocity, lyric), oldest first
+    notes = []
+    lyric = ""
+    while pos < end:
+        # delta time
+        delta = 0
+        while True:
+            b = buf[pos]
+            pos += 1
+            delta = (delta << 7) | (b & 0x7f)
+            if b < 0x80:
+                break
+        tick += delta
+
+        b = buf[pos]
+        if b & 0x80:
+            pos += 1
+            if b < 0xf0:
+                status = b
+        else:
+            # running status: the byte is already the first data byte
+            b = status
+
+        kind = b & 0xf0
+        if kind == 0x90 or kind == 0x80:
+            note = buf[pos]
+            vel = buf[pos + 1]
+            pos += 2
+            key = (b & 0x0f, note)
+            if kind == 0x90 and vel:
+                open_notes.setdefault(key, []).append((tick, vel, lyric))
+                lyric = ""
+            else:
+                stack = open_notes.get(key)
+                if stack:
+                    on_tick, on_vel, text = stack.pop(0)
+                    notes.append((on_tick, tick - on_tick, note, on_vel, b & 0x0f, text))
+        elif kind in (0xa0, 0xb0, 0xe0):
+            pos += 2
+        elif kind in (0xc0, 0xd0):
+            pos += 1
+        elif b == 0xff:
+            meta = buf[pos]
+            pos += 1
+            n = 0
+            while True:
+                c = buf[pos]
+                pos += 1
+                n = (n << 7) | (c & 0x7f)
+                if c < 0x80:
+                    break
+            if meta == 0x51 and n == 3:
+                data.tempos.append((tick, (buf[pos] << 16) | (buf[pos + 1] << 8) | buf[pos + 2]))
+            elif meta == 0x05:
+                lyric = bytes(buf[pos:pos + n]).decode("utf-8", "replace").strip()
+            elif meta == 0x2f:
+                break
+            pos += n
+            # meta events cancel running status
+            status = 0
+        elif b == 0xf0 or b == 0xf7:
+            n = 0
+            while True:
+                c = buf[pos]
+                pos += 1
+                n = (n << 7) | (c & 0x7f)
+                if c < 0x80:
+                    break
+            pos += n
+            status = 0
+        else:
+            raise ValueError(f"bad MIDI status byte 0x{b:02x}")
+    for stack in open_notes.values():
+        data.unpaired += len(stack)
+    notes.sort()
+    data.notes.extend(notes)
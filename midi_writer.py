@@ -0,0 +1,206 @@
+"""Streaming Standard MIDI File writer.
+
+Events are encoded straight into a small buffer that is flushed to the
+file as it fills, and each track's length is patched in when the track
+ends, so memory stays bounded no matter how many events are written.
+Channel messages use running status, and note-offs are written as
+note-on with velocity 0 so long runs of notes share one status byte.
+
+    with MidiWriter(path, ppq=480) as mw:
+        with mw.track("Conductor") as t:
+            t.tempo(0, 120)
+        with mw.track("Melody") as t:
+            for tick, dur, note, vel, lyric in notes:   # sorted by tick
+                t.note(tick, dur, note, vel, lyric=lyric)
+
+Ticks passed to a track must never decrease; `note` keeps pending
+note-offs in a heap (bounded by the number of overlapping notes) and
+emits them in order as later events are written.
+"""
+import heapq
+import struct
+
+PPQ = 480
+FLUSH_BYTES = 1 << 16
+
+
+def varlen(n: int) -> bytes:
+    """Encode a MIDI variable-length quantity."""
+    n &= 0x0fffffff
+    out = [n & 0x7f]
+    n >>= 7
+    while n:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    return bytes(reversed(out))
+
+
+class TrackWriter:
+    """Writes one MTrk chunk; obtained from MidiWriter.track()."""
+
+    def __init__(self, owner):
+        self._owner = owner
+        self._buf = bytearray()
+        self._last_tick = 0
+        self._status = None          # running status byte, None after meta
+        self._offs = []              # heap of (tick, serial, channel, note)
+        self._serial = 0
+        self.events = 0
+        self.closed = False
+
+    # ---- encoding ----
+    def _delta(self, tick):
+        if len(self._buf) >= FLUSH_BYTES:
+            self._owner._write(self._buf)
+            self._buf = bytearray()
+        tick = int(tick)
+        if tick < self._last_tick:
+            raise ValueError(f"event at tick {tick} is before tick {self._last_tick}")
+        self._buf += varlen(tick - self._last_tick)
+        self._last_tick = tick
+        self.events += 1
+
+    def _channel(self, tick, status, a, b):
+        self._flush_offs(tick)
+        self._delta(tick)
+        if status != self._status:
+            self._buf.append(status)
+            self._status = status
+        self._buf.append(a & 0x7f)
+        self._buf.append(b & 0x7f)
+
+    def _flush_offs(self, tick):
+        offs = self._offs
+        while offs and offs[0][0] <= tick:
+            off_tick, _, ch, note = heapq.heappop(offs)
+            self._delta(off_tick)
+            status = 0x90 | ch
+            if status != self._status:
+                self._buf.append(status)
+                self._status = status
+            self._buf.append(note)
+            self._buf.append(0)
+
+    # ---- events ----
+    def meta(self, tick, kind: int, data: bytes):
+        self._flush_offs(tick)
+        self._delta(tick)
+        self._buf.append(0xff)
+        self._buf.append(kind & 0x7f)
+        self._buf += varlen(len(data))
+        self._buf += data
+        # meta events cancel running status
+        self._status = None
+
+    def name(self, text: str, tick=0):
+        self.meta(tick, 0x03, text.encode("utf-8"))
+
+    def tempo(self, tick, bpm: float):
+        us_per_q = max(1, min(0xffffff, int(round(60_000_000 / float(bpm)))))
+        self.meta(tick, 0x51, struct.pack('>I', us_per_q)[1:])
+
+    def time_signature(self, tick, num=4, denom=4):
+        self.meta(tick, 0x58, bytes([num, max(0, denom.bit_length() - 1), 24, 8]))
+
+    def lyric(self, tick, text: str):
+        self.meta(tick, 0x05, text.encode("utf-8"))
+
+    def note_on(self, tick, note, velocity=100, channel=0):
+        self._channel(tick, 0x90 | (channel & 0x0f), note, max(1, velocity))
+
+    def note_off(self, tick, note, channel=0):
+        self._channel(tick, 0x90 | (channel & 0x0f), note, 0)
+
+    def program(self, tick, program, channel=0):
+        self._flush_offs(tick)
+        self._delta(tick)
+        self._buf.append(0xc0 | (channel & 0x0f))
+        self._buf.append(program & 0x7f)
+        self._status = 0xc0 | (channel & 0x0f)
+
+    def note(self, tick, duration, note, velocity=100, channel=0, lyric=None):
+        """Note-on now plus a note-off `duration` ticks later."""
+        tick = int(tick)
+        if lyric:
+            self.lyric(tick, lyric)
+        self.note_on(tick, note, velocity, channel)
+        self._serial += 1
+        heapq.heappush(self._offs, (tick + max(0, int(duration)), self._serial,
+                                    channel & 0x0f, note & 0x7f))
+
+    def close(self, tick=None):
+        """Flush pending note-offs and write End of Track."""
+        if self.closed:
+            return
+        end = max((o[0] for o in self._offs), default=self._last_tick)
+        self._flush_offs(end)
+        self.meta(max(end, int(tick or 0)), 0x2f, b"")
+        self.closed = True
+        self._owner._end_track(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MidiWriter:
+    """Standard MIDI File writer streaming to `path` (or a binary file)."""
+
+    def __init__(self, path, ppq: int = PPQ, fmt: int = 1):
+        if fmt not in (0, 1):
+            raise ValueError("only format 0 and 1 are supported")
+        self.ppq = ppq
+        self.fmt = fmt
+        self._own = isinstance(path, str)
+        self._f = open(path, "wb") if self._own else path
+        self._tracks = 0
+        self._track = None
+        self._chunk_pos = None
+        self._header_pos = self._f.tell()
+        self._f.write(b"MThd" + struct.pack(">IHHH", 6, fmt, 0, ppq))
+
+    def track(self, name: str = None) -> TrackWriter:
+        if self._track is not None:
+            raise RuntimeError("close the current track first")
+        if self.fmt == 0 and self._tracks:
+            raise RuntimeError("format 0 files have a single track")
+        self._chunk_pos = self._f.tell()
+        self._f.write(b"MTrk\0\0\0\0")
+        self._track = TrackWriter(self)
+        if name:
+            self._track.name(name)
+        return self._track
+
+    def _write(self, buf):
+        self._f.write(buf)
+
+    def _end_track(self, track):
+        self._write(track._buf)
+        track._buf = bytearray()
+        end = self._f.tell()
+        self._f.seek(self._chunk_pos + 4)
+        self._f.write(struct.pack(">I", end - self._chunk_pos - 8))
+        self._f.seek(end)
+        self._tracks += 1
+        self._track = None
+
+    def close(self):
+        if self._f is None:
+            return
+        if self._track is not None:
+            self._track.close()
+        end = self._f.tell()
+        self._f.seek(self._header_pos + 10)
+        self._f.write(struct.pack(">H", self._tracks))
+        self._f.seek(end)
+        if self._own:
+            self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,268 @@
+"""Headless note model.
+
+Notes are kept in parallel typed-array columns indexed by a stable integer
+note id (ids are never reused). Lyrics are interned in a string table so
+repeated phonemes share one object. A sorted (start, row, id) index gives
+chronological iteration and O(log n) time-range queries without touching
+Tk, and a per-row interval index answers point hit tests. The piano-roll
+canvas is only a view over this store.
+"""
+import bisect
+import heapq
+from array import array
+
+from spatial_index import RowIndex
+
+_INF = float("inf")
+BULK_EDIT = 32   # edits of more notes than this re-merge the indexes once
+
+
+class NoteStore:
+    def __init__(self):
+        self.row = array('h')        # pitch row (index into PITCHES)
+        self.start = array('d')      # start, in grid steps
+        self.length = array('d')     # length, in grid steps
+        self.velocity = array('B')
+        self.lyric_ix = array('i')   # offset into lyric_table
+        self.alive = bytearray()
+        self.lyric_table = [""]
+        self._lyric_lookup = {"": 0}
+        self._index = []             # sorted (start, row, id) for live notes
+        self._rows = RowIndex()      # per-row intervals for hit testing
+        self._count = 0
+        self._max_length = 0.0
+        # optional edit log (see project_file.Journal); every mutation below
+        # is recorded as a small tuple
+        self.journal = None
+
+    @classmethod
+    def from_columns(cls, row, start, length, velocity, lyric_ix, alive, lyric_table):
+        """Adopt ready-made columns (e.g. read from a project file) and
+        rebuild the indexes; note ids are the column positions."""
+        store = cls()
+        store.row, store.start, store.length = row, start, length
+        store.velocity, store.lyric_ix, store.alive = velocity, lyric_ix, alive
+        store.lyric_table = list(lyric_table) or [""]
+        store._lyric_lookup = {text: i for i, text in enumerate(store.lyric_table)}
+        ids = [i for i in range(len(alive)) if alive[i]]
+        store._index = sorted((start[i], row[i], i) for i in ids)
+        store._rows.bulk_insert((row[i], start[i], i, length[i]) for i in ids)
+        store._count = len(ids)
+        store._max_length = max((length[i] for i in ids), default=0.0)
+        return store
+
+    # ---- mutation ----
+    def add(self, row: int, start: float, length: float = 1, velocity: int = 100, lyric: str = "") -> int:
+        if self.journal is not None:
+            self.journal.record(("a", row, start, length, velocity, lyric))
+        nid = len(self.alive)
+        self.row.append(row)
+        self.start.append(start)
+        self.length.append(length)
+        self.velocity.append(max(0, min(127, int(velocity))))
+        self.lyric_ix.append(self._intern(lyric))
+        self.alive.append(1)
+        bisect.insort(self._index, (start, row, nid))
+        self._rows.insert(row, start, nid, length)
+        self._count += 1
+        if length > self._max_length:
+            self._max_length = length
+        return nid
+
+    def add_many(self, notes):
+        """Bulk insert (row, start, length, velocity, lyric) tuples; the start
+        index is rebuilt once instead of per note. Returns the new ids."""
+        if self.journal is not None:
+            notes = [tuple(n) for n in notes]
+            self.journal.record(("m", notes))
+        first = len(self.alive)
+        for row, start, length, velocity, lyric in notes:
+            self.row.append(row)
+            self.start.append(start)
+            self.length.append(length)
+            self.velocity.append(max(0, min(127, int(velocity))))
+            self.lyric_ix.append(self._intern(lyric))
+            self.alive.append(1)
+            if length > self._max_length:
+                self._max_length = length
+        ids = range(first, len(self.alive))
+        self._index.extend((self.start[i], self.row[i], i) for i in ids)
+        self._index.sort()
+        self._rows.bulk_insert((self.row[i], self.start[i], i, self.length[i]) for i in ids)
+        self._count += len(ids)
+        return list(ids)
+
+    def remove(self, nid: int):
+        if not self.alive[nid]:
+            return
+        if self.journal is not None:
+            self.journal.record(("r", nid))
+        self._unindex(nid)
+        self.alive[nid] = 0
+        self._count -= 1
+
+    def restore(self, nid: int, row: int, start: float, length: float, velocity: int, lyric: str):
+        """Bring a removed note back under its old id (used by undo)."""
+        if self.alive[nid]:
+            return
+        if self.journal is not None:
+            self.journal.record(("s", nid, row, start, length, velocity, lyric))
+        self.row[nid] = row
+        self.start[nid] = start
+        self.length[nid] = length
+        self.velocity[nid] = max(0, min(127, int(velocity)))
+        self.lyric_ix[nid] = self._intern(lyric)
+        self.alive[nid] = 1
+        bisect.insort(self._index, (start, row, nid))
+        self._rows.insert(row, start, nid, length)
+        self._count += 1
+        if length > self._max_length:
+            self._max_length = length
+
+    def snapshot(self, nid: int):
+        """(row, start, length, velocity, lyric) of one note."""
+        return (self.row[nid], self.start[nid], self.length[nid], self.velocity[nid], self.lyric(nid))
+
+    def update(self, nid: int, row=None, start=None, length=None, velocity=None, lyric=None):
+        if self.journal is not None:
+            self.journal.record(("u", nid, row, start, length, velocity, lyric))
+        if row is not None or start is not None:
+            self._move(nid, self.row[nid] if row is None else row,
+                       self.start[nid] if start is None else start)
+        if length is not None:
+            self.length[nid] = length
+            self._rows.grow(self.row[nid], length)
+            if length > self._max_length:
+                self._max_length = length
+        if velocity is not None:
+            self.velocity[nid] = max(0, min(127, int(velocity)))
+        if lyric is not None:
+            self.lyric_ix[nid] = self._intern(lyric)
+
+    def shift_many(self, ids, steps=0.0, rows=0):
+        """Move notes by one (steps, rows) offset. Large selections are
+        filtered out of the start index and merged back in one pass
+        instead of being re-inserted one by one."""
+        ids = list(ids)
+        if self.journal is not None:
+            self.journal.record(("t", ids, steps, rows))
+        row, start = self.row, self.start
+        if len(ids) <= BULK_EDIT:
+            for nid in ids:
+                self._move(nid, row[nid] + rows, start[nid] + steps)
+            return
+        moved = set(ids)
+        keep = [k for k in self._index if k[2] not in moved]
+        self._rows.remove_many((row[nid], start[nid], nid) for nid in ids)
+        for nid in ids:
+            row[nid] += rows
+            start[nid] += steps
+        self._index = list(heapq.merge(keep, sorted((start[nid], row[nid], nid) for nid in ids)))
+        self._rows.bulk_insert((row[nid], start[nid], nid, self.length[nid]) for nid in ids)
+
+    def resize_many(self, ids, steps):
+        """Change the length of notes by the same number of steps."""
+        ids = list(ids)
+        if self.journal is not None:
+            self.journal.record(("g", ids, steps))
+        length = self.length
+        for nid in ids:
+            length[nid] += steps
+            self._rows.grow(self.row[nid], length[nid])
+            if length[nid] > self._max_length:
+                self._max_length = length[nid]
+
+    def set_lyrics(self, pairs):
+        """Assign many (id, lyric) pairs in one pass."""
+        if self.journal is not None:
+            pairs = list(pairs)
+            self.journal.record(("l", pairs))
+        ix = self.lyric_ix
+        for nid, lyric in pairs:
+            ix[nid] = self._intern(lyric)
+
+    def clear(self):
+        journal = self.journal
+        if journal is not None:
+            journal.record(("c",))
+        self.__init__()
+        self.journal = journal
+
+    def _intern(self, text):
+        text = text or ""
+        i = self._lyric_lookup.get(text)
+        if i is None:
+            i = len(self.lyric_table)
+            self.lyric_table.append(text)
+            self._lyric_lookup[text] = i
+        return i
+
+    def _move(self, nid, row, start):
+        self._unindex(nid)
+        self.row[nid] = row
+        self.start[nid] = start
+        bisect.insort(self._index, (start, row, nid))
+        self._rows.insert(row, start, nid, self.length[nid])
+
+    def _unindex(self, nid):
+        key = (self.start[nid], self.row[nid], nid)
+        i = bisect.bisect_left(self._index, key)
+        if i < len(self._index) and self._index[i] == key:
+            del self._index[i]
+        self._rows.remove(self.row[nid], self.start[nid], nid)
+
+    # ---- queries ----
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, nid):
+        return isinstance(nid, int) and 0 <= nid < len(self.alive) and bool(self.alive[nid])
+
+    def __iter__(self):
+        return self.ids()
+
+    def ids(self):
+        """Live note ids in insertion order."""
+        alive = self.alive
+        return (i for i in range(len(alive)) if alive[i])
+
+    def lyric(self, nid: int) -> str:
+        return self.lyric_table[self.lyric_ix[nid]]
+
+    def end(self, nid: int) -> float:
+        return self.start[nid] + self.length[nid]
+
+    def sorted_ids(self):
+        """Live note ids ordered by (start, row)."""
+        return [k[2] for k in self._index]
+
+    def sorted_keys(self):
+        """The (start, row, id) index itself; treat as read-only."""
+        return self._index
+
+    def rank(self, nid: int) -> int:
+        """Position of a live note in (start, row) order, in O(log n)."""
+        return bisect.bisect_left(self._index, (self.start[nid], self.row[nid], nid))
+
+    def starting_in(self, t0: float, t1: float):
+        """Ids of notes whose start lies in [t0, t1), in start order."""
+        lo = bisect.bisect_left(self._index, (t0,))
+        hi = bisect.bisect_left(self._index, (t1,), lo)
+        return [k[2] for k in self._index[lo:hi]]
+
+    def notes_at(self, row: int, step: float, slack: float = 0.0):
+        """Ids of notes in `row` covering `step` (right edge widened by slack)."""
+        return self._rows.at(row, step, self.length, slack)
+
+    def overlapping(self, t0: float, t1: float):
+        """Ids of notes sounding anywhere in [t0, t1)."""
+        lo = bisect.bisect_left(self._index, (t0 - self._max_length,))
+        hi = bisect.bisect_left(self._index, (t1,), lo)
+        start, length = self.start, self.length
+        return [k[2] for k in self._index[lo:hi] if start[k[2]] + length[k[2]] > t0]
+
+    def duration(self) -> float:
+        """End of the last note, in grid steps."""
+        if not self._index:
+            return 0.0
+        return max(self.end(n) for n in self.overlapping(self._index[-1][0], _INF))
@@ -0,0 +1,152 @@
+"""Offline WAV rendering.
+
+The note timeline is split into fixed-length time chunks. Each chunk is
+synthesized and mixed independently in a process pool, and the mixed
+chunks are streamed to the WAV file in order as they complete, so only a
+bounded number of chunks is ever held in memory regardless of song length.
+"""
+import bisect
+import multiprocessing
+import os
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import synth
+from audio_engine import MASTER_GAIN, RELEASE_FRAMES
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+CHUNK_SECONDS = 5.0
+
+
+def _mix_numpy(c0, n, notes, timbre):
+    acc = np.zeros(n, dtype=np.float32)
+    for start, freq, dur_ms in notes:
+        pcm = np.frombuffer(synth.render_tone(freq, dur_ms, timbre), dtype="<i2")
+        off = start - c0
+        a = max(0, off)
+        b = min(n, off + len(pcm))
+        if b <= a:
+            continue
+        seg = pcm[a - off:b - off].astype(np.float32)
+        # same tail fade the live engine applies
+        rel = len(pcm) - RELEASE_FRAMES
+        if b - off > rel:
+            idx = np.arange(a - off, b - off, dtype=np.float32)
+            seg *= np.clip(1.0 - (idx - rel) / RELEASE_FRAMES, 0.0, 1.0)
+        acc[a:b] += seg
+    acc *= MASTER_GAIN
+    np.clip(acc, -32767, 32767, out=acc)
+    return acc.astype("<i2").tobytes()
+
+
+def _mix_python(c0, n, notes, timbre):
+    acc = [0.0] * n
+    for start, freq, dur_ms in notes:
+        pcm = array('h', synth.render_tone(freq, dur_ms, timbre))
+        off = start - c0
+        rel = len(pcm) - RELEASE_FRAMES
+        for i in range(max(0, off), min(n, off + len(pcm))):
+            j = i - off
+            s = pcm[j]
+            if j > rel:
+                s *= max(0.0, 1.0 - (j - rel) / RELEASE_FRAMES)
+            acc[i] += s
+    out = array('h', (int(max(-32767, min(32767, s * MASTER_GAIN))) for s in acc))
+    return out.tobytes()
+
+
+def render_chunk(job) -> bytes:
+    """Mix one chunk. `job` is (first_frame, n_frames, notes, timbre) where
+    notes are (start_frame, freq_hz, duration_ms) tuples overlapping it."""
+    c0, n, notes, timbre = job
+    if np is not None:
+        return _mix_numpy(c0, n, notes, timbre)
+    return _mix_python(c0, n, notes, timbre)
+
+
+def plan_chunks(notes, sample_rate=synth.SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS):
+    """Split (start_s, duration_s, freq_hz) notes into per-chunk jobs.
+
+    Returns (total_frames, jobs); a note that spans a chunk boundary is
+    listed in every chunk it overlaps and each worker renders its own slice.
+    """
+    items = sorted((int(round(s * sample_rate)), int(round(d * sample_rate)), f, d * 1000.0)
+                   for s, d, f in notes)
+    if not items:
+        return 0, []
+    # the synth never renders shorter than 10 ms
+    min_frames = int(sample_rate * 0.01)
+    total = max(st + max(nf, min_frames) for st, nf, _, _ in items)
+    longest = max(max(nf, min_frames) for _, nf, _, _ in items)
+    starts = [st for st, _, _, _ in items]
+    chunk_frames = max(1, int(chunk_seconds * sample_rate))
+    jobs = []
+    for c0 in range(0, total, chunk_frames):
+        n = min(chunk_frames, total - c0)
+        lo = bisect.bisect_left(starts, c0 - longest)
+        hi = bisect.bisect_left(starts, c0 + n)
+        sel = [(st, f, dms) for st, nf, f, dms in items[lo:hi] if st + max(nf, min_frames) > c0]
+        jobs.append((c0, n, sel))
+    return total, jobs
+
+
+def render_wav(notes, path: str, timbre: str = synth.DEFAULT_TIMBRE, workers: int = None,
+               chunk_seconds: float = CHUNK_SECONDS, progress=None, cancel=None) -> int:
+    """Render notes to a 16-bit mono WAV file, chunk by chunk.
+
+    `notes` is an iterable of (start_seconds, duration_seconds, freq_hz).
+    `progress(done, total)` is called from the rendering thread after each
+    chunk is written; `cancel()` returning True aborts early. Returns the
+    number of frames written.
+    """
+    sample_rate = synth.SAMPLE_RATE
+    total, jobs = plan_chunks(notes, sample_rate, chunk_seconds)
+    jobs = [(c0, n, sel, timbre) for c0, n, sel in jobs]
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+
+        def emit(pcm):
+            nonlocal written
+            wf.writeframes(pcm)
+            written += len(pcm) // 2
+            if progress:
+                progress(written, total)
+
+        if workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                if cancel and cancel():
+                    break
+                emit(render_chunk(job))
+            return written
+
+        # spawn keeps workers clear of the parent's Tk/audio threads
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            # keep a bounded window of chunks in flight and write in order
+            window = workers * 2
+            pending = []
+            it = iter(jobs)
+            for job in it:
+                pending.append(pool.submit(render_chunk, job))
+                if len(pending) >= window:
+                    break
+            while pending:
+                if cancel and cancel():
+                    for fut in pending:
+                        fut.cancel()
+                    break
+                emit(pending.pop(0).result())
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending.append(pool.submit(render_chunk, nxt))
+    return written
@@ -0,0 +1,161 @@
+"""Lightweight runtime instrumentation.
+
+Spans (timed sections), counters and instant events are recorded into a
+bounded ring buffer and can be summarized for the status bar or exported
+as a Chrome trace-event JSON file (load it in chrome://tracing or
+Perfetto).
+
+Everything is off by default. While disabled, `span()` returns a shared
+no-op context manager and the other hooks return after one attribute
+check, so instrumented code pays close to nothing; hot loops can also
+test `profiler.enabled` themselves and skip building arguments.
+
+    from profiler import profiler
+    with profiler.span("refresh_viewport", "canvas"):
+        ...
+    profiler.counter("voices", active=3)
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_EVENTS = 200_000
+SUMMARY_WINDOW_S = 2.0
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("prof", "name", "cat", "args", "t0")
+
+    def __init__(self, prof, name, cat, args):
+        self.prof = prof
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def set(self, **args):
+        """Attach values known only at the end of the section."""
+        self.args.update(args)
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter()
+        self.prof._add("X", self.name, self.cat, self.t0, t1 - self.t0, self.args)
+        return False
+
+
+class Profiler:
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self.enabled = False
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self.counters = {}   # name -> latest {field: value}
+
+    def enable(self, on: bool = True):
+        self.enabled = bool(on)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self.counters.clear()
+
+    # ---- hooks ----
+    def span(self, name, cat="app", **args):
+        if not self.enabled:
+            return _NULL
+        return _Span(self, name, cat, args)
+
+    def counter(self, name, **values):
+        if not self.enabled:
+            return
+        self.counters[name] = values
+        self._add("C", name, "counter", time.perf_counter(), 0.0, values)
+
+    def instant(self, name, cat="app", **args):
+        if not self.enabled:
+            return
+        self._add("i", name, cat, time.perf_counter(), 0.0, args)
+
+    def traced(self, name=None, cat="app"):
+        """Decorator form of span()."""
+        def wrap(fn):
+            label = name or fn.__name__
+
+            def inner(*a, **kw):
+                if not self.enabled:
+                    return fn(*a, **kw)
+                with _Span(self, label, cat, {}):
+                    return fn(*a, **kw)
+            inner.__name__ = fn.__name__
+            inner.__doc__ = fn.__doc__
+            return inner
+        return wrap
+
+    def _add(self, ph, name, cat, t, dur, args):
+        with self._lock:
+            self._events.append((ph, name, cat, t, dur, threading.get_ident(), args))
+
+    # ---- reporting ----
+    def stats(self, window_s: float = SUMMARY_WINDOW_S):
+        """{span name: (count, mean_ms, max_ms)} over the last window_s."""
+        since = time.perf_counter() - window_s
+        with self._lock:
+            recent = [e for e in self._events if e[0] == "X" and e[3] >= since]
+        out = {}
+        for _, name, _, _, dur, _, _ in recent:
+            n, total, peak = out.get(name, (0, 0.0, 0.0))
+            out[name] = (n + 1, total + dur, max(peak, dur))
+        return {k: (n, total / n * 1000.0, peak * 1000.0) for k, (n, total, peak) in out.items()}
+
+    def summary(self, window_s: float = SUMMARY_WINDOW_S):
+        """One status-bar line: recent span timings, then latest counters."""
+        parts = [f"{name} {mean:.2f}/{peak:.2f}ms x{n}"
+                 for name, (n, mean, peak) in sorted(self.stats(window_s).items())]
+        for name, values in sorted(self.counters.items()):
+            parts.append(name + " " + " ".join(f"{k}={v:g}" if isinstance(v, float) else f"{k}={v}"
+                                               for k, v in values.items()))
+        return " | ".join(parts) if parts else "profiling: no events yet"
+
+    def export_chrome(self, path: str):
+        """Write the buffered events as Chrome trace-event JSON."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        trace = []
+        for ph, name, cat, t, dur, tid, args in events:
+            ev = {"name": name, "cat": cat, "ph": ph, "pid": pid, "tid": tid,
+                  "ts": round((t - self._t0) * 1e6, 3)}
+            if ph == "X":
+                ev["dur"] = round(dur * 1e6, 3)
+            elif ph == "i":
+                ev["s"] = "t"
+            if args:
+                ev["args"] = args
+            trace.append(ev)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        return len(trace)
+
+
+profiler = Profiler()
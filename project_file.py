@@ -0,0 +1,246 @@
+"""Project files: a columnar note snapshot plus an append-only edit journal.
+
+Snapshot layout (little-endian), every section 8-byte aligned:
+
+    header   magic "SICP", version u16, reserved u16, snapshot id u64,
+             slots u32, strings u32, string bytes u32, reserved u32,
+             reserved u64   (40 bytes)
+    columns  start f64[slots], length f64[slots], lyric i32[slots],
+             row i16[slots], velocity u8[slots], alive u8[slots]
+    strings  offsets u32[strings + 1], UTF-8 blob
+    tempo    changes u32, reserved u32, (step f64, bpm f64)[changes]
+
+Columns hold every note slot, including deleted ones (alive = 0), so note
+ids in a loaded project match the ids of the session that saved it. A
+snapshot is read through mmap with one bulk copy per column; no note is
+decoded field by field, though NoteStore.from_columns still rebuilds its
+start-order index from the columns, which is most of the load time.
+
+Edits made after a save go to `<project>.journal`, one JSON line per
+NoteStore mutation, written by a background thread so the UI only pays
+for a queue put. Opening a project replays a journal whose first line
+names the snapshot it belongs to; a truncated last line from a crash is
+ignored. A Journal starts by rewriting the file to that header plus the
+edits replay would apply, so a missing, stale or torn journal is never
+appended to. Only note edits are journaled: tempo map changes are saved
+with the next snapshot, so recovery after a crash restores the notes at
+the tempo of the last save.
+"""
+import json
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+from array import array
+
+from note_store import NoteStore
+from tempo_map import TempoMap, as_map
+
+MAGIC = b"SICP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQIIIIQ")
+_TEMPO_HEAD = struct.Struct("<II")
+# (attribute, typecode) in file order
+_COLUMNS = (("start", "d"), ("length", "d"), ("lyric_ix", "i"), ("row", "h"), ("velocity", "B"))
+
+
+def _pad(n):
+    return (-n) % 8
+
+
+def journal_path(path):
+    return path + ".journal"
+
+
+def save(store: NoteStore, path: str, tempo) -> int:
+    """Write a snapshot atomically and start a fresh journal for it.
+    `tempo` is a TempoMap or a BPM number. Returns the snapshot id."""
+    tempo = as_map(tempo)
+    snapshot_id = int.from_bytes(os.urandom(8), "little")
+    blobs = [s.encode("utf-8") for s in store.lyric_table]
+    offsets = array("I", [0])
+    for b in blobs:
+        offsets.append(offsets[-1] + len(b))
+    slots = len(store.alive)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, snapshot_id, slots, len(blobs), offsets[-1], 0, 0))
+        for name, code in _COLUMNS:
+            col = getattr(store, name)
+            if sys.byteorder == "big":
+                col = array(code, col)
+                col.byteswap()
+            data = col.tobytes()
+            f.write(data + b"\0" * _pad(len(data)))
+        f.write(bytes(store.alive) + b"\0" * _pad(slots))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        data = offsets.tobytes()
+        f.write(data + b"\0" * _pad(len(data)))
+        blob = b"".join(blobs)
+        f.write(blob + b"\0" * _pad(len(blob)))
+        f.write(_TEMPO_HEAD.pack(len(tempo), 0))
+        f.write(struct.pack(f"<{2 * len(tempo)}d", *(v for change in tempo for v in change)))
+    os.replace(tmp, path)
+    _write_journal(path, snapshot_id, ())
+    return snapshot_id
+
+
+def load(path: str):
+    """Read a snapshot. Returns (store, tempo_map, snapshot_id)."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version = struct.unpack_from("<4sH", mm, 0)
+            if magic != MAGIC:
+                raise ValueError("not a project file")
+            if version > VERSION:
+                raise ValueError(f"project file version {version} is newer than this editor")
+            _, _, _, snapshot_id, slots, nstrings, nbytes, _, _ = _HEADER.unpack_from(mm, 0)
+            pos = _HEADER.size
+            cols = {}
+            for name, code in _COLUMNS:
+                col = array(code)
+                size = slots * col.itemsize
+                col.frombytes(mm[pos:pos + size])
+                if sys.byteorder == "big":
+                    col.byteswap()
+                cols[name] = col
+                pos += size + _pad(size)
+            alive = bytearray(mm[pos:pos + slots])
+            pos += slots + _pad(slots)
+            offsets = array("I")
+            size = (nstrings + 1) * offsets.itemsize
+            offsets.frombytes(mm[pos:pos + size])
+            if sys.byteorder == "big":
+                offsets.byteswap()
+            pos += size + _pad(size)
+            blob = mm[pos:pos + nbytes]
+            pos += nbytes + _pad(nbytes)
+            count, _ = _TEMPO_HEAD.unpack_from(mm, pos)
+            values = struct.unpack_from(f"<{2 * count}d", mm, pos + _TEMPO_HEAD.size)
+            tempo = TempoMap(zip(values[0::2], values[1::2]))
+    strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(nstrings)]
+    store = NoteStore.from_columns(cols["row"], cols["start"], cols["length"], cols["velocity"],
+                                   cols["lyric_ix"], alive, strings)
+    return store, tempo, snapshot_id
+
+
+def _journal_ops(path, snapshot_id):
+    """Edits in the journal of `path` that belong to `snapshot_id`, up to
+    the first line that does not parse."""
+    try:
+        f = open(journal_path(path), "r", encoding="utf-8")
+    except OSError:
+        return []
+    ops = []
+    with f:
+        try:
+            head = json.loads(f.readline())
+        except ValueError:
+            return []
+        if not isinstance(head, dict) or head.get("snapshot") != snapshot_id:
+            return []
+        for line in f:
+            try:
+                op = json.loads(line)
+            except ValueError:
+                # torn write at the moment of a crash
+                break
+            ops.append(op)
+    return ops
+
+
+def _write_journal(path, snapshot_id, ops):
+    """Atomically replace the journal with a header and `ops`."""
+    jpath = journal_path(path)
+    tmp = jpath + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"snapshot": snapshot_id}) + "\n")
+        for op in ops:
+            f.write(json.dumps(op, separators=(",", ":")) + "\n")
+    os.replace(tmp, jpath)
+
+
+def replay(store: NoteStore, path: str, snapshot_id: int) -> int:
+    """Apply the journal of `path` to a freshly loaded store. Returns the
+    number of edits replayed (0 if the journal belongs to another snapshot)."""
+    ops = _journal_ops(path, snapshot_id)
+    for op in ops:
+        _apply(store, op)
+    return len(ops)
+
+
+def _apply(store, op):
+    kind = op[0]
+    if kind == "a":
+        store.add(*op[1:])
+    elif kind == "m":
+        store.add_many(op[1])
+    elif kind == "r":
+        store.remove(op[1])
+    elif kind == "s":
+        store.restore(*op[1:])
+    elif kind == "u":
+        store.update(*op[1:])
+    elif kind == "t":
+        store.shift_many(*op[1:])
+    elif kind == "g":
+        store.resize_many(*op[1:])
+    elif kind == "l":
+        store.set_lyrics(op[1])
+    elif kind == "c":
+        store.clear()
+
+
+def open_project(path: str):
+    """Load a snapshot and replay its journal. Returns (store, tempo_map,
+    snapshot_id, replayed)."""
+    store, tempo, snapshot_id = load(path)
+    replayed = replay(store, path, snapshot_id)
+    return store, tempo, snapshot_id, replayed
+
+
+class Journal:
+    """Appends store edits to `<project>.journal` from a daemon thread.
+
+    The file is first rewritten to the header of `snapshot_id` and the
+    edits that replay would apply, dropping a stale journal or a torn
+    last line before anything is appended."""
+
+    def __init__(self, path: str, snapshot_id: int):
+        _write_journal(path, snapshot_id, _journal_ops(path, snapshot_id))
+        self.path = journal_path(path)
+        self._q = queue.Queue()
+        self.records = 0
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def record(self, op):
+        self.records += 1
+        self._q.put(op)
+
+    def close(self):
+        """Flush outstanding edits and stop the writer."""
+        self._q.put(None)
+        self._thread.join(timeout=5.0)
+
+    def _writer(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                op = self._q.get()
+                batch = [op]
+                # drain whatever queued up meanwhile and write it in one go
+                while op is not None:
+                    try:
+                        op = self._q.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(op)
+                lines = [json.dumps(o, separators=(",", ":")) for o in batch if o is not None]
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                if batch[-1] is None:
+                    return
@@ -0,0 +1,179 @@
+"""Render-ahead: synthesize upcoming notes before the playhead reaches them.
+
+During playback the editor calls `update()` once per tick with the current
+position. Every note starting within the next RENDER_AHEAD_S seconds is
+handed to a small worker pool, which renders it into the shared tone
+cache. When the onset comes round, the engine's note_on finds the buffer
+ready, so synthesis time no longer shows up as onset latency.
+
+Playback runs on its own thread while the UI keeps editing, so it does
+not read the NoteStore. It plans from a NoteTable, a copy of the notes'
+rows, starts and lengths taken on the UI thread and patched with the
+edits queued since, and takes upcoming onsets from the (locked) event
+timeline.
+
+The plan belongs to one note table, one tempo map, one timbre and one
+generation. Editing notes (`invalidate()`), a new table, or changing the
+tempo map or the voice starts a new generation. Queued jobs of the old
+generation are cancelled, and planning resumes from the current position.
+
+Workers are threads. NumPy synthesis releases the GIL for its array work,
+and the finished buffers land directly in synth.tone_cache without being
+pickled back from another process.
+"""
+import os
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import synth
+import tuning
+
+RENDER_AHEAD_S = 2.0
+RENDER_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+WAIT_S = 0.05   # longest an onset waits for a buffer that is being rendered
+
+
+class NoteTable:
+    """Playback's copy of the notes' row, start and length columns, indexed
+    by note id. Built on the UI thread; `apply` then takes the
+    {id: (row, start, length) or None} edits (loop_region.snapshot)."""
+
+    def __init__(self, store):
+        self.row = array('h', store.row)
+        self.start = array('d', store.start)
+        self.length = array('d', store.length)
+        self.alive = bytearray(store.alive)
+
+    def __contains__(self, nid):
+        return 0 <= nid < len(self.alive) and bool(self.alive[nid])
+
+    def end(self, nid: int) -> float:
+        return self.start[nid] + self.length[nid]
+
+    def apply(self, changes):
+        for nid, note in changes.items():
+            grow = nid + 1 - len(self.alive)
+            if grow > 0:
+                self.row.extend([0] * grow)
+                self.start.extend([0.0] * grow)
+                self.length.extend([0.0] * grow)
+                self.alive.extend(bytes(grow))
+            if note is None:
+                self.alive[nid] = 0
+            else:
+                self.row[nid], self.start[nid], self.length[nid] = note
+                self.alive[nid] = 1
+
+
+def note_tone(store, nid, tempo_map, timbre=synth.DEFAULT_TIMBRE):
+    """(freq_hz, duration_ms, timbre) that playback renders for a note of
+    a NoteStore or NoteTable, or None for rows off the roll."""
+    row = store.row[nid]
+    freqs = tuning.ROW_FREQ
+    if not 0 <= row < len(freqs):
+        return None
+    start = store.start[nid]
+    dur_s = tempo_map.seconds(start + store.length[nid]) - tempo_map.seconds(start)
+    return freqs[row], dur_s * 1000.0, timbre
+
+
+class RenderAhead:
+    def __init__(self, workers: int = RENDER_WORKERS, horizon_s: float = RENDER_AHEAD_S):
+        self.horizon_s = horizon_s
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="render-ahead")
+        self._lock = threading.Lock()
+        self._gen = 0
+        self._notes = None
+        self._tempo = None
+        self._timbre = None
+        self._origin = 0.0        # grid step the current plan started from
+        self._planned_to = None   # grid step up to which onsets are queued
+        self._jobs = {}           # cache key -> future, current generation
+        self.prepared = 0         # buffers rendered ahead of their onset
+        self.cancelled = 0        # queued jobs dropped by a re-plan
+        self.ready = 0            # onsets whose buffer was cached in time
+        self.missed = 0           # onsets that had to render on the spot
+
+    def invalidate(self):
+        """Notes changed: drop the plan; the next update re-plans."""
+        with self._lock:
+            self._planned_to = None
+
+    def stop(self):
+        """Playback stopped: cancel whatever is still queued."""
+        with self._lock:
+            self._reset(None, None)
+
+    def close(self):
+        self.stop()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _reset(self, notes, tempo_map, timbre=None):
+        self._gen += 1
+        for fut in self._jobs.values():
+            if fut.cancel():
+                self.cancelled += 1
+        self._jobs = {}
+        self._notes = notes
+        self._tempo = tempo_map
+        self._timbre = timbre
+        self._planned_to = None
+
+    def update(self, notes, timeline, step: float, tempo_map, timbre=synth.DEFAULT_TIMBRE):
+        """Queue the notes of the NoteTable `notes` whose onsets in
+        `timeline` lie between the planned edge and `horizon_s` seconds
+        past `step`."""
+        with self._lock:
+            if (notes is not self._notes or tempo_map is not self._tempo or timbre != self._timbre
+                    or self._planned_to is None or not self._origin <= step <= self._planned_to):
+                # new song, tempo, voice or edits, or the playhead jumped
+                self._reset(notes, tempo_map, timbre)
+                self._origin = self._planned_to = step
+            horizon = tempo_map.step_at(tempo_map.seconds(step) + self.horizon_s)
+            if horizon <= self._planned_to:
+                return
+            ids = timeline.starting_in(self._planned_to, horizon)
+            self._planned_to = horizon
+            gen = self._gen
+            if len(self._jobs) > 64:
+                self._jobs = {k: f for k, f in self._jobs.items() if not f.done()}
+            for nid in ids:
+                # the timeline can be a tick ahead of the table's edits
+                if nid not in notes:
+                    continue
+                key = note_tone(notes, nid, tempo_map, timbre)
+                if key is None:
+                    continue
+                key = synth.ToneCache.key(*key)
+                if key in self._jobs or key in synth.tone_cache:
+                    continue
+                self._jobs[key] = self._pool.submit(self._render, gen, key)
+
+    def _render(self, gen, key):
+        if gen != self._gen:
+            return
+        synth.render_tone(*key)
+        with self._lock:
+            self.prepared += 1
+
+    def collect(self, freq_hz, duration_ms, timbre=synth.DEFAULT_TIMBRE):
+        """Called at an onset: count whether the buffer is ready and, if
+        its job is still running, give it a moment to finish rather than
+        rendering the same tone twice."""
+        key = synth.ToneCache.key(freq_hz, duration_ms, timbre)
+        with self._lock:
+            fut = self._jobs.pop(key, None)
+        # a job that has not started yet is cheaper to do right here
+        if fut is not None and not fut.cancel() and not fut.done():
+            try:
+                fut.result(timeout=WAIT_S)
+            except Exception:
+                pass
+        if key in synth.tone_cache:
+            self.ready += 1
+        else:
+            self.missed += 1
+
+    def pending(self):
+        return sum(1 for f in self._jobs.values() if not f.done())
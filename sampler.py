@@ -0,0 +1,217 @@
+"""Sample-bank instrument: multi-sampled WAV files played back pitch-shifted.
+
+A bank is a directory of 16-bit PCM WAV files plus an optional
+`keymap.json`:
+
+    {"gain": 0.5,
+     "samples": [{"file": "piano_C4.wav", "root": "C4", "lo": 55, "hi": 66},
+                 {"file": "piano_C5.wav", "root": 72, "gain": 0.9}]}
+
+`root` is a MIDI number or a note name; `lo`/`hi` (MIDI, inclusive)
+default to halfway between neighbouring roots. Without a key-map every
+*.wav whose name ends in a note name or MIDI number ("vox_A#3.wav",
+"60.wav") is used with that root.
+
+Sample data is never read into Python objects. Each file is mmap'ed and
+viewed in place as int16 frames, so loading a bank only parses the WAV
+headers, and all voices share the same pages. `load_bank` keeps one bank
+per path in each process, and a bank pickles as just its path. Worker
+processes therefore map the same files, and the OS page cache holds
+them once.
+
+A note is rendered from the zone covering its MIDI key, resampled by
+linear interpolation at freq / root_freq. Positions and interpolation
+are computed as whole arrays. Only the pages the note actually reads
+are touched.
+"""
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+
+import synth
+import tuning
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+KEYMAP = "keymap.json"
+SAMPLE_GAIN = 0.5
+# a note name (octave -1..9) or a MIDI number at the end of the file name
+_ROOT_IN_NAME = re.compile(r"([A-G][#b]?(?:-1|\d)|(?<![\d-])\d{1,3})$")
+
+
+class Zone:
+    __slots__ = ("path", "root", "lo", "hi", "gain", "rate", "frames", "data", "_mm")
+
+    def __init__(self, path, root, gain=1.0):
+        self.path = path
+        self.root = root
+        self.lo = self.hi = None    # key range; None until the bank sets it
+        self.gain = float(gain)
+        self._mm, self.data, self.rate, self.frames = _map_wav(path)
+
+    @property
+    def root_freq(self):
+        # samples are recorded at concert pitch, whatever the current tuning
+        return tuning.A4_HZ * 2.0 ** ((self.root - 69) / 12.0)
+
+    def close(self):
+        self.data = None
+        try:
+            self._mm.close()
+        except (BufferError, ValueError):
+            pass   # a view is still alive; the map goes when it does
+
+
+def _map_wav(path):
+    """mmap a 16-bit PCM WAV. Returns (mmap, int16 view of the first
+    channel, sample rate, frames) without copying sample data."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if mm[:4] != b"RIFF" or mm[8:12] != b"WAVE":
+            raise ValueError("not a WAV file")
+        pos, fmt, data = 12, None, None
+        while pos + 8 <= len(mm):
+            cid, size = mm[pos:pos + 4], struct.unpack_from("<I", mm, pos + 4)[0]
+            if cid == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", mm, pos + 8)
+            elif cid == b"data":
+                data = (pos + 8, min(size, len(mm) - pos - 8))
+                break
+            pos += 8 + size + (size & 1)
+        if fmt is None or data is None:
+            raise ValueError("missing fmt or data chunk")
+        tag, channels, rate, _, _, bits = fmt
+        if tag not in (1, 0xFFFE) or bits != 16:
+            raise ValueError(f"only 16-bit PCM is supported (format {tag}, {bits} bits)")
+        offset, size = data
+        frames = size // (2 * channels)
+        if np is not None:
+            view = np.frombuffer(mm, dtype="<i2", count=frames * channels, offset=offset)[::channels]
+        elif sys.byteorder == "little":
+            view = memoryview(mm)[offset:offset + frames * channels * 2].cast("h")[::channels]
+        else:
+            view = array("h", mm[offset:offset + frames * channels * 2])
+            view.byteswap()
+            view = view[::channels]
+        return mm, view, rate, frames
+    except Exception:
+        mm.close()
+        raise
+
+
+def _root_of(value):
+    return int(value) if isinstance(value, int) or str(value).isdigit() else tuning.midi_number(str(value))
+
+
+class SampleBank:
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path.rstrip(os.sep))
+        self.gain = SAMPLE_GAIN
+        keymap = os.path.join(self.path, KEYMAP)
+        zones = []
+        if os.path.exists(keymap):
+            with open(keymap, "r", encoding="utf-8") as f:
+                spec = json.load(f)
+            self.gain = float(spec.get("gain", SAMPLE_GAIN))
+            for entry in spec.get("samples", ()):
+                zone = Zone(os.path.join(self.path, entry["file"]), _root_of(entry["root"]), entry.get("gain", 1.0))
+                zone.lo, zone.hi = entry.get("lo"), entry.get("hi")
+                zones.append(zone)
+        else:
+            for name in sorted(os.listdir(self.path)):
+                stem, ext = os.path.splitext(name)
+                m = _ROOT_IN_NAME.search(stem)
+                if ext.lower() == ".wav" and m and 0 <= _root_of(m.group(1)) <= 127:
+                    zones.append(Zone(os.path.join(self.path, name), _root_of(m.group(1))))
+        if not zones:
+            raise ValueError(f"no samples found in {self.path}")
+        zones.sort(key=lambda z: z.root)
+        # unset ranges meet halfway between neighbouring roots
+        for i, z in enumerate(zones):
+            if z.lo is None:
+                z.lo = 0 if i == 0 else (zones[i - 1].root + z.root) // 2 + 1
+            if z.hi is None:
+                z.hi = 127 if i == len(zones) - 1 else (z.root + zones[i + 1].root) // 2
+        self.zones = zones
+        # MIDI key -> zone, nearest root for keys no range covers
+        self._key_zone = [min(zones, key=lambda z: (not z.lo <= k <= z.hi, abs(z.root - k))) for k in range(128)]
+
+    def __reduce__(self):
+        # worker processes map the files themselves instead of receiving data
+        return load_bank, (self.path,)
+
+    @property
+    def seconds(self):
+        """Total length of the mapped samples."""
+        return sum(z.frames / float(z.rate) for z in self.zones)
+
+    def zone_for(self, freq_hz: float) -> Zone:
+        key = int(round(69 + 12 * math.log2(max(freq_hz, 1e-6) / tuning.A4_HZ)))
+        return self._key_zone[min(127, max(0, key))]
+
+    def render(self, freq_hz: float, duration_ms: float) -> bytes:
+        """Little-endian int16 PCM at synth.SAMPLE_RATE, the same length
+        synth.render_tone gives for the duration; silence after the sample
+        runs out."""
+        zone = self.zone_for(freq_hz)
+        n = synth.tone_frames(duration_ms)
+        step = (freq_hz / zone.root_freq) * (zone.rate / float(synth.SAMPLE_RATE))
+        # output frames whose read position stays inside the sample
+        m = max(0, min(n, int(math.ceil((zone.frames - 1) / step)))) if step > 0 else 0
+        gain = self.gain * zone.gain
+        if np is not None:
+            out = np.zeros(n, dtype=np.float32)
+            if m:
+                pos = np.arange(m, dtype=np.float64) * step
+                idx = pos.astype(np.int64)
+                frac = (pos - idx).astype(np.float32)
+                a = zone.data[idx].astype(np.float32)
+                b = zone.data[idx + 1].astype(np.float32)
+                out[:m] = (a + (b - a) * frac) * gain
+            np.clip(out, -synth.MAX_AMP, synth.MAX_AMP, out=out)
+            return out.astype("<i2").tobytes()
+        data = zone.data
+        buf = array("h", bytes(2 * n))
+        for i in range(m):
+            p = i * step
+            j = int(p)
+            s = data[j] + (data[j + 1] - data[j]) * (p - j)
+            buf[i] = int(max(-synth.MAX_AMP, min(synth.MAX_AMP, s * gain)))
+        if sys.byteorder == "big":
+            buf.byteswap()
+        return buf.tobytes()
+
+    def close(self):
+        for z in self.zones:
+            z.close()
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def load_bank(path: str) -> SampleBank:
+    """The shared bank for a directory, mapped on first use in this process."""
+    path = os.path.abspath(path)
+    with _banks_lock:
+        bank = _banks.get(path)
+        if bank is None:
+            bank = _banks[path] = SampleBank(path)
+        return bank
+
+
+def timbre_for(path: str) -> str:
+    """Timbre name that makes synth.render_tone (and therefore the engine,
+    render-ahead, loop and WAV renders) play this bank."""
+    return synth.SAMPLER_PREFIX + os.path.abspath(path)
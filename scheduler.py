@@ -0,0 +1,95 @@
+"""Sample-clock playback scheduler with look-ahead.
+
+Musical position is derived from the audio engine's sample clock rather
+than accumulated wall-clock deltas, so it cannot drift. On every tick the
+scheduler pulls the onsets that fall inside a short look-ahead window from
+the event timeline and converts them to exact sample frames. The engine
+then starts each voice at that frame inside its mix block, so onset
+accuracy does not depend on when the tick happened to run.
+
+Steps and frames are related through a TempoMap: the anchor pairs a
+frame with a step, and the map's cumulative time table converts the
+distance between them, so ritardandos and tempo changes need no
+per-tick integration.
+"""
+import threading
+
+from tempo_map import as_map
+
+LOOKAHEAD_S = 0.12
+
+
+class PlaybackScheduler:
+    def __init__(self, clock, timeline, sample_rate: int, lookahead_s: float = LOOKAHEAD_S):
+        """`clock()` returns the current output position in frames."""
+        self.clock = clock
+        self.timeline = timeline
+        self.sample_rate = sample_rate
+        self.lookahead_s = lookahead_s
+        self._lock = threading.Lock()
+        self.anchor_frame = 0
+        self.anchor_step = 0.0
+        self.anchor_s = 0.0           # tempo_map.seconds(anchor_step)
+        self.tempo_map = as_map(120.0)
+        # how far ahead of the clock onsets were queued (frames); negative = late
+        self.min_slack = None
+        self.late_onsets = 0
+
+    @property
+    def bpm(self):
+        return self.tempo_map.bpm_at(self.position())
+
+    def start(self, step: float, tempo):
+        """Anchor `step` at the current clock. `tempo` is a TempoMap or a
+        BPM number."""
+        with self._lock:
+            self.tempo_map = as_map(tempo)
+            self.anchor_frame = self.clock()
+            self.anchor_step = float(step)
+            self.anchor_s = self.tempo_map.seconds(self.anchor_step)
+            self.min_slack = None
+            self.late_onsets = 0
+        self.timeline.seek(step)
+
+    def set_tempo(self, tempo):
+        """Swap in a new map (or BPM), re-anchoring at the current position
+        so the change is seamless. A no-op for the map already in use."""
+        if tempo is self.tempo_map:
+            return
+        tempo = as_map(tempo)
+        if tempo == self.tempo_map:
+            self.tempo_map = tempo
+            return
+        with self._lock:
+            now = self.clock()
+            self.anchor_step = self._step_at(now)
+            self.anchor_frame = now
+            self.tempo_map = tempo
+            self.anchor_s = tempo.seconds(self.anchor_step)
+
+    def _step_at(self, frame):
+        return self.tempo_map.step_at(self.anchor_s + (frame - self.anchor_frame) / self.sample_rate)
+
+    def frame_at(self, step: float) -> int:
+        return self.anchor_frame + int(round((self.tempo_map.seconds(step) - self.anchor_s) * self.sample_rate))
+
+    def position(self) -> float:
+        """Current playhead position in grid steps, from the sample clock."""
+        with self._lock:
+            return self._step_at(self.clock())
+
+    def due(self):
+        """Return [(note_id, onset_frame)] for onsets inside the look-ahead window."""
+        with self._lock:
+            now = self.clock()
+            horizon = self._step_at(now + self.lookahead_s * self.sample_rate)
+            out = []
+            for nid, start in self.timeline.advance(horizon):
+                frame = self.frame_at(start)
+                slack = frame - now
+                if self.min_slack is None or slack < self.min_slack:
+                    self.min_slack = slack
+                if slack < 0:
+                    self.late_onsets += 1
+                out.append((nid, frame))
+            return out
@@ -0,0 +1,119 @@
+"""Tk-free conversions between a NoteStore and song files.
+
+Shared by the editor's Render Audio / Open MIDI actions and by the
+headless batch exporter. One grid step is one beat (quarter note), the
+same mapping playback uses. Wherever a tempo is taken it may be a plain
+BPM number or a TempoMap; note times come from the map's cumulative time
+table.
+"""
+import os
+
+import midi_reader
+import midi_writer
+import tuning
+from tempo_map import TempoMap, as_map
+
+
+def write_midi(store, path: str, tempo):
+    """Format 1: a conductor track with one tempo event per tempo change,
+    then the notes with their velocities and lyric meta events, streamed
+    in start order."""
+    ppq = midi_writer.PPQ
+    row_midi = tuning.ROW_MIDI
+    rows = len(row_midi)
+    with midi_writer.MidiWriter(path, ppq=ppq) as mw:
+        with mw.track("Conductor") as conductor:
+            conductor.time_signature(0, 4, 4)
+            for step, bpm in as_map(tempo):
+                conductor.tempo(int(round(step * ppq)), bpm)
+        with mw.track("Voice") as voice:
+            for start, row, nid in store.sorted_keys():
+                if 0 <= row < rows:
+                    # round both ends so tick/ppq starts from other files
+                    # land back on their tick
+                    on = int(round(start * ppq))
+                    off = int(round((start + store.length[nid]) * ppq))
+                    voice.note(on, off - on, row_midi[row], store.velocity[nid],
+                               lyric=store.lyric(nid))
+
+
+def _timed_keys(store, tempo):
+    """(start_s, dur_s, row, nid) in start order."""
+    keys = store.sorted_keys()
+    length = store.length
+    spans = as_map(tempo).spans((start, length[nid]) for start, _, nid in keys)
+    return [(t, d, row, nid) for (t, d), (_, row, nid) in zip(spans, keys)]
+
+
+def write_lab(store, path: str, tempo):
+    """Stylesinger-compatible label file, one line per note:
+
+        <start_seconds> <duration_seconds> <lyric>
+    """
+    lyric = store.lyric
+    with open(path, 'w', encoding='utf-8') as lf:
+        lf.writelines(f"{t:.4f} {d:.4f} {lyric(nid)}\n" for t, d, _, nid in _timed_keys(store, tempo))
+
+
+def wav_notes(store, tempo):
+    """(start_s, dur_s, freq) tuples for offline_render.render_wav."""
+    freqs = tuning.ROW_FREQ
+    rows = len(freqs)
+    return [(t, d, freqs[row]) for t, d, row, _ in _timed_keys(store, tempo) if 0 <= row < rows]
+
+
+def export(store, base: str, tempo, wav: bool = False, workers=None, progress=None, cancel=None,
+           timbre=None):
+    """Write base.mid and base.lab (and base.wav if asked, in `timbre`,
+    e.g. a sampler.timbre_for bank). Returns the paths written."""
+    paths = [base + '.mid', base + '.lab']
+    write_midi(store, paths[0], tempo)
+    write_lab(store, paths[1], tempo)
+    if wav:
+        import offline_render
+        import synth
+        paths.append(base + '.wav')
+        offline_render.render_wav(wav_notes(store, tempo), paths[2], timbre=timbre or synth.DEFAULT_TIMBRE,
+                                  workers=workers, progress=progress, cancel=cancel)
+    return paths
+
+
+def midi_to_notes(data):
+    """Map decoded MIDI notes onto piano rows. Returns (notes, skipped)
+    where notes are (row, start, length, velocity, lyric) tuples for
+    NoteStore.add_many and skipped counts notes outside the roll."""
+    rows = tuning.MIDI_ROW
+    ppq = float(data.ppq)
+    notes = []
+    skipped = 0
+    for tick, length, note, vel, _channel, lyric in data.notes:
+        row = rows.get(note)
+        if row is None:
+            skipped += 1
+            continue
+        notes.append((row, tick / ppq, max(length / ppq, 1.0 / 16), vel, lyric))
+    return notes, skipped
+
+
+def midi_tempo_map(data):
+    """The file's tempo events as a TempoMap in beats."""
+    if not data.tempos:
+        return TempoMap()
+    ppq = float(data.ppq)
+    # microsecond tempos don't round-trip exact BPMs; 0.001 BPM is plenty
+    return TempoMap((tick / ppq, round(60_000_000 / us, 3))
+                    for tick, us in sorted(data.tempos, key=lambda t: t[0]))
+
+
+def load(path: str):
+    """Load a .sicp project (with its journal) or a MIDI file.
+    Returns (store, tempo_map)."""
+    if os.path.splitext(path)[1].lower() in ('.mid', '.midi'):
+        from note_store import NoteStore
+        data = midi_reader.read_midi(path)
+        store = NoteStore()
+        store.add_many(midi_to_notes(data)[0])
+        return store, midi_tempo_map(data)
+    import project_file
+    store, tempo, _, _ = project_file.open_project(path)
+    return store, tempo
@@ -0,0 +1,77 @@
+"""Per-row interval index for point hit tests on notes.
+
+Each pitch row keeps its notes as a sorted list of (start, note_id) plus
+the longest note length seen in that row. A point query bisects to the
+last note starting at or before the point and scans back only as far as
+the row's longest note could reach, so hit tests cost O(log n + k) no
+matter how many notes or canvas items exist.
+"""
+import bisect
+
+_INF = float("inf")
+
+
+class RowIndex:
+    def __init__(self):
+        self._rows = {}      # row -> sorted [(start, note_id)]
+        self._max_len = {}   # row -> longest note length in that row
+
+    def insert(self, row, start, nid, length):
+        bisect.insort(self._rows.setdefault(row, []), (start, nid))
+        self.grow(row, length)
+
+    def bulk_insert(self, entries):
+        """Insert (row, start, nid, length) tuples, sorting each row once."""
+        touched = set()
+        for row, start, nid, length in entries:
+            self._rows.setdefault(row, []).append((start, nid))
+            if length > self._max_len.get(row, 0.0):
+                self._max_len[row] = length
+            touched.add(row)
+        for row in touched:
+            self._rows[row].sort()
+
+    def remove(self, row, start, nid):
+        keys = self._rows.get(row)
+        if not keys:
+            return
+        i = bisect.bisect_left(keys, (start, nid))
+        if i < len(keys) and keys[i] == (start, nid):
+            del keys[i]
+
+    def remove_many(self, entries):
+        """Remove (row, start, nid) tuples, filtering each row once."""
+        drop = {}
+        for row, start, nid in entries:
+            drop.setdefault(row, set()).add((start, nid))
+        for row, keys in drop.items():
+            if row in self._rows:
+                self._rows[row] = [k for k in self._rows[row] if k not in keys]
+
+    def grow(self, row, length):
+        # the bound only needs to be an upper limit, so it is never shrunk
+        if length > self._max_len.get(row, 0.0):
+            self._max_len[row] = length
+
+    def clear(self):
+        self._rows.clear()
+        self._max_len.clear()
+
+    def at(self, row, step, lengths, slack=0.0):
+        """Ids of notes in `row` covering `step`, where a note covers
+        [start, start + length + slack]. `lengths` maps id -> length."""
+        keys = self._rows.get(row)
+        if not keys:
+            return []
+        reach = self._max_len.get(row, 0.0) + slack
+        hi = bisect.bisect_right(keys, (step, _INF))
+        out = []
+        i = hi - 1
+        while i >= 0:
+            start, nid = keys[i]
+            if start < step - reach:
+                break
+            if step <= start + lengths[nid] + slack:
+                out.append(nid)
+            i -= 1
+        return out
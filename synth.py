@@ -0,0 +1,156 @@
+"""Tone synthesis for the piano roll.
+
+Notes are rendered as whole buffers of 16-bit mono PCM. When NumPy is
+available the harmonic stack and envelope are computed as array
+operations; otherwise a pure-Python loop is used. Rendered buffers are kept
+in an LRU cache keyed by (frequency, duration, timbre), so a pitch that
+repeats in a song is only synthesized once.
+"""
+import math
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+SAMPLE_RATE = 44100
+MAX_AMP = 32767
+
+# harmonic coefficients per timbre (fundamental first)
+TIMBRES = {
+    "piano": (1.0, 0.6, 0.3, 0.15),
+    "sine": (1.0,),
+}
+DEFAULT_TIMBRE = "piano"
+# "sampler:<bank directory>" plays a sample bank instead (see sampler.py)
+SAMPLER_PREFIX = "sampler:"
+
+# envelope: quick attack, exponential decay
+ATTACK_RATE = 12.0
+DECAY_RATE = 4.0
+GAIN = 0.25
+
+
+def _synthesize_numpy(freq_hz, n_samples, harmonics):
+    t = np.arange(n_samples, dtype=np.float64) / SAMPLE_RATE
+    phase = (2.0 * math.pi * freq_hz) * t
+    s = np.zeros(n_samples, dtype=np.float64)
+    for idx, coef in enumerate(harmonics, start=1):
+        s += coef * np.sin(phase * idx)
+    env = (1.0 - np.exp(-ATTACK_RATE * t)) * np.exp(-DECAY_RATE * t)
+    s *= env * (GAIN * MAX_AMP)
+    np.clip(s, -MAX_AMP, MAX_AMP, out=s)
+    return s.astype("<i2").tobytes()
+
+
+def _synthesize_python(freq_hz, n_samples, harmonics):
+    buf = array('h')
+    w = 2.0 * math.pi * freq_hz / SAMPLE_RATE
+    # exponentials advance by a constant factor per sample
+    attack_step = math.exp(-ATTACK_RATE / SAMPLE_RATE)
+    decay_step = math.exp(-DECAY_RATE / SAMPLE_RATE)
+    attack = 1.0
+    decay = 1.0
+    scale = GAIN * MAX_AMP
+    hs = list(enumerate(harmonics, start=1))
+    sin = math.sin
+    for i in range(n_samples):
+        ph = w * i
+        s = 0.0
+        for idx, coef in hs:
+            s += coef * sin(ph * idx)
+        val = s * (1.0 - attack) * decay * scale
+        buf.append(int(max(-MAX_AMP, min(MAX_AMP, val))))
+        attack *= attack_step
+        decay *= decay_step
+    if sys.byteorder == 'big':
+        buf.byteswap()
+    return buf.tobytes()
+
+
+def synthesize(freq_hz: float, duration_ms: float, timbre: str = DEFAULT_TIMBRE) -> bytes:
+    """Render a tone as little-endian 16-bit mono PCM (uncached)."""
+    if timbre.startswith(SAMPLER_PREFIX):
+        import sampler
+        return sampler.load_bank(timbre[len(SAMPLER_PREFIX):]).render(freq_hz, duration_ms)
+    harmonics = TIMBRES.get(timbre, TIMBRES[DEFAULT_TIMBRE])
+    duration_s = max(0.01, duration_ms / 1000.0)
+    n_samples = int(SAMPLE_RATE * duration_s)
+    if np is not None:
+        return _synthesize_numpy(freq_hz, n_samples, harmonics)
+    return _synthesize_python(freq_hz, n_samples, harmonics)
+
+
+class ToneCache:
+    """Thread-safe LRU of rendered PCM buffers bounded by total byte size."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(freq_hz, duration_ms, timbre):
+        # round so float noise from tempo math doesn't defeat the cache
+        return (round(float(freq_hz), 3), int(round(duration_ms)), timbre)
+
+    def get(self, key):
+        with self._lock:
+            buf = self._items.get(key)
+            if buf is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return buf
+
+    def put(self, key, buf: bytes):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = buf
+            self._bytes += len(buf)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        """Membership test that leaves LRU order and hit counts alone."""
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+tone_cache = ToneCache()
+
+
+def render_tone(freq_hz: float, duration_ms: float, timbre: str = DEFAULT_TIMBRE) -> bytes:
+    """Return the PCM for a tone, synthesizing it only on a cache miss."""
+    key = ToneCache.key(freq_hz, duration_ms, timbre)
+    buf = tone_cache.get(key)
+    if buf is None:
+        buf = synthesize(key[0], key[1], timbre)
+        tone_cache.put(key, buf)
+    return buf
+
+
+def tone_frames(duration_ms: float) -> int:
+    """Length in frames of the buffer render_tone returns for a duration."""
+    # same millisecond rounding as ToneCache.key
+    return int(SAMPLE_RATE * max(0.01, int(round(duration_ms)) / 1000.0))
@@ -0,0 +1,124 @@
+"""Tempo map: piecewise-constant tempo over grid steps (beats).
+
+Changes are kept as parallel arrays sorted by step together with the
+cumulative time at each change, so converting a step to seconds or
+seconds back to a step is one bisect plus a multiply, however many tempo
+changes the song has:
+
+    tm = TempoMap([(0, 120), (32, 90)])   # 90 BPM from beat 32 on
+    tm.seconds(40)      # 16 + 8 * 60/90
+    tm.step_at(20.0)    # 38.0
+
+A map is never modified after construction; edits build a new one
+(`with_change`, `without_change`, `with_initial`), so playback can tell a
+changed map by identity.
+"""
+from array import array
+from bisect import bisect_right
+
+DEFAULT_BPM = 120.0
+
+
+class TempoMap:
+    __slots__ = ("steps", "bpms", "_secs", "_spb")
+
+    def __init__(self, changes=((0.0, DEFAULT_BPM),)):
+        """changes: (step, bpm) pairs in any order. The first tempo also
+        applies before its step; a later pair at the same step wins.
+        Changes to the tempo already playing are kept: they are explicit
+        edits, and with_initial must not drop one whose BPM it matches."""
+        merged = {}
+        for step, bpm in changes:
+            bpm = float(bpm)
+            if bpm <= 0:
+                raise ValueError(f"tempo must be positive, got {bpm}")
+            merged[max(0.0, float(step))] = bpm
+        if not merged:
+            merged[0.0] = DEFAULT_BPM
+        points = sorted(merged.items())
+        if points[0][0] > 0:
+            points.insert(0, (0.0, points[0][1]))
+        self.steps = array('d')
+        self.bpms = array('d')
+        self._secs = array('d')   # seconds at each change
+        self._spb = array('d')    # seconds per step in each segment
+        t = 0.0
+        for step, bpm in points:
+            if self.bpms:
+                t += (step - self.steps[-1]) * self._spb[-1]
+            self.steps.append(step)
+            self.bpms.append(bpm)
+            self._secs.append(t)
+            self._spb.append(60.0 / bpm)
+
+    @classmethod
+    def constant(cls, bpm):
+        return cls(((0.0, bpm),))
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return zip(self.steps, self.bpms)
+
+    def __eq__(self, other):
+        return isinstance(other, TempoMap) and list(self) == list(other)
+
+    def __repr__(self):
+        return f"TempoMap({[(s, b) for s, b in self]})"
+
+    @property
+    def initial_bpm(self):
+        return self.bpms[0]
+
+    # ---- conversions ----
+    def seconds(self, step: float) -> float:
+        i = bisect_right(self.steps, step) - 1
+        if i < 0:
+            i = 0
+        return self._secs[i] + (step - self.steps[i]) * self._spb[i]
+
+    def step_at(self, seconds: float) -> float:
+        i = bisect_right(self._secs, seconds) - 1
+        if i < 0:
+            i = 0
+        return self.steps[i] + (seconds - self._secs[i]) / self._spb[i]
+
+    def bpm_at(self, step: float) -> float:
+        return self.bpms[max(0, bisect_right(self.steps, step) - 1)]
+
+    def spans(self, notes):
+        """(start_s, duration_s) for (start_step, length_steps) pairs given
+        in start order. The segment of each start is found by walking a
+        cursor forward rather than searching from scratch."""
+        steps, secs, spb = self.steps, self._secs, self._spb
+        if len(steps) == 1:
+            k = spb[0]
+            for start, length in notes:
+                yield start * k, length * k
+            return
+        last = len(steps) - 1
+        i = 0
+        for start, length in notes:
+            while i < last and steps[i + 1] <= start:
+                i += 1
+            t0 = secs[i] + (start - steps[i]) * spb[i]
+            end = start + length
+            j = i if (i == last or end < steps[i + 1]) else bisect_right(steps, end, i) - 1
+            yield t0, secs[j] + (end - steps[j]) * spb[j] - t0
+
+    # ---- edits (return new maps) ----
+    def with_change(self, step: float, bpm: float):
+        return TempoMap([*self, (step, bpm)])
+
+    def without_change(self, step: float):
+        """Drop the change at `step` (the first tempo cannot be removed)."""
+        return TempoMap([(s, b) for s, b in self if s != step or s == self.steps[0]])
+
+    def with_initial(self, bpm: float):
+        return TempoMap([(0.0, bpm), *list(self)[1:]])
+
+
+def as_map(tempo):
+    """A TempoMap for a map or a plain BPM number."""
+    return tempo if isinstance(tempo, TempoMap) else TempoMap.constant(tempo)
@@ -0,0 +1,136 @@
+import struct
+from array import array
+
+import pytest
+
+import audio_engine
+from audio_engine import RELEASE_FRAMES, AudioEngine
+
+
+def _tone(freq_hz, duration_ms, timbre=None):
+    """A flat buffer: `freq_hz` as the sample value, `duration_ms` frames."""
+    n = int(duration_ms)
+    return struct.pack(f"<{n}h", *([int(freq_hz)] * n))
+
+
+@pytest.fixture(params=["numpy", "python"])
+def engine(request, monkeypatch):
+    # no output device: mix blocks are pulled directly, as the callback would
+    monkeypatch.setattr(audio_engine, "sd", None)
+    monkeypatch.setattr(audio_engine, "sa", None)
+    monkeypatch.setattr(audio_engine.synth, "render_tone", _tone)
+    if request.param == "python":
+        monkeypatch.setattr(audio_engine, "np", None)
+    elif audio_engine.np is None:
+        pytest.skip("numpy is not installed")
+    return AudioEngine(polyphony=2, block_frames=64)
+
+
+def _pull(engine, frames):
+    return list(array("h", engine.mix_block(frames)))
+
+
+def test_oldest_voice_is_stolen_at_the_limit(engine):
+    engine.note_on(1, 1000, 500)
+    engine.note_on(2, 1000, 500)
+    engine.note_on(3, 1000, 500)
+    assert [v.note_id for v in engine.voices] == [2, 3]
+    assert engine.voices_stolen == 1
+
+
+def test_releasing_voice_is_stolen_first(engine):
+    engine.note_on(1, 1000, 500)
+    engine.note_on(2, 1000, 500)
+    _pull(engine, 10)
+    engine.note_off(2)
+    engine.note_on(3, 1000, 500)
+    assert [v.note_id for v in engine.voices] == [1, 3]
+
+
+def test_note_off_fades_out_and_drops_the_voice(engine):
+    engine.note_on(1, 1000, 5000)
+    assert _pull(engine, 100) == [500] * 100          # MASTER_GAIN 0.5
+    engine.note_off(1)
+    tail = _pull(engine, RELEASE_FRAMES + 50)
+    assert tail[0] == 500
+    assert all(a >= b for a, b in zip(tail, tail[1:]))
+    assert tail[RELEASE_FRAMES:] == [0] * 50
+    assert engine.active_voices() == 0
+
+
+def test_natural_end_is_faded_too(engine):
+    engine.note_on(1, 1000, RELEASE_FRAMES + 100)
+    out = _pull(engine, RELEASE_FRAMES + 200)
+    assert out[:100] == [500] * 100
+    assert 0 < out[100 + RELEASE_FRAMES // 2] < 500
+    assert out[-100:] == [0] * 100
+
+
+def test_scheduled_onset_starts_at_its_frame(engine):
+    engine.note_on(1, 1000, 1000, at_frame=30)
+    out = _pull(engine, 64)
+    assert out[:30] == [0] * 30 and out[30:] == [500] * 34
+    assert engine.onset_stats() == {"count": 1, "mean_ms": 0.0, "max_ms": 0.0}
+
+
+def test_scheduled_onset_in_a_later_block_waits(engine):
+    engine.note_on(1, 1000, 1000, at_frame=100)
+    assert _pull(engine, 64) == [0] * 64
+    assert engine.onset_stats()["count"] == 0
+    out = _pull(engine, 64)
+    assert out[:36] == [0] * 36 and out[36:] == [500] * 28
+
+
+def test_late_onset_records_its_error(engine):
+    _pull(engine, 64)
+    engine.note_on(1, 1000, 1000, at_frame=20)
+    assert _pull(engine, 64)[0] == 500
+    stats = engine.onset_stats()
+    assert stats["count"] == 1
+    assert stats["max_ms"] == pytest.approx(44 * 1000.0 / engine.sample_rate)
+    engine.reset_onset_stats()
+    assert engine.onset_stats()["count"] == 0
+
+
+def test_note_off_before_a_scheduled_onset_cancels_it(engine):
+    engine.note_on(1, 1000, 100, at_frame=200)
+    engine.note_off(1)
+    assert engine.active_voices() == 0
+
+
+def test_loop_wraps_back_to_back(engine):
+    engine.note_on(1, 1000, 500)
+    pcm = bytearray(struct.pack("<3h", 1, 2, 3))
+    engine.set_loop(pcm, at_frame=2)
+    assert engine.active_voices() == 0
+    assert _pull(engine, 9) == [0, 0, 1, 2, 3, 1, 2, 3, 1]
+    assert engine.loop_offset(9) == 1
+    # edits to the buffer are heard on the next pass
+    pcm[0:2] = struct.pack("<h", 7)
+    assert _pull(engine, 3) == [2, 3, 7]
+    engine.clear_loop()
+    assert engine.loop_offset() is None
+    assert _pull(engine, 3) == [0, 0, 0]
+
+
+def test_numpy_and_python_mixes_agree(monkeypatch):
+    if audio_engine.np is None:
+        pytest.skip("numpy is not installed")
+    monkeypatch.setattr(audio_engine, "sd", None)
+    monkeypatch.setattr(audio_engine, "sa", None)
+    monkeypatch.setattr(audio_engine.synth, "render_tone", _tone)
+
+    def run():
+        engine = AudioEngine(polyphony=4)
+        engine.note_on(1, 3000, 2000)
+        engine.note_on(2, -1234, 1500, at_frame=150)
+        engine.note_on(3, 32000, 1200, at_frame=300)
+        engine.note_on(4, 32000, 1600, at_frame=310)   # clips with voice 3
+        out = _pull(engine, 512)
+        engine.note_off(1)
+        return out + _pull(engine, 256) + _pull(engine, 2048)
+    fast = run()
+    monkeypatch.setattr(audio_engine, "np", None)
+    slow = run()
+    assert max(abs(a - b) for a, b in zip(fast, slow)) <= 1
+    assert max(fast) == 32767
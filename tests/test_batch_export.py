@@ -0,0 +1,86 @@
+import json
+import os
+
+import batch_export
+import project_file
+import song_io
+from note_store import NoteStore
+
+
+def _song(path):
+    store = NoteStore()
+    store.add_many([(10, 0, 8, 100, "la"), (12, 8, 8, 90, "na")])
+    song_io.write_midi(store, str(path), 120)
+    return str(path)
+
+
+def _run(capsys, *argv):
+    code = batch_export.main([*argv, "-j", "1"])
+    return code, capsys.readouterr()
+
+
+def test_second_run_skips_up_to_date_outputs(tmp_path, capsys):
+    src = _song(tmp_path / "song.mid")
+    out = str(tmp_path / "out")
+    code, cap = _run(capsys, src, "-o", out)
+    assert code == 0 and "exported 1 file(s)" in cap.out
+    assert os.path.exists(os.path.join(out, "song.lab"))
+    with open(os.path.join(out, "song.export.json"), encoding="utf-8") as f:
+        assert json.load(f) == {"wav": False, "tempo": None}
+
+    code, cap = _run(capsys, src, "-o", out)
+    assert code == 0 and "exported 0 file(s)" in cap.out and "skipped 1 up to date" in cap.out
+
+    code, cap = _run(capsys, src, "-o", out, "--force")
+    assert "exported 1 file(s)" in cap.out
+
+
+def test_changed_options_reexport(tmp_path, capsys):
+    src = _song(tmp_path / "song.mid")
+    out = str(tmp_path / "out")
+    _run(capsys, src, "-o", out)
+    code, cap = _run(capsys, src, "-o", out, "--tempo", "90")
+    assert code == 0 and "exported 1 file(s)" in cap.out
+    code, cap = _run(capsys, src, "-o", out, "--tempo", "90")
+    assert "skipped 1 up to date" in cap.out
+
+    # outputs from before stamps existed are not trusted either
+    os.remove(os.path.join(out, "song.export.json"))
+    code, cap = _run(capsys, src, "-o", out, "--tempo", "90")
+    assert "exported 1 file(s)" in cap.out
+
+
+def test_wav_settings_include_tuning_files(tmp_path):
+    scl = tmp_path / "a.scl"
+    scl.write_text("! a.scl\n\n1\n2/1\n")
+    plain = batch_export.export_settings(False, None, (str(scl), None))
+    assert plain == {"wav": False, "tempo": None}
+    before = batch_export.export_settings(True, 120.0, (str(scl), None))
+    assert before["scale"] == [[str(scl), os.path.getmtime(scl)]] and before["bank"] is None
+    os.utime(scl, (0, os.path.getmtime(scl) + 10))
+    assert batch_export.export_settings(True, 120.0, (str(scl), None)) != before
+
+
+def test_output_overwriting_input_is_a_failure(tmp_path, capsys):
+    src = _song(tmp_path / "song.mid")
+    code, cap = _run(capsys, src, "-o", str(tmp_path))
+    assert code == 1
+    assert "exported 0 file(s)" in cap.out and "skipped 0 up to date, 1 failed" in cap.out
+    assert "would overwrite the input" in cap.err
+
+
+def test_inputs_sharing_outputs_fail(tmp_path, capsys):
+    mid = _song(tmp_path / "song.mid")
+    sicp = str(tmp_path / "song.sicp")
+    store, tempo = song_io.load(mid)
+    project_file.save(store, sicp, tempo)
+    other = _song(tmp_path / "other.mid")
+    out = str(tmp_path / "out")
+    code, cap = _run(capsys, mid, sicp, other, mid, "-o", out)
+    assert code == 1
+    assert "exported 1 file(s)" in cap.out and "2 failed" in cap.out
+    assert cap.err.count("outputs would collide with") == 2
+    assert not os.path.exists(os.path.join(out, "song.lab"))
+    # nothing was written for them, so the next run does not skip them
+    code, cap = _run(capsys, mid, sicp, "-o", out)
+    assert "skipped 0 up to date, 2 failed" in cap.out
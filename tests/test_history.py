@@ -0,0 +1,145 @@
+import random
+
+import pytest
+
+import project_file
+from history import AddNotes, DeleteNotes, History, MoveNotes, ResizeNotes, SetLyrics
+from note_store import BULK_EDIT, NoteStore
+from timeline import EventTimeline
+
+
+def _song(n, seed=0):
+    rng = random.Random(seed)
+    store = NoteStore()
+    store.add_many([(rng.randrange(10, 40), rng.randrange(200) / 4.0, rng.choice((0.25, 1.0, 2.0)),
+                     rng.randrange(1, 128), rng.choice(("la", "na", ""))) for _ in range(n)])
+    timeline = EventTimeline()
+    timeline.compile((k[0], k[2]) for k in store.sorted_keys())
+    return store, timeline
+
+
+def _state(store, timeline):
+    notes = {n: store.snapshot(n) for n in store.ids()}
+    return notes, list(store.sorted_keys()), list(timeline.keys)
+
+
+def _check_indexes(store, timeline):
+    assert store.sorted_keys() == sorted((store.start[n], store.row[n], n) for n in store.ids())
+    assert timeline.keys == sorted((store.start[n], n) for n in store.ids())
+    for n in store.ids():
+        assert n in store.notes_at(store.row[n], store.start[n])
+
+
+@pytest.mark.parametrize("count", [3, BULK_EDIT + 50])
+def test_move_undo_redo(count):
+    store, timeline = _song(300)
+    before = _state(store, timeline)
+    ids = random.Random(1).sample(list(store.ids()), count)
+    cmd = MoveNotes(ids, 3.5, -2)
+    cmd.apply(store, timeline)
+    _check_indexes(store, timeline)
+    assert all(store.start[n] == before[0][n][1] + 3.5 and store.row[n] == before[0][n][0] - 2 for n in ids)
+    cmd.revert(store, timeline)
+    assert _state(store, timeline) == before
+    cmd.apply(store, timeline)
+    cmd.revert(store, timeline)
+    assert _state(store, timeline) == before
+
+
+def test_bulk_and_single_moves_agree():
+    a, ta = _song(200)
+    b, tb = _song(200)
+    ids = list(range(0, 200, 2))
+    MoveNotes(ids, -1.25, 1).apply(a, ta)
+    for nid in ids:
+        MoveNotes([nid], -1.25, 1).apply(b, tb)
+    assert _state(a, ta) == _state(b, tb)
+
+
+def test_bulk_move_keeps_the_playback_cursor():
+    store, timeline = _song(200)
+    timeline.seek(25.0)
+    due = timeline.keys[timeline.cursor]
+    # move everything except the next onset far behind the playhead
+    ids = [n for n in store.ids() if n != due[1]]
+    MoveNotes(ids, -1000.0, 0).apply(store, timeline)
+    assert timeline.keys[timeline.cursor] == due
+
+
+def test_resize_undo_redo_and_hit_tests():
+    store, timeline = _song(100)
+    before = _state(store, timeline)
+    ids = list(store.ids())
+    cmd = ResizeNotes(ids, 4)
+    cmd.apply(store, timeline)
+    assert all(store.length[n] == before[0][n][2] + 4 for n in ids)
+    # a longer note is hit near its new end
+    n = ids[0]
+    assert n in store.notes_at(store.row[n], store.end(n) - 0.1)
+    cmd.revert(store, timeline)
+    assert _state(store, timeline) == before
+
+
+def test_delete_and_add_keep_ids():
+    store, timeline = _song(50)
+    before = _state(store, timeline)
+    ids = [3, 7, 20]
+    cmd = DeleteNotes(store, ids)
+    cmd.apply(store, timeline)
+    assert all(n not in store for n in ids) and len(store) == 47
+    cmd.revert(store, timeline)
+    # restore brings the notes back under the same ids
+    assert _state(store, timeline) == before
+    _check_indexes(store, timeline)
+
+    nid = store.add(12, 9.0, 1.0, 80, "o")
+    timeline.insert(nid, 9.0)
+    add = AddNotes(store, [nid])
+    add.revert(store, timeline)
+    assert nid not in store
+    add.apply(store, timeline)
+    assert store.snapshot(nid) == (12, 9.0, 1.0, 80, "o")
+
+
+def test_lyrics_keep_only_changes():
+    store, timeline = _song(10)
+    old = store.lyric(2)
+    cmd = SetLyrics(store, [(1, store.lyric(1)), (2, "ka")])
+    assert list(cmd.ids) == [2]
+    cmd.apply(store, timeline)
+    assert store.lyric(2) == "ka"
+    cmd.revert(store, timeline)
+    assert store.lyric(2) == old
+
+
+def test_history_stacks_and_limit():
+    history = History(limit=3)
+    cmds = [MoveNotes([i], 1, 0) for i in range(5)]
+    for cmd in cmds:
+        history.push(cmd)
+    # the two oldest entries were evicted
+    assert len(history) == 3
+    assert [history.undo() for _ in range(4)] == [cmds[4], cmds[3], cmds[2], None]
+    assert history.redo() is cmds[2]
+    history.push(MoveNotes([9], 1, 0))
+    assert history.redo() is None
+    history.push(MoveNotes([], 1, 0))   # empty edits are not recorded
+    assert len(history) == 2
+    history.set_limit(1)
+    assert history.limit == 1 and len(history) == 1
+
+
+def test_bulk_edits_replay_from_the_journal(tmp_path):
+    store, timeline = _song(100)
+    path = str(tmp_path / "song.sicp")
+    sid = project_file.save(store, path, 120)
+    journal = project_file.Journal(path, sid)
+    store.journal = journal
+    MoveNotes(list(range(60)), 2.0, 1).apply(store, timeline)
+    ResizeNotes(list(range(10)), 0.5).apply(store, timeline)
+    store.journal = None
+    journal.close()
+    loaded, _, _, replayed = project_file.open_project(path)
+    assert replayed == 2
+    assert {n: loaded.snapshot(n) for n in loaded.ids()} == {n: store.snapshot(n) for n in store.ids()}
+    assert loaded.sorted_keys() == store.sorted_keys()
@@ -0,0 +1,95 @@
+from array import array
+
+import pytest
+
+import loop_region
+from loop_region import LoopBuffer, capture, snapshot
+from note_store import NoteStore
+from offline_render import render_chunk
+from tempo_map import TempoMap
+
+TM = TempoMap([(0, 240), (2, 120)])   # loop steps 1-5: 0.25 s, then 1.5 s
+
+
+@pytest.fixture(params=["numpy", "python"])
+def mix_path(request, monkeypatch):
+    if request.param == "python":
+        import offline_render
+        monkeypatch.setattr(loop_region, "np", None)
+        monkeypatch.setattr(offline_render, "np", None)
+    elif loop_region.np is None:
+        pytest.skip("numpy is not installed")
+
+
+@pytest.fixture
+def store():
+    s = NoteStore()
+    # one rings in from before the loop, one rings past its end
+    s.add_many([(20, 0.0, 2.0, 100, ""), (24, 1.0, 1.0, 100, ""), (28, 2.5, 0.5, 100, ""),
+                (30, 4.0, 3.0, 100, ""), (12, 8.0, 1.0, 100, "")])
+    return s
+
+
+def _fresh(store):
+    return bytes(LoopBuffer(capture(store, 1, 5), TM, 1, 5).pcm)
+
+
+def test_updates_match_a_fresh_mix(store, mix_path):
+    buf = LoopBuffer(capture(store, 1, 5), TM, 1, 5)
+    assert sorted(buf.notes) == [0, 1, 2, 3]
+    assert bytes(buf.pcm) == _fresh(store)
+
+    added = store.add(16, 3.0, 0.5)
+    assert 0 < buf.update(snapshot(store, [added])) < buf.frames
+    assert bytes(buf.pcm) == _fresh(store)
+
+    store.update(2, start=3.5)
+    store.shift_many([1], 0.0, 2)
+    buf.update(snapshot(store, [2, 1]))
+    assert bytes(buf.pcm) == _fresh(store)
+
+    store.remove(0)
+    buf.update(snapshot(store, [0]))
+    assert 0 not in buf.notes
+    assert bytes(buf.pcm) == _fresh(store)
+
+    # moving a note out of the region and one in from outside it
+    store.update(3, start=6.0)
+    store.update(4, start=1.5)
+    buf.update(snapshot(store, [3, 4]))
+    assert sorted(buf.notes) == [1, 2, 4, added]
+    assert bytes(buf.pcm) == _fresh(store)
+
+
+def test_edits_outside_the_region_mix_nothing(store, mix_path):
+    buf = LoopBuffer(capture(store, 1, 5), TM, 1, 5)
+    mixed = buf.frames_mixed
+    store.update(4, start=9.0)
+    assert buf.update(snapshot(store, [4])) == 0
+    assert buf.frames_mixed == mixed
+
+
+def test_seams_fade_to_silence(mix_path):
+    # one note sounding across the whole loop
+    s = NoteStore()
+    s.add(24, 0.0, 8.0)
+    buf = LoopBuffer(capture(s, 1, 5), TM, 1, 5)
+    pcm = array("h", bytes(buf.pcm))
+    sf = round(-TM.seconds(1) * buf.sample_rate)
+    raw = array("h", render_chunk((0, buf.frames, [(sf, buf._note(0)[1], buf._note(0)[2])], buf.timbre)))
+    seam = loop_region.SEAM_FRAMES
+    n = buf.frames
+    assert pcm[0] == 0 and pcm[-1] == 0
+    assert all(abs(pcm[i]) <= abs(raw[i]) for i in range(seam))
+    assert all(abs(pcm[n - 1 - i]) <= abs(raw[n - 1 - i]) for i in range(seam))
+    assert any(abs(pcm[i]) < abs(raw[i]) for i in range(seam))
+    assert any(abs(pcm[n - 1 - i]) < abs(raw[n - 1 - i]) for i in range(seam))
+    assert pcm[seam:n - seam] == raw[seam:n - seam]
+
+
+def test_matches_until_the_region_tempo_or_voice_changes(store):
+    buf = LoopBuffer(capture(store, 1, 5), TM, 1, 5)
+    assert buf.matches(TM, 1, 5)
+    assert not buf.matches(TM, 1, 6)
+    assert not buf.matches(TempoMap([(0, 240), (2, 120)]), 1, 5)
+    assert not buf.matches(TM, 1, 5, "sine")
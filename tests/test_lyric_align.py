@@ -0,0 +1,48 @@
+from lyric_align import HOLD, align, lyric_units, syllabify
+from note_store import NoteStore
+
+_DICT = {"hello": ["HH", "AH0", "L", "OW1"], "hel": ["HH", "EH1", "L"], "lo": ["L", "OW1"],
+         "world": ["W", "ER1", "L", "D"], "extra": ["EH1", "K", "S", "T", "R", "AH0"]}
+
+
+def _phonemes(word):
+    return _DICT.get(word.lower(), [])
+
+
+def test_syllabify_splits_between_nuclei():
+    assert syllabify(["HH", "AH0", "L", "OW1"]) == [["HH", "AH0"], ["L", "OW1"]]
+    # of a cluster the first consonant closes the previous syllable
+    assert syllabify(_DICT["extra"]) == [["EH1", "K"], ["S", "T", "R", "AH0"]]
+    # grapheme fallback: "oo" is one nucleus
+    assert syllabify(list("moon")) == [list("moon")]
+    assert syllabify([]) == []
+
+
+def test_syllable_mode_puts_each_syllable_on_one_note():
+    assert lyric_units("hello world", _phonemes, "syllable") == ["HH AH0", "L OW1", "W ER1 L D"]
+    # a hyphenated word keeps the syllables the sheet spelled out
+    assert lyric_units("hel-lo", _phonemes, "syllable") == ["HH EH1 L", "L OW1"]
+    assert lyric_units("world", _phonemes, "phoneme") == ["W", "ER1", "L", "D"]
+
+
+def test_melisma_marks_hold_the_previous_syllable():
+    units = lyric_units("hello - world _ _", _phonemes, "syllable")
+    assert units == ["HH AH0", "L OW1", None, "W ER1 L D", None, None]
+    keys = [(float(i), 0, 10 + i) for i in range(len(units))]
+    assert [label for _, label in align(units, keys)] == ["HH AH0", "L OW1", HOLD, "W ER1 L D", HOLD, HOLD]
+    # words with no phonemes are dropped rather than taking a note
+    assert lyric_units("zzz world", _phonemes, "syllable") == ["W ER1 L D"]
+
+
+def test_align_from_a_notes_rank():
+    store = NoteStore()
+    ids = store.add_many([(5, 3.0, 1.0, 100, ""), (7, 0.0, 1.0, 100, ""),
+                          (2, 1.0, 1.0, 100, ""), (9, 1.0, 1.0, 100, "")])
+    keys = store.sorted_keys()
+    first = ids[2]          # starts at 1.0 on the lowest row
+    start = store.rank(first)
+    assert start == 1
+    pairs = align(["a", None, "o", "extra"], keys, start)
+    # units past the last note are left over
+    assert pairs == [(ids[2], "a"), (ids[3], HOLD), (ids[0], "o")]
+    assert align(["a"], keys, len(keys)) == []
@@ -0,0 +1,72 @@
+import struct
+
+import pytest
+
+import midi_reader
+import song_io
+from midi_writer import MidiWriter
+from note_store import NoteStore
+from tempo_map import TempoMap
+
+
+def _smf(path, ppq, *tracks):
+    """Write raw track bodies into a format 1 file."""
+    with open(path, "wb") as f:
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks), ppq))
+        for body in tracks:
+            f.write(b"MTrk" + struct.pack(">I", len(body)) + body)
+
+
+def test_reader_running_status_note_offs_and_lyrics(tmp_path):
+    path = tmp_path / "raw.mid"
+    body = bytes([
+        0x00, 0xff, 0x05, 0x02]) + b"la" + bytes([
+        0x00, 0x90, 60, 100,        # note-on C4
+        0x00, 64, 90,               # running status: note-on E4
+        0x60, 0x80, 60, 0,          # 96 ticks later: explicit note-off C4
+        0x00, 64, 0,                # running status 0x80: note-off E4
+        0x00, 0x90, 60, 80,         # two overlapping C4s: first on, first off
+        0x10, 60, 70,
+        0x10, 60, 0,
+        0x10, 60, 0,
+        0x00, 0xff, 0x2f, 0x00])
+    _smf(path, 96, body)
+    data = midi_reader.read_midi(str(path))
+    assert data.ppq == 96
+    assert data.notes == [(0, 96, 60, 100, 0, "la"), (0, 96, 64, 90, 0, ""),
+                          (96, 32, 60, 80, 0, ""), (112, 32, 60, 70, 0, "")]
+    assert data.unpaired == 0
+
+
+def test_reader_rejects_other_files(tmp_path):
+    path = tmp_path / "x.mid"
+    path.write_bytes(b"RIFF0000WAVE")
+    with pytest.raises(ValueError):
+        midi_reader.read_midi(str(path))
+
+
+def test_store_round_trip(tmp_path):
+    store = NoteStore()
+    store.add_many([(24, 0.0, 1.0, 100, "la"), (27, 0.5, 0.25, 64, ""),
+                    (20, 4.0, 2.5, 127, "o"), (48, 7.75, 0.5, 1, "na")])
+    tempo = TempoMap([(0, 120), (4, 90), (6, 140.5)])
+    path = str(tmp_path / "song.mid")
+    song_io.write_midi(store, path, tempo)
+    loaded, tm = song_io.load(path)
+    key = lambda s: sorted((s.start[n], s.row[n], s.length[n], s.velocity[n], s.lyric(n)) for n in s.ids())
+    assert key(loaded) == key(store)
+    assert tm == tempo
+
+
+def test_reexport_keeps_ticks_of_other_ppqs(tmp_path):
+    src = tmp_path / "src.mid"
+    with MidiWriter(str(src), ppq=96) as mw:
+        with mw.track() as t:
+            for i, tick in enumerate(range(1, 5000, 19)):
+                t.note(tick, 6 + i % 11, 60, 100)
+    store, tempo = song_io.load(str(src))
+    out = str(tmp_path / "out.mid")
+    song_io.write_midi(store, out, tempo)
+    ticks = [(tick, length) for tick, length, *_ in midi_reader.read_midi(out).notes]
+    scale = 480 // 96
+    assert ticks == [(tick * scale, (6 + i % 11) * scale) for i, tick in enumerate(range(1, 5000, 19))]
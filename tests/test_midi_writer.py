@@ -0,0 +1,70 @@
+import io
+
+import midi_reader
+import midi_writer
+from midi_writer import MidiWriter, varlen
+
+
+def _write(path, notes, tempos=((0, 120),), ppq=480):
+    with MidiWriter(str(path), ppq=ppq) as mw:
+        with mw.track("Conductor") as t:
+            for tick, bpm in tempos:
+                t.tempo(tick, bpm)
+        with mw.track("Voice") as t:
+            for tick, dur, note, vel, lyric in notes:
+                t.note(tick, dur, note, vel, lyric=lyric)
+
+
+def test_varlen():
+    assert varlen(0) == b"\x00"
+    assert varlen(0x7f) == b"\x7f"
+    assert varlen(0x80) == b"\x81\x00"
+    assert varlen(0x3fff) == b"\xff\x7f"
+    assert varlen(0x0fffffff) == b"\xff\xff\xff\x7f"
+
+
+def test_running_status_shares_one_status_byte():
+    f = io.BytesIO()
+    with MidiWriter(f) as mw:
+        with mw.track() as t:
+            t.note(0, 10, 60, 100)
+            t.note(10, 10, 62, 100)
+            t.note(20, 10, 64, 100)
+        data = f.getvalue()
+    track = data[data.index(b"MTrk") + 8:]
+    # note-offs are note-ons with velocity 0, so one 0x90 covers all six events
+    assert track.count(b"\x90") == 1
+    assert track.endswith(b"\xff\x2f\x00")
+
+
+def test_meta_cancels_running_status():
+    f = io.BytesIO()
+    with MidiWriter(f) as mw:
+        with mw.track() as t:
+            t.note(0, 10, 60, 100, lyric="la")
+            t.note(10, 10, 62, 100, lyric="na")
+        data = f.getvalue()
+    track = data[data.index(b"MTrk") + 8:]
+    assert track.count(b"\x90") == 2
+
+
+def test_round_trip_notes_lyrics_and_tempo(tmp_path):
+    path = tmp_path / "song.mid"
+    notes = [(0, 480, 60, 100, "la"), (240, 240, 64, 90, ""), (480, 960, 67, 80, "o"),
+             (480, 120, 72, 127, "")]
+    _write(path, notes, tempos=((0, 120), (960, 90)))
+    data = midi_reader.read_midi(str(path))
+    assert data.format == 1 and data.ppq == 480
+    assert data.tempos == [(0, 500000), (960, 666667)]
+    got = [(tick, length, note, vel, lyric) for tick, length, note, vel, _ch, lyric in data.notes]
+    assert got == sorted(notes)
+    assert data.unpaired == 0
+
+
+def test_large_track_flushes_and_patches_length(tmp_path):
+    path = tmp_path / "big.mid"
+    notes = [(i * 10, 10, 40 + i % 40, 100, "") for i in range(20_000)]
+    _write(path, notes)
+    assert path.stat().st_size > midi_writer.FLUSH_BYTES
+    data = midi_reader.read_midi(str(path))
+    assert len(data.notes) == len(notes)
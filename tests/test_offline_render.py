@@ -0,0 +1,69 @@
+import wave
+
+import pytest
+
+import offline_render
+import synth
+
+# (start_s, duration_s, freq_hz); several ring across 50 ms chunk seams
+NOTES = [(0.0, 0.12, 220.0), (0.04, 0.03, 440.0), (0.049, 0.002, 330.0), (0.1, 0.2, 261.63),
+         (0.1, 0.05, 523.25), (0.23, 0.08, 196.0)]
+
+
+def _frames(path):
+    with wave.open(str(path), "rb") as w:
+        assert (w.getnchannels(), w.getsampwidth(), w.getframerate()) == (1, 2, synth.SAMPLE_RATE)
+        return w.readframes(w.getnframes())
+
+
+def _render(tmp_path, name, **kw):
+    path = tmp_path / name
+    written = offline_render.render_wav(NOTES, str(path), **kw)
+    return written, _frames(path)
+
+
+def test_plan_lists_a_note_in_every_chunk_it_rings_into():
+    total, jobs = offline_render.plan_chunks([(0.0, 0.12, 220.0), (0.2, 0.01, 440.0)],
+                                             sample_rate=1000, chunk_seconds=0.05)
+    assert total == 210
+    assert [(c0, n) for c0, n, _ in jobs] == [(0, 50), (50, 50), (100, 50), (150, 50), (200, 10)]
+    assert [[st for st, _, _ in sel] for _, _, sel in jobs] == [[0], [0], [0], [], [200]]
+
+
+def test_plan_of_no_notes():
+    assert offline_render.plan_chunks([]) == (0, [])
+
+
+def test_chunked_output_matches_one_chunk(tmp_path):
+    whole = _render(tmp_path, "whole.wav", workers=1, chunk_seconds=60.0)
+    chunked = _render(tmp_path, "chunked.wav", workers=1, chunk_seconds=0.05)
+    assert whole[0] == len(whole[1]) // 2 == offline_render.plan_chunks(NOTES)[0]
+    assert chunked == whole
+
+
+def test_parallel_output_matches_serial(tmp_path):
+    serial = _render(tmp_path, "serial.wav", workers=1, chunk_seconds=0.05)
+    parallel = _render(tmp_path, "parallel.wav", workers=2, chunk_seconds=0.05)
+    assert parallel == serial
+
+
+def test_python_mix_matches_numpy(tmp_path, monkeypatch):
+    if offline_render.np is None:
+        pytest.skip("numpy is not installed")
+    fast = _render(tmp_path, "fast.wav", workers=1, chunk_seconds=0.05)
+    monkeypatch.setattr(offline_render, "np", None)
+    slow = _render(tmp_path, "slow.wav", workers=1, chunk_seconds=0.05)
+    assert slow[0] == fast[0]
+    a, b = memoryview(fast[1]).cast("h"), memoryview(slow[1]).cast("h")
+    assert max(abs(x - y) for x, y in zip(a, b)) <= 1
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cancel_stops_after_the_current_chunk(tmp_path, workers):
+    seen = []
+    written = offline_render.render_wav(NOTES, str(tmp_path / "cut.wav"), workers=workers,
+                                        chunk_seconds=0.05, progress=lambda done, total: seen.append(done),
+                                        cancel=lambda: len(seen) >= 2)
+    chunk = int(0.05 * synth.SAMPLE_RATE)
+    assert seen == [chunk, 2 * chunk] and written == 2 * chunk
+    assert len(_frames(tmp_path / "cut.wav")) == 4 * chunk
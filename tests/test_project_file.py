@@ -0,0 +1,179 @@
+import os
+import struct
+
+import pytest
+
+import project_file
+from note_store import NoteStore
+from tempo_map import TempoMap
+
+
+def _notes(store):
+    return {n: (store.row[n], store.start[n], store.length[n], store.velocity[n], store.lyric(n))
+            for n in store.ids()}
+
+
+def _edit(path, snapshot_id, store, fn):
+    """Run fn(store) with a journal attached, then flush it."""
+    journal = project_file.Journal(path, snapshot_id)
+    store.journal = journal
+    fn(store)
+    store.journal = None
+    journal.close()
+
+
+@pytest.fixture
+def project(tmp_path):
+    store = NoteStore()
+    store.add_many([(24, 0.0, 1.0, 100, "la"), (20, 1.5, 0.25, 64, "ñá"), (30, 2.0, 2.0, 1, "")])
+    gone = store.add(10, 3.0)
+    store.remove(gone)
+    path = str(tmp_path / "song.sicp")
+    tempo = TempoMap([(0, 120), (8, 96.5)])
+    snapshot_id = project_file.save(store, path, tempo)
+    return path, store, tempo, snapshot_id
+
+
+def test_save_open_round_trip(project):
+    path, store, tempo, snapshot_id = project
+    loaded, tm, sid, replayed = project_file.open_project(path)
+    assert (sid, replayed) == (snapshot_id, 0)
+    assert tm == tempo
+    # ids survive, including the deleted slot
+    assert _notes(loaded) == _notes(store)
+    assert len(loaded.alive) == len(store.alive)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "x.sicp"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        project_file.load(str(path))
+
+
+def test_journal_replay(project):
+    path, _, _, snapshot_id = project
+    store = project_file.load(path)[0]
+
+    def edits(s):
+        nid = s.add(40, 5.0, 1.0, 90, "o")
+        s.update(nid, start=6.0)
+        s.remove(0)
+        s.set_lyrics([(1, "na")])
+    _edit(path, snapshot_id, store, edits)
+    loaded, _, _, replayed = project_file.open_project(path)
+    assert replayed == 4
+    assert _notes(loaded) == _notes(store)
+
+
+def test_torn_last_line_is_dropped_before_appending(project):
+    path, _, _, snapshot_id = project
+    store = project_file.load(path)[0]
+    _edit(path, snapshot_id, store, lambda s: s.add(40, 5.0))
+    with open(project_file.journal_path(path), "a", encoding="utf-8") as f:
+        f.write('["a",41,6.0,')   # crash in the middle of a write
+    # the next session recovers, then keeps editing
+    store, _, sid, replayed = project_file.open_project(path)
+    assert replayed == 1
+    _edit(path, sid, store, lambda s: s.add(42, 7.0))
+    loaded, _, _, replayed = project_file.open_project(path)
+    assert replayed == 2
+    assert _notes(loaded) == _notes(store)
+
+
+def test_missing_journal(project):
+    path, _, _, snapshot_id = project
+    os.remove(project_file.journal_path(path))
+    store, _, sid, replayed = project_file.open_project(path)
+    assert replayed == 0
+    _edit(path, sid, store, lambda s: s.add(42, 7.0))
+    loaded, _, _, replayed = project_file.open_project(path)
+    assert replayed == 1
+    assert _notes(loaded) == _notes(store)
+
+
+def test_stale_journal_is_replaced(project):
+    path, _, _, snapshot_id = project
+    with open(project_file.journal_path(path), "w", encoding="utf-8") as f:
+        f.write('{"snapshot": 1}\n["a",41,6.0,1.0,100,""]\n')
+    store, _, sid, replayed = project_file.open_project(path)
+    assert replayed == 0
+    _edit(path, sid, store, lambda s: s.add(42, 7.0))
+    loaded, _, _, replayed = project_file.open_project(path)
+    assert replayed == 1
+    assert _notes(loaded) == _notes(store)
+
+
+def test_header_that_is_not_an_object(project):
+    path = project[0]
+    with open(project_file.journal_path(path), "w", encoding="utf-8") as f:
+        f.write('["a",41,6.0,1.0,100,""]\n')
+    assert project_file.open_project(path)[3] == 0
+
+
+def test_save_starts_a_fresh_journal(project):
+    path, store, tempo, snapshot_id = project
+    _edit(path, snapshot_id, store, lambda s: s.add(42, 7.0))
+    new_id = project_file.save(store, path, tempo)
+    assert new_id != snapshot_id
+    loaded, _, _, replayed = project_file.open_project(path)
+    assert replayed == 0
+    assert _notes(loaded) == _notes(store)
+
+
+def test_header_keeps_columns_aligned(project):
+    path, store, _, _ = project
+    with open(path, "rb") as f:
+        data = f.read()
+    assert project_file._HEADER.size == 40
+    assert struct.unpack_from("<H", data, 4)[0] == project_file.VERSION
+    # the start column is the first section after the header
+    assert struct.unpack_from("<d", data, 40)[0] == store.start[0]
+
+
+def test_midi_import_leaves_the_open_project_alone(project, tmp_path, monkeypatch):
+    import gui
+    import song_io
+    from history import History
+    from timeline import EventTimeline
+
+    path, store, tempo, snapshot_id = project
+    other = NoteStore()
+    other.add_many([(5, 0.0, 1.0, 100, ""), (6, 1.0, 1.0, 100, "")])
+    mid = str(tmp_path / "other.mid")
+    song_io.write_midi(other, mid, 100)
+
+    class Editor(gui.SingItClanker):
+        """The editor's project handling without a window."""
+
+        def __init__(self):
+            self.store, self.history, self.timeline = store, History(10), EventTimeline()
+            self.journal = None
+            self.project_path, self.snapshot_id = path, snapshot_id
+            self._attach_journal(path, snapshot_id)
+            self.status = type("Status", (), {"config": lambda *a, **kw: None})()
+
+        def _clear_view(self):
+            pass
+
+        def refresh_viewport(self):
+            pass
+
+        def set_tempo_map(self, tempo_map):
+            pass
+
+    editor = Editor()
+    editor.store.add(40, 5.0)
+    saved = _notes(store)
+    editor.journal.close()      # flush, then let open_midi close it again
+    with open(project_file.journal_path(path), "rb") as f:
+        journal = f.read()
+    monkeypatch.setattr(gui.filedialog, "askopenfilename", lambda **kw: mid)
+    editor.open_midi()
+    assert len(editor.store) == 2
+    assert (editor.journal, editor.project_path, editor.snapshot_id) == (None, None, None)
+    with open(project_file.journal_path(path), "rb") as f:
+        assert f.read() == journal
+    loaded, _, _, replayed = project_file.open_project(path)
+    assert replayed == 1
+    assert _notes(loaded) == saved
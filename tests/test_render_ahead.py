@@ -0,0 +1,154 @@
+import threading
+from concurrent.futures import wait
+
+import pytest
+
+import synth
+from loop_region import snapshot
+from note_store import NoteStore
+from render_ahead import NoteTable, RenderAhead, note_tone
+from tempo_map import TempoMap
+from timeline import EventTimeline
+
+# 2 s ahead: 4 steps at 120 BPM, 2 at 60
+FAST, SLOW = TempoMap.constant(120), TempoMap.constant(60)
+
+
+@pytest.fixture
+def song():
+    """16 one-step notes on distinct rows, one per step."""
+    store = NoteStore()
+    store.add_many([(i, float(i), 1.0, 100, "") for i in range(16)])
+    timeline = EventTimeline()
+    timeline.compile((k[0], k[2]) for k in store.sorted_keys())
+    return store, timeline
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Renders block until the gate is set; buffers land in a fresh cache."""
+    gate = threading.Event()
+    gate.started = threading.Event()
+    cache = synth.ToneCache()
+
+    def render_tone(freq_hz, duration_ms, timbre=synth.DEFAULT_TIMBRE):
+        gate.started.set()
+        gate.wait(5.0)
+        cache.put(synth.ToneCache.key(freq_hz, duration_ms, timbre), b"\0\0")
+    monkeypatch.setattr(synth, "render_tone", render_tone)
+    monkeypatch.setattr(synth, "tone_cache", cache)
+    yield gate
+    gate.set()
+
+
+@pytest.fixture
+def ahead():
+    ra = RenderAhead(workers=1, horizon_s=2.0)
+    yield ra
+    ra.close()
+
+
+def _keys(notes, ids, tm):
+    return {synth.ToneCache.key(*note_tone(notes, nid, tm)) for nid in ids}
+
+
+def _finish(ahead, gate):
+    gate.set()
+    wait(list(ahead._jobs.values()), timeout=5.0)
+
+
+def test_plans_the_horizon_and_counts_ready_and_missed(song, gate, ahead):
+    store, timeline = song
+    notes = NoteTable(store)
+    ahead.update(notes, timeline, 0.0, FAST)
+    assert set(ahead._jobs) == _keys(notes, range(4), FAST)
+    _finish(ahead, gate)
+    assert ahead.prepared == 4
+    ahead.collect(*note_tone(notes, 0, FAST))
+    ahead.collect(*note_tone(notes, 9, FAST))
+    assert (ahead.ready, ahead.missed) == (1, 1)
+
+
+def test_moving_within_the_plan_extends_it(song, gate, ahead):
+    store, timeline = song
+    notes = NoteTable(store)
+    ahead.update(notes, timeline, 0.0, FAST)
+    ahead.update(notes, timeline, 2.0, FAST)
+    assert set(ahead._jobs) == _keys(notes, range(6), FAST)
+    assert ahead.cancelled == 0
+
+
+def test_invalidate_cancels_queued_jobs_and_replans(song, gate, ahead):
+    store, timeline = song
+    notes = NoteTable(store)
+    ahead.update(notes, timeline, 0.0, FAST)
+    assert gate.started.wait(5.0)
+    # note 0 is rendering; 1-3 are still queued behind it
+    ahead.invalidate()
+    ahead.update(notes, timeline, 0.5, FAST)
+    assert ahead.cancelled == 3
+    assert set(ahead._jobs) == _keys(notes, range(1, 5), FAST)
+    _finish(ahead, gate)
+    assert ahead.prepared == 5
+
+
+def test_edits_reach_the_plan_through_the_table(song, gate, ahead):
+    store, timeline = song
+    notes = NoteTable(store)
+    ahead.update(notes, timeline, 0.0, FAST)
+    store.update(2, length=3.0)
+    added = store.add(30, 1.0)
+    notes.apply(snapshot(store, [2, added]))
+    timeline.insert(added, 1.0)
+    late = store.add(31, 1.5)
+    timeline.insert(late, 1.5)       # not in the table yet: skipped
+    ahead.invalidate()
+    ahead.update(notes, timeline, 0.0, FAST)
+    assert set(ahead._jobs) == _keys(notes, [0, 1, added, 2, 3], FAST)
+    assert note_tone(notes, 2, FAST)[1] == pytest.approx(1500.0)
+
+
+def test_tempo_swap_replans_with_new_durations(song, gate, ahead):
+    store, timeline = song
+    notes = NoteTable(store)
+    ahead.update(notes, timeline, 0.0, FAST)
+    assert gate.started.wait(5.0)
+    ahead.update(notes, timeline, 0.0, SLOW)
+    assert ahead.cancelled == 3
+    assert set(ahead._jobs) == _keys(notes, range(2), SLOW)
+
+
+def test_playhead_jump_replans_from_there(song, gate, ahead):
+    store, timeline = song
+    notes = NoteTable(store)
+    ahead.update(notes, timeline, 0.0, FAST)
+    ahead.update(notes, timeline, 10.0, FAST)
+    assert set(ahead._jobs) == _keys(notes, range(10, 14), FAST)
+    # and backwards
+    ahead.update(notes, timeline, 1.0, FAST)
+    assert set(ahead._jobs) == _keys(notes, range(1, 5), FAST)
+
+
+def test_stale_generation_is_not_rendered(song, gate, ahead):
+    store, timeline = song
+    notes = NoteTable(store)
+    ahead.update(notes, timeline, 0.0, FAST)
+    assert gate.started.wait(5.0)
+    jobs = list(ahead._jobs.values())
+    ahead.stop()
+    gate.set()
+    wait(jobs, timeout=5.0)
+    # only the job that was already running finished
+    assert ahead.prepared == 1 and ahead.cancelled == 3
+
+
+def test_note_table_copies_and_patches(song):
+    store, _ = song
+    notes = NoteTable(store)
+    store.update(0, start=5.0)
+    assert notes.start[0] == 0.0
+    store.remove(1)
+    nid = store.add(40, 20.0, 2.0)
+    notes.apply(snapshot(store, [0, 1, nid]))
+    assert 1 not in notes and nid in notes and 99 not in notes
+    assert (notes.start[0], notes.row[nid], notes.end(nid)) == (5.0, 40, 22.0)
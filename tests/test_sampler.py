@@ -0,0 +1,101 @@
+import json
+import math
+import pickle
+import struct
+import wave
+
+import pytest
+
+import sampler
+import synth
+
+
+def _wav(path, frames=2000, rate=44100, channels=1, value=None):
+    """A 16-bit WAV: a ramp by default, or a constant `value`."""
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        samples = [value if value is not None else (i % 2000) * 10 for i in range(frames) for _ in range(channels)]
+        w.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+
+
+def _bank(tmp_path, names, keymap=None):
+    for name in names:
+        _wav(tmp_path / name)
+    if keymap is not None:
+        (tmp_path / sampler.KEYMAP).write_text(json.dumps(keymap))
+    return sampler.SampleBank(str(tmp_path))
+
+
+def test_roots_from_file_names(tmp_path):
+    bank = _bank(tmp_path, ["vox_C-1.wav", "vox_C#-1.wav", "vox_A#3.wav", "vox_Bb4.wav", "60.wav",
+                            "notes.txt", "vox_C-2.wav", "take_200.wav"])
+    assert [z.root for z in bank.zones] == [0, 1, 58, 60, 70]
+
+
+def test_unset_ranges_meet_halfway(tmp_path):
+    bank = _bank(tmp_path, ["v_C4.wav", "v_A4.wav", "v_C6.wav"])
+    assert [(z.lo, z.root, z.hi) for z in bank.zones] == [(0, 60, 64), (65, 69, 76), (77, 84, 127)]
+    assert bank.zone_for(440.0).root == 69
+    assert bank.zone_for(329.63).root == 60     # E4, key 64
+    assert bank.zone_for(349.23).root == 69     # F4, key 65
+
+
+def test_keymap_ranges_names_and_gain(tmp_path):
+    bank = _bank(tmp_path, ["low.wav", "high.wav"], {
+        "gain": 0.8,
+        "samples": [{"file": "low.wav", "root": "C3", "lo": 0, "hi": 59},
+                    {"file": "high.wav", "root": 72, "gain": 0.5}]})
+    low, high = bank.zones
+    assert (low.lo, low.root, low.hi) == (0, 48, 59)
+    assert (high.lo, high.root, high.hi) == (61, 72, 127)
+    assert bank.gain == 0.8 and high.gain == 0.5
+    # key 60 is in neither range: the nearest root wins
+    assert bank.zone_for(261.63) is low
+
+
+def test_render_length_and_root_pitch(tmp_path):
+    _wav(tmp_path / "v_A4.wav", frames=500, value=1000)
+    bank = sampler.SampleBank(str(tmp_path))
+    pcm = bank.render(440.0, 50.0)
+    n = synth.tone_frames(50.0)
+    assert len(pcm) == 2 * n
+    samples = struct.unpack(f"<{n}h", pcm)
+    # at the root pitch the sample plays at its own rate, then silence
+    assert set(samples[:499]) == {int(1000 * sampler.SAMPLE_GAIN)}
+    assert set(samples[500:]) == {0}
+    # an octave up reads twice as fast and runs out twice as early
+    up = struct.unpack(f"<{n}h", bank.render(880.0, 50.0))
+    assert up[249] != 0 and set(up[250:]) == {0}
+
+
+def test_stereo_uses_first_channel(tmp_path):
+    _wav(tmp_path / "v_A4.wav", frames=100, channels=2, value=300)
+    bank = sampler.SampleBank(str(tmp_path))
+    assert bank.zones[0].frames == 100
+    assert bank.render(440.0, 1.0)[:2] == struct.pack("<h", 150)
+
+
+def test_rejects_non_pcm16(tmp_path):
+    with wave.open(str(tmp_path / "v_A4.wav"), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(1)
+        w.setframerate(8000)
+        w.writeframes(b"\x80" * 10)
+    with pytest.raises(ValueError):
+        sampler.SampleBank(str(tmp_path))
+
+
+def test_empty_bank(tmp_path):
+    with pytest.raises(ValueError):
+        sampler.SampleBank(str(tmp_path))
+
+
+def test_shared_bank_pickles_as_its_path(tmp_path):
+    _wav(tmp_path / "v_A4.wav")
+    bank = sampler.load_bank(str(tmp_path))
+    assert sampler.load_bank(str(tmp_path)) is bank
+    assert pickle.loads(pickle.dumps(bank)) is bank
+    assert synth.render_tone(440.0, 20.0, sampler.timbre_for(str(tmp_path))) == bank.render(440.0, 20.0)
+    assert math.isclose(bank.seconds, 2000 / 44100)
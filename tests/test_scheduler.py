@@ -0,0 +1,49 @@
+import pytest
+
+from scheduler import PlaybackScheduler
+from tempo_map import TempoMap
+from timeline import EventTimeline
+
+RATE = 1000
+
+
+def _scheduler(onsets=()):
+    frame = [0]
+    timeline = EventTimeline()
+    timeline.compile(onsets)
+    sched = PlaybackScheduler(lambda: frame[0], timeline, RATE, lookahead_s=0.1)
+    return sched, frame
+
+
+def test_onset_frames_follow_the_tempo_map():
+    sched, frame = _scheduler([(0, 1), (4, 2), (6, 3)])
+    sched.start(0.0, TempoMap([(0, 120), (4, 60)]))
+    frame[0] = 1900
+    assert sched.due() == [(1, 0), (2, 2000)]
+    frame[0] = 3900
+    assert sched.due() == [(3, 4000)]
+    assert sched.position() == pytest.approx(5.9)
+
+
+def test_set_tempo_reanchors_at_the_current_position():
+    sched, frame = _scheduler([(8, 1)])
+    sched.start(2.0, 120)
+    frame[0] = 1000                     # two beats at 120 BPM
+    assert sched.position() == pytest.approx(4.0)
+    sched.set_tempo(60)
+    assert (sched.anchor_frame, sched.anchor_step) == (1000, pytest.approx(4.0))
+    assert sched.position() == pytest.approx(4.0)
+    frame[0] = 2000
+    assert sched.position() == pytest.approx(5.0)
+    assert sched.frame_at(8.0) == 5000
+    assert sched.bpm == 60
+
+
+def test_set_tempo_with_an_equal_map_keeps_the_anchor():
+    sched, frame = _scheduler()
+    sched.start(0.0, TempoMap([(0, 120), (8, 90)]))
+    frame[0] = 700
+    same = TempoMap([(8, 90), (0, 120)])
+    sched.set_tempo(same)
+    assert sched.tempo_map is same
+    assert (sched.anchor_frame, sched.anchor_step) == (0, 0.0)
@@ -0,0 +1,53 @@
+import pytest
+
+from tempo_map import TempoMap, as_map
+
+
+def test_seconds_and_step_at_across_changes():
+    tm = TempoMap([(32, 90), (0, 120), (48, 240)])
+    assert list(tm) == [(0.0, 120.0), (32.0, 90.0), (48.0, 240.0)]
+    assert tm.seconds(0) == 0
+    assert tm.seconds(32) == 16
+    assert tm.seconds(40) == pytest.approx(16 + 8 * 60 / 90)
+    assert tm.seconds(50) == pytest.approx(16 + 16 * 60 / 90 + 2 * 0.25)
+    assert tm.step_at(20.0) == pytest.approx(38.0)
+    for step in (0, 5.5, 31.9, 32, 47.25, 48, 100):
+        assert tm.step_at(tm.seconds(step)) == pytest.approx(step)
+    assert tm.bpm_at(31.99) == 120 and tm.bpm_at(32) == 90
+
+
+def test_first_tempo_applies_before_its_step_and_repeated_tempos_are_kept():
+    tm = TempoMap([(8, 100), (16, 100), (24, 150)])
+    assert list(tm) == [(0.0, 100.0), (8.0, 100.0), (16.0, 100.0), (24.0, 150.0)]
+    assert tm.seconds(8) == pytest.approx(8 * 0.6)
+    assert tm.seconds(30) == pytest.approx(24 * 0.6 + 6 * 0.4)
+    assert tm.step_at(tm.seconds(20)) == pytest.approx(20)
+    assert TempoMap([]) == TempoMap.constant(120)
+    with pytest.raises(ValueError):
+        TempoMap([(0, 0)])
+
+
+def test_spans_match_seconds_across_changes():
+    tm = TempoMap([(0, 120), (4, 60), (6, 180)])
+    notes = [(0, 1), (3, 2), (3.5, 4), (4, 1), (5.5, 0.25), (7, 3)]
+    expected = [(tm.seconds(s), tm.seconds(s + n) - tm.seconds(s)) for s, n in notes]
+    assert list(tm.spans(notes)) == pytest.approx(expected)
+    # a constant map skips the segment walk
+    assert list(as_map(60).spans([(2, 1)])) == [(2.0, 1.0)]
+
+
+def test_edits_return_new_maps():
+    tm = TempoMap([(0, 120), (16, 90)])
+    assert tm.with_change(8, 100) == TempoMap([(0, 120), (8, 100), (16, 90)])
+    assert tm.without_change(16) == TempoMap.constant(120)
+    assert tm.without_change(0) is not tm and tm.without_change(0) == tm
+    assert tm.with_initial(60) == TempoMap([(0, 60), (16, 90)])
+    assert list(tm) == [(0.0, 120.0), (16.0, 90.0)]
+
+
+def test_initial_tempo_passing_a_later_tempo_keeps_that_change():
+    # the tempo spinbox steps the first tempo through every value
+    tm = TempoMap([(0, 120), (32, 90)])
+    assert tm.with_initial(90) == TempoMap([(0, 90), (32, 90)])
+    assert tm.with_initial(90).with_initial(120) == tm
+    assert tm.with_initial(90).seconds(40) == pytest.approx(40 * 60 / 90)
@@ -0,0 +1,48 @@
+import pytest
+
+import tuning
+
+
+@pytest.fixture(autouse=True)
+def equal_temperament():
+    yield
+    tuning.reset()
+
+
+def test_note_names():
+    assert tuning.midi_number("A4") == 69
+    assert tuning.midi_number("C4") == 60
+    assert tuning.midi_number("Bb2") == tuning.midi_number("A#2") == 46
+    assert tuning.midi_number("G9") == 127
+
+
+def test_lowest_octave():
+    assert tuning.midi_number("C-1") == 0
+    assert tuning.midi_number("C#-1") == tuning.midi_number("Db-1") == 1
+    assert tuning.midi_number("B-1") == 11
+    assert tuning.midi_number("C0") == 12
+    # every precomputed spelling of octave -1 maps into 0..11
+    assert sorted({m for name, m in tuning._NAME_MIDI.items() if name.endswith("-1")}) == list(range(12))
+
+
+def test_row_tables_agree():
+    for row, name in enumerate(tuning.PITCHES):
+        m = tuning.ROW_MIDI[row]
+        assert m == tuning.midi_number(name)
+        assert tuning.MIDI_ROW[m] == row
+        assert tuning.ROW_FREQ[row] == pytest.approx(440.0 * 2 ** ((m - 69) / 12))
+
+
+def test_scala_equal_temperament_matches_default(tmp_path):
+    scl = tmp_path / "12tet.scl"
+    scl.write_text("! 12tet.scl\n12-TET\n 12\n!\n" + "".join(f" {100.0 * k:.1f}\n" for k in range(1, 13)))
+    before = list(tuning.ROW_FREQ)
+    assert tuning.load_scala(str(scl)) == "12-TET"
+    assert tuning.ROW_FREQ == pytest.approx(before)
+
+
+def test_set_table_swaps_in_place():
+    freqs = tuning.ROW_FREQ
+    tuning.set_table([100.0] * 128, "flat")
+    assert freqs is tuning.ROW_FREQ and set(freqs) == {100.0}
+    assert tuning.current == "flat"
@@ -0,0 +1,95 @@
+"""Start-time index of note onsets used by playback.
+
+Notes are compiled once into a list of (start_step, note_id) keys sorted by
+start. Playback keeps a cursor into that list, so each tick only looks at
+the notes that actually fire. Edits made while playing are applied
+incrementally with bisect instead of recompiling.
+"""
+import bisect
+import heapq
+import threading
+
+_INF = float("inf")
+BULK_MOVE = 32   # moves of more notes than this re-merge the keys once
+
+
+class EventTimeline:
+    def __init__(self):
+        self.keys = []      # sorted (start_step, note_id)
+        self.cursor = 0     # index of the next onset to fire
+        self._lock = threading.Lock()
+
+    def compile(self, onsets):
+        """Rebuild from an iterable of (start_step, note_id) pairs."""
+        keys = sorted(onsets)
+        with self._lock:
+            self.keys = keys
+            self.cursor = 0
+
+    def seek(self, step: float):
+        """Position the cursor so the next onset is the first at or after step."""
+        with self._lock:
+            self.cursor = bisect.bisect_left(self.keys, (step,))
+
+    def advance(self, step: float):
+        """Return (note_id, start_step) for onsets between the cursor and
+        step inclusive, and move the cursor past them."""
+        with self._lock:
+            keys = self.keys
+            lo = self.cursor
+            if lo >= len(keys) or keys[lo][0] > step:
+                return ()
+            hi = bisect.bisect_right(keys, (step, _INF), lo)
+            self.cursor = hi
+            return [(nid, start) for start, nid in keys[lo:hi]]
+
+    def starting_in(self, t0: float, t1: float):
+        """Ids of notes whose onset lies in [t0, t1), in start order."""
+        with self._lock:
+            keys = self.keys
+            lo = bisect.bisect_left(keys, (t0,))
+            hi = bisect.bisect_left(keys, (t1,), lo)
+            return [nid for _, nid in keys[lo:hi]]
+
+    def insert(self, note_id, start_step):
+        with self._lock:
+            i = bisect.bisect_left(self.keys, (start_step, note_id))
+            self.keys.insert(i, (start_step, note_id))
+            # notes added behind the cursor are already in the past
+            if i < self.cursor:
+                self.cursor += 1
+
+    def remove(self, note_id, start_step):
+        with self._lock:
+            i = bisect.bisect_left(self.keys, (start_step, note_id))
+            if i < len(self.keys) and self.keys[i] == (start_step, note_id):
+                del self.keys[i]
+                if i < self.cursor:
+                    self.cursor -= 1
+
+    def move(self, note_id, old_step, new_step):
+        if old_step == new_step:
+            return
+        self.remove(note_id, old_step)
+        self.insert(note_id, new_step)
+
+    def move_many(self, moves):
+        """Apply (note_id, old_step, new_step) moves. Many moves filter the
+        keys once and merge the new ones back; the cursor stays in front
+        of the same unmoved onset."""
+        moves = [m for m in moves if m[1] != m[2]]
+        if len(moves) <= BULK_MOVE:
+            for nid, old, new in moves:
+                self.move(nid, old, new)
+            return
+        gone = {(old, nid) for nid, old, _ in moves}
+        added = sorted((new, nid) for nid, _, new in moves)
+        with self._lock:
+            keys = self.keys
+            # first onset still due that is not being moved
+            nxt = next((k for k in keys[self.cursor:] if k not in gone), None)
+            self.keys = list(heapq.merge([k for k in keys if k not in gone], added))
+            self.cursor = len(self.keys) if nxt is None else bisect.bisect_left(self.keys, nxt)
+
+    def __len__(self):
+        return len(self.keys)
@@ -0,0 +1,197 @@
+"""Pitch rows of the piano roll and their frequencies.
+
+Row 0 is the top of the roll. Kept free of Tk so exporters and the batch
+tools can share it with the editor.
+
+Note names are parsed once, at import, into lookup tables:
+
+    ROW_MIDI[row]    MIDI note number of a row (export, MIDI import)
+    MIDI_ROW[note]   row of a MIDI note number (dict; missing = off the roll)
+    MIDI_FREQ[note]  frequency of each of the 128 MIDI notes
+    ROW_FREQ[row]    frequency of a row (playback, synthesis, WAV export)
+
+The frequency tables follow the current temperament, 12-tone equal
+temperament at A4 = 440 Hz unless a Scala scale (.scl, optionally with a
+keyboard mapping .kbm) has been loaded with `load_scala`. Loading swaps
+the table contents in place, so modules holding a reference to the lists
+see the new tuning; hot paths never parse strings.
+"""
+import math
+
+PITCHES = [
+    "C6","B5","A#5","A5","G#5","G5","F#5","F5","E5","D#5","D5","C#5",
+    "C5","B4","A#4","A4","G#4","G4","F#4","F4","E4","D#4","D4","C#4",
+    "C4","B3","A#3","A3","G#3","G3","F#3","F3","E3","D#3","D3","C#3",
+    "C3","B2","A#2","A2","G#2","G2","F#2","F2","E2","D#2","D2","C#2","C2",
+]
+
+A4_HZ = 440.0
+EQUAL = "12-TET"
+
+_SEMIS = {'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4, 'F': 5, 'F#': 6,
+          'G': 7, 'G#': 8, 'A': 9, 'A#': 10, 'B': 11}
+_FLATS = {'Bb': 'A#', 'Db': 'C#', 'Eb': 'D#', 'Gb': 'F#', 'Ab': 'G#'}
+
+
+def _parse_name(name: str) -> int:
+    """MIDI number of a name like C4, A#3 or Bb2 (A4 if empty; unknown
+    letters count as A, a missing octave as 4)."""
+    name = name.strip()
+    if not name:
+        return 69
+    i = len(name) - 1
+    while i >= 0 and name[i].isdigit():
+        i -= 1
+    # the sign belongs to the octave: C-1 is MIDI 0
+    if i >= 1 and name[i] == "-" and i < len(name) - 1:
+        i -= 1
+    note = _FLATS.get(name[:i + 1], name[:i + 1])
+    try:
+        octave = int(name[i + 1:])
+    except Exception:
+        octave = 4
+    return (octave + 1) * 12 + _SEMIS.get(note, 9)
+
+
+def equal_temperament(a4: float = A4_HZ):
+    return [a4 * 2.0 ** ((m - 69) / 12.0) for m in range(128)]
+
+
+# every spelling the editor or a file could hand us, octaves -1..9
+_NAME_MIDI = {f"{n}{o}": _parse_name(f"{n}{o}")
+              for n in (*_SEMIS, *_FLATS) for o in range(-1, 10)}
+
+ROW_MIDI = [_NAME_MIDI[p] for p in PITCHES]
+MIDI_ROW = {m: r for r, m in enumerate(ROW_MIDI)}
+MIDI_FREQ = equal_temperament()
+ROW_FREQ = [MIDI_FREQ[m] for m in ROW_MIDI]
+current = EQUAL
+
+
+def midi_number(name: str) -> int:
+    m = _NAME_MIDI.get(name)
+    return _parse_name(name) if m is None else m
+
+
+def pitch_to_freq(name: str) -> float:
+    """Convert note name like C4 or A#3 to frequency (Hz) in the current
+    tuning."""
+    m = midi_number(name)
+    if 0 <= m < 128:
+        return MIDI_FREQ[m]
+    return A4_HZ * 2.0 ** ((m - 69) / 12.0)
+
+
+def set_table(freqs, name: str):
+    """Install 128 per-MIDI-note frequencies as the current tuning."""
+    global current
+    freqs = [float(f) for f in freqs]
+    if len(freqs) != 128:
+        raise ValueError("a tuning table needs 128 frequencies")
+    MIDI_FREQ[:] = freqs
+    ROW_FREQ[:] = [freqs[m] for m in ROW_MIDI]
+    current = name
+
+
+def reset():
+    set_table(equal_temperament(), EQUAL)
+
+
+# ---- Scala ----
+def _scala_lines(path):
+    """Non-comment lines of a Scala file ("!" starts a comment line)."""
+    with open(path, "r", encoding="latin-1") as f:
+        for line in f:
+            if not line.startswith("!"):
+                yield line.strip()
+
+
+def _pitch_cents(text: str) -> float:
+    """A .scl pitch: cents if it has a period, else a ratio a/b or a."""
+    token = text.split()[0]
+    if "." in token:
+        return float(token)
+    num, _, den = token.partition("/")
+    ratio = int(num) / int(den or 1)
+    if ratio <= 0:
+        raise ValueError(f"bad ratio {token!r}")
+    return 1200.0 * math.log2(ratio)
+
+
+def read_scl(path: str):
+    """Returns (description, cents) where cents[-1] is the period
+    (usually 1200, the octave) and degree 0 (unison) is implied."""
+    lines = _scala_lines(path)
+    description = next(lines, "")
+    count = int(next(lines).split()[0])
+    cents = [_pitch_cents(line) for line in lines if line][:count]
+    if count < 1 or len(cents) != count:
+        raise ValueError(f"{path}: expected {count} pitches, found {len(cents)}")
+    return description, cents
+
+
+def read_kbm(path: str):
+    """Keyboard mapping as a dict: size, first, last, middle, ref_note,
+    ref_freq, octave_degree and mapping (scale degree per key, None for
+    unmapped keys)."""
+    values = [line.split()[0] for line in _scala_lines(path) if line]
+    if len(values) < 7:
+        raise ValueError(f"{path}: incomplete keyboard mapping")
+    size = int(values[0])
+    kbm = {"size": size, "first": int(values[1]), "last": int(values[2]),
+           "middle": int(values[3]), "ref_note": int(values[4]),
+           "ref_freq": float(values[5]), "octave_degree": int(values[6])}
+    keys = values[7:7 + size]
+    kbm["mapping"] = [None if k.lower() == "x" else int(k) for k in keys] + [None] * (size - len(keys))
+    return kbm
+
+
+def default_kbm():
+    """Linear mapping with degree 0 on middle C and A4 = 440 Hz."""
+    return {"size": 0, "first": 0, "last": 127, "middle": 60, "ref_note": 69,
+            "ref_freq": A4_HZ, "octave_degree": 0, "mapping": []}
+
+
+def scala_table(cents, kbm=None):
+    """128 frequencies for a scale in cents (as read_scl returns) under a
+    keyboard mapping. Keys outside the mapped range, or mapped to "x",
+    keep their equal-tempered frequency so every row can still sound."""
+    kbm = kbm or default_kbm()
+    steps = [0.0] + list(cents[:-1])
+    period = cents[-1]
+    n = len(steps)
+
+    def degree_cents(d):
+        o, k = divmod(d, n)
+        return o * period + steps[k]
+
+    size = kbm["size"]
+    octave = degree_cents(kbm["octave_degree"] or n) if size else 0.0
+
+    def key_cents(m):
+        if not kbm["first"] <= m <= kbm["last"]:
+            return None
+        if not size:
+            return degree_cents(m - kbm["middle"])
+        o, k = divmod(m - kbm["middle"], size)
+        d = kbm["mapping"][k]
+        return None if d is None else o * octave + degree_cents(d)
+
+    ref = key_cents(kbm["ref_note"])
+    if ref is None:
+        raise ValueError("the reference key is not mapped")
+    table = equal_temperament()
+    for m in range(128):
+        c = key_cents(m)
+        if c is not None:
+            table[m] = kbm["ref_freq"] * 2.0 ** ((c - ref) / 1200.0)
+    return table
+
+
+def load_scala(scl_path: str, kbm_path: str = None):
+    """Read a .scl (and .kbm) and make it the current tuning. Returns the
+    scale description."""
+    description, cents = read_scl(scl_path)
+    kbm = read_kbm(kbm_path) if kbm_path else None
+    set_table(scala_table(cents, kbm), description or scl_path)
+    return current